@@ -1,10 +1,20 @@
 # # app.py
 
 
-from flask import Flask, request, jsonify
-from database.mongo_db import MongoDB
+from flask import Flask, Response, request, jsonify, stream_with_context
+from database.backends import create_stores
+from database.storage import GraphUnavailableError
+from database.mongo_db import PATIENT_PROJECTION, DeleteOp, InsertOp, UpdateOp
+from database.normalization import PATIENT_KEY_FIELDS, patient_keys
+from database.patient_matching import PatientDuplicateDetector
 from synchronization.sync_manager import SyncManager
+from middleware.compression import init_compression
+from middleware.coalescing import coalesced_response
+from middleware import metrics
+from reporting import export
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+import config
 
 from flask_jwt_extended import create_access_token, jwt_required, JWTManager, get_jwt_identity
 from flask_cors import CORS # Import CORS
@@ -14,12 +24,37 @@ app = Flask(__name__)
 # --- Configuration CORS ---
 CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}})
 
+# --- Configuration Compression / MessagePack ---
+init_compression(app)
+
 # --- Configuration JWT ---
 app.config["JWT_SECRET_KEY"] = "super-secret-key-change-this"
 jwt = JWTManager(app)
 
-mongo_db = MongoDB()
-sync_manager = SyncManager()
+mongo_db, neo4j_db = create_stores()
+sync_manager = SyncManager(mongo_db, neo4j_db)
+duplicate_detector = PatientDuplicateDetector(mongo_db)
+try:
+    mongo_db.ensure_indexes()
+    sync_manager.neo4j_db.ensure_indexes()
+except Exception as e:
+    print(f"Erreur lors de la creation des index : {e}")
+
+if hasattr(neo4j_db, "assignment_cache"):
+    metrics.register_gauge("assignment_cache.size", neo4j_db.assignment_cache.size)
+    try:
+        neo4j_db.warm_assignment_cache()
+    except Exception as e:
+        print(f"Erreur lors du prechargement du cache des medecins traitants : {e}")
+
+# --- Request-scoped Neo4j session ---
+@app.before_request
+def open_graph_session():
+    neo4j_db.begin_request()
+
+@app.teardown_request
+def close_graph_session(exc):
+    neo4j_db.end_request()
 
 # --- Helpers ---
 def mongo_to_json(data):
@@ -30,6 +65,28 @@ def mongo_to_json(data):
         return {k: str(v) if isinstance(v, ObjectId) else v for k, v in data.items()}
     return data
 
+def generate_patient_username(data):
+    """Builds the login username of a patient from its name."""
+    return f"{data['nom'].lower()}_{data['prenom'].lower()}_patient"
+
+def patient_username_candidates(data, attempts=20):
+    """Usernames a patient may get, in order: nom_prenom_patient, nom_prenom_2_patient, ..."""
+    base = generate_patient_username(data)[:-len("_patient")]
+    return [f"{base}_patient"] + [f"{base}_{n}_patient" for n in range(2, attempts + 1)]
+
+def available_patient_username(data):
+    """
+    First free username among the candidates of a patient (checked with a single query),
+    so that namesakes get distinct logins. None if all are taken.
+    """
+    usernames = patient_username_candidates(data)
+    taken = mongo_db.find_existing_values("patients", "username", usernames)
+    return next((username for username in usernames if username not in taken), None)
+
+def generate_medecin_username(data):
+    """Builds the login username of a doctor from its name."""
+    return f"{data['nom'].lower()}.{data['prenom'].lower()}_medecin"
+
 def get_current_entity_and_role():
     """
     Determines the ID of the currently logged-in entity, its role, and the entity document.
@@ -151,7 +208,8 @@ def login_as_patient():
 def create_patient():
     """
     Creates a new patient and associates a username/password for direct login.
-    Only an admin can perform this action.
+    Probable duplicates (similar name, same birth date) are reported with a 409 unless
+    the request is sent with ?force=true. Only an admin can perform this action.
     """
     current_entity_id, role, entity_doc = get_current_entity_and_role()
     if role != "admin":
@@ -161,20 +219,26 @@ def create_patient():
     if not all(k in request_data for k in ["nom", "prenom"]):
         return jsonify({"msg": "Nom et prenom sont requis"}), 400
 
-    # Generates username and password for the patient
-    patient_username = f"{request_data['nom'].lower()}_{request_data['prenom'].lower()}_patient"
+    if request.args.get("force", "").lower() not in ("1", "true"):
+        duplicates = duplicate_detector.find_duplicates(request_data)
+        if duplicates:
+            return jsonify({
+                "msg": "Doublon probable: un patient similaire existe deja. Renvoyez la requete avec ?force=true pour le creer quand meme.",
+                "doublons": duplicates,
+            }), 409
+
+    # Generates username and password for the patient (suffixed for namesakes)
+    patient_username = available_patient_username(request_data)
+    if patient_username is None:
+        return jsonify({
+            "msg": f"Aucun nom d'utilisateur disponible pour '{generate_patient_username(request_data)}'. Veuillez utiliser un autre nom ou prenom."
+        }), 409
     patient_password = "password123" # WARNING: Clear password - SECURITY RISK!
 
     # Adds username and password directly to the patient data dictionary.
     request_data['username'] = patient_username
     request_data['password'] = patient_password
 
-    # Checks if the generated username already exists IN THE PATIENT COLLECTION
-    if mongo_db.find_patient_by_username(patient_username):
-        return jsonify({
-            "msg": f"Nom d'utilisateur '{patient_username}' deja pris pour un patient. Veuillez utiliser un autre nom ou prenom."
-        }), 409
-
     patient_id = mongo_db.add_patient(request_data) 
     if patient_id:
         sync_manager.sync_patient_creation(patient_id, request_data) 
@@ -189,8 +253,29 @@ def get_patients():
     current_entity_id, role, entity_doc = get_current_entity_and_role()
     if role != "admin":
         return jsonify({"msg": "Acces non autorise"}), 403
-    patients = mongo_db.get_all_patients()
-    return jsonify(mongo_to_json(patients)), 200
+    # Concurrent admin requests share one read (all admins see the same list)
+    return coalesced_response(("admin",), lambda: (jsonify(mongo_to_json(mongo_db.get_all_patients(PATIENT_PROJECTION))), 200))
+
+@app.route("/admin/patients/search", methods=["GET"])
+@jwt_required()
+def search_patients():
+    """
+    Prefix, accent-insensitive search of patients by nom/prenom/username (?q=...&limit=...),
+    best matches first. Only an admin can perform this action.
+    """
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    text = request.args.get("q", "")
+    if not text.strip():
+        return jsonify({"msg": "Parametre q requis"}), 400
+    try:
+        limit = int(request.args.get("limit", config.PATIENT_SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"msg": "Parametre limit invalide"}), 400
+    if limit < 1:
+        return jsonify({"msg": "Parametre limit invalide"}), 400
+    return jsonify(mongo_to_json(mongo_db.search_patients(text, limit))), 200
 
 @app.route("/admin/patients/<string:patient_id>", methods=["GET"])
 @jwt_required()
@@ -199,7 +284,7 @@ def get_patient(patient_id):
     current_entity_id, role, entity_doc = get_current_entity_and_role()
     if role != "admin":
         return jsonify({"msg": "Acces non autorise"}), 403
-    patient = mongo_db.get_patient(patient_id)
+    patient = mongo_db.get_patient(patient_id, PATIENT_PROJECTION)
     if patient:
         return jsonify(mongo_to_json(patient)), 200
     return jsonify({"msg": "Patient non trouve"}), 404
@@ -245,7 +330,10 @@ def assign_medecin_traitant(patient_id, medecin_id):
 
     try:
         sync_manager.neo4j_db.link_patient_to_medecin_traitant(patient_id, medecin_id)
+        sync_manager.sync_panel_sizes([medecin_id])
         return jsonify({"msg": "Medecin traitant assigne avec succes"}), 200
+    except GraphUnavailableError as e:
+        return jsonify({"msg": f"Service de graphe indisponible, reessayez plus tard: {e}"}), 503
     except Exception as e:
         return jsonify({"msg": f"Erreur lors de l'assignation du medecin traitant: {e}"}), 500
 
@@ -265,7 +353,7 @@ def create_medecin():
     if not all(k in data for k in ["nom", "prenom", "specialite"]):
         return jsonify({"msg": "Nom, prenom et specialite sont requis"}), 400
     
-    medecin_username = f"{data['nom'].lower()}.{data['prenom'].lower()}_medecin"
+    medecin_username = generate_medecin_username(data)
     medecin_password = "password123" # WARNING: Clear password - SECURITY RISK!
     
     data['username'] = medecin_username
@@ -291,8 +379,8 @@ def get_medecins():
     current_entity_id, role, entity_doc = get_current_entity_and_role()
     if role != "admin":
         return jsonify({"msg": "Acces non autorise"}), 403
-    medecins = mongo_db.get_all_medecins()
-    return jsonify(mongo_to_json(medecins)), 200
+    # Concurrent admin requests share one read (all admins see the same list)
+    return coalesced_response(("admin",), lambda: (jsonify(mongo_to_json(mongo_db.get_all_medecins())), 200))
 
 @app.route("/admin/medecins/<string:medecin_id>", methods=["GET"])
 @jwt_required()
@@ -331,6 +419,304 @@ def delete_medecin(medecin_id):
         return jsonify({"msg": "Medecin supprime avec succes"}), 200
     return jsonify({"msg": "Medecin non trouve"}), 404
 
+# --- Admin Routes : Batch Operations ---
+BATCH_ENTITIES = {
+    "patient": {
+        "collection": "patients",
+        "required": ["nom", "prenom"],
+        "username_candidates": patient_username_candidates,
+        "derived_keys": (PATIENT_KEY_FIELDS, patient_keys),
+        "find_duplicates": lambda data, pending: duplicate_detector.find_duplicates(data, pending=pending),
+        "sync": lambda created, updated, deleted: sync_manager.sync_patient_batch(created, updated, deleted),
+    },
+    "medecin": {
+        "collection": "medecins",
+        "required": ["nom", "prenom", "specialite"],
+        "username_candidates": lambda data: [generate_medecin_username(data)],
+        "sync": lambda created, updated, deleted: sync_manager.sync_medecin_batch(created, updated, deleted),
+    },
+}
+
+def _parse_object_id(value):
+    """Returns the ObjectId for `value`, or None if it is not a valid id."""
+    if value is None:  # ObjectId(None) would generate a new id
+        return None
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+@app.route("/admin/batch", methods=["POST"])
+@jwt_required()
+def admin_batch():
+    """
+    Executes a list of create/update/delete/assign operations on patients and doctors.
+    Writes are grouped into one bulk_write per collection and one UNWIND query per
+    Neo4j operation type. Returns one result per operation, in request order.
+    Only an admin can perform this action.
+
+    Patient creations reported as probable duplicates (of a stored patient or of another
+    creation of the batch) get a 409 unless the operation has "force": true.
+    As on the single-item routes, an update that changes nothing gets a 404. Operations on
+    the same id are checked in request order: a second update/delete, or a delete of an
+    entity assigned earlier in the batch, gets a 409; an assign of an entity deleted earlier
+    in the batch gets a 404.
+
+    Body: {"operations": [
+        {"action": "create", "entity": "patient", "data": {...}, "force": false},
+        {"action": "update", "entity": "medecin", "id": "...", "data": {...}},
+        {"action": "delete", "entity": "patient", "id": "..."},
+        {"action": "assign", "patient_id": "...", "medecin_id": "..."}
+    ]}
+    """
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+
+    operations = (request.get_json() or {}).get("operations")
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"msg": "Une liste d'operations est requise"}), 400
+    if len(operations) > config.BATCH_MAX_OPERATIONS:
+        return jsonify({"msg": f"Maximum {config.BATCH_MAX_OPERATIONS} operations par lot"}), 400
+
+    results = [None] * len(operations)
+    def set_result(index, status, msg, **extra):
+        results[index] = {"index": index, "status": status, "msg": msg, **extra}
+
+    # 1. Validate operations and group them by entity and action
+    plans = {entity: {"create": [], "update": [], "delete": []} for entity in BATCH_ENTITIES}
+    assignments = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            set_result(index, 400, "Operation invalide")
+            continue
+        action = operation.get("action")
+        if action == "assign":
+            patient_oid = _parse_object_id(operation.get("patient_id"))
+            medecin_oid = _parse_object_id(operation.get("medecin_id"))
+            if not patient_oid or not medecin_oid:
+                set_result(index, 400, "ID patient ou medecin invalide")
+            else:
+                assignments.append((index, patient_oid, medecin_oid))
+            continue
+
+        entity = BATCH_ENTITIES.get(operation.get("entity"))
+        if not entity or action not in ("create", "update", "delete"):
+            set_result(index, 400, "Action ou entite inconnue")
+            continue
+        data = operation.get("data") or {}
+        if action == "create":
+            if not isinstance(data, dict) or not all(k in data for k in entity["required"]):
+                set_result(index, 400, f"Champs requis: {', '.join(entity['required'])}")
+                continue
+            plans[operation["entity"]]["create"].append((index, data, bool(operation.get("force"))))
+            continue
+        entity_oid = _parse_object_id(operation.get("id"))
+        if not entity_oid:
+            set_result(index, 400, "ID invalide")
+            continue
+        if action == "update":
+            if not isinstance(data, dict) or not data:
+                set_result(index, 400, "Donnees de mise a jour requises")
+                continue
+            data = {k: v for k, v in data.items() if k != "_id"}
+        plans[operation["entity"]][action].append((index, entity_oid, data))
+
+    # 2. Apply writes with one bulk_write per collection
+    for entity_name, entity in BATCH_ENTITIES.items():
+        plan = plans[entity_name]
+        collection = entity["collection"]
+
+        # One existence check covers every update, delete and assignment of the collection
+        assigned_at = {}  # id -> index of the first assignment referencing it
+        for index, patient_oid, medecin_oid in assignments:
+            assigned_at.setdefault(patient_oid if entity_name == "patient" else medecin_oid, index)
+        referenced_ids = {oid for _, oid, _ in plan["update"] + plan["delete"]} | set(assigned_at)
+        existing_ids = mongo_db.find_existing_ids(collection, referenced_ids)
+        plan["existing_ids"] = existing_ids
+
+        # One lookup covers the candidate usernames of every creation
+        usernames = {index: entity["username_candidates"](data) for index, data, _ in plan["create"]}
+        taken_usernames = mongo_db.find_existing_values(
+            collection, "username", {username for candidates in usernames.values() for username in candidates})
+
+        # Updated documents are read in one query: unchanged updates are detected (404, like the
+        # single-item routes) and derived keys are rebuilt from the current document
+        key_fields, derive_keys = entity.get("derived_keys", ((), None))
+        updated_ids = [oid for _, oid, _ in plan["update"] if oid in existing_ids]
+        current_docs = {doc["_id"]: doc for doc in mongo_db.find_documents_by_ids(collection, updated_ids)}
+
+        bulk_operations, pending, batch_created = [], [], []
+        for index, data, force in plan["create"]:
+            data["_id"] = ObjectId()
+            if "find_duplicates" in entity and not force:
+                duplicates = entity["find_duplicates"](data, batch_created)
+                if duplicates:
+                    set_result(index, 409, "Doublon probable: un patient similaire existe deja (\"force\": true pour le creer quand meme).",
+                               doublons=duplicates)
+                    continue
+            username = next((u for u in usernames[index] if u not in taken_usernames), None)
+            if username is None:
+                set_result(index, 409, f"Nom d'utilisateur '{usernames[index][0]}' deja pris pour un {entity_name}.")
+                continue
+            taken_usernames.add(username)
+            data["username"] = username
+            data["password"] = "password123" # WARNING: Clear password - SECURITY RISK!
+            if derive_keys:
+                data.update(derive_keys(data))
+            batch_created.append(data)
+            bulk_operations.append(InsertOp(data))
+            pending.append(("create", index, str(data["_id"]), data))
+
+        touched_ids = set()
+        for action in ("update", "delete"):
+            for index, entity_oid, data in plan[action]:
+                if entity_oid not in existing_ids:
+                    set_result(index, 404, f"{entity_name.capitalize()} non trouve")
+                    continue
+                current = current_docs.get(entity_oid, {})
+                if action == "update" and all(k in current and current[k] == v for k, v in data.items()):
+                    set_result(index, 404, f"{entity_name.capitalize()} non trouve ou aucune modification")
+                    continue
+                if entity_oid in touched_ids or (action == "delete" and assigned_at.get(entity_oid, index) < index):
+                    set_result(index, 409, "Operation en conflit avec une autre operation du lot")
+                    continue
+                touched_ids.add(entity_oid)
+                if action == "update":
+                    if current and any(field in data for field in key_fields):
+                        data.update(derive_keys({**current, **data}))
+                    bulk_operations.append(UpdateOp({"_id": entity_oid}, {"$set": data}))
+                else:
+                    bulk_operations.append(DeleteOp({"_id": entity_oid}))
+                pending.append((action, index, str(entity_oid), data))
+
+        errors = mongo_db.bulk_write(collection, bulk_operations)
+
+        created, updated, deleted = [], [], []
+        plan["deleted_ids"] = set()
+        for bulk_index, (action, index, entity_id, data) in enumerate(pending):
+            if bulk_index in errors:
+                set_result(index, 500, f"Erreur d'ecriture: {errors[bulk_index]}")
+            elif action == "create":
+                created.append((entity_id, data))
+                set_result(index, 201, f"{entity_name.capitalize()} ajoute avec succes", id=entity_id)
+            elif action == "update":
+                updated.append((entity_id, data))
+                set_result(index, 200, f"{entity_name.capitalize()} mis a jour avec succes", id=entity_id)
+            else:
+                deleted.append(entity_id)
+                plan["deleted_ids"].add(entity_id)
+                set_result(index, 200, f"{entity_name.capitalize()} supprime avec succes", id=entity_id)
+        entity["sync"](created, updated, deleted)
+
+    # 3. Treating physician assignments: one UNWIND query for the whole batch. An assignment
+    # referencing an entity deleted earlier in the batch fails (a later delete got a 409)
+    valid_assignments = []
+    for index, patient_oid, medecin_oid in assignments:
+        if (patient_oid not in plans["patient"]["existing_ids"] or medecin_oid not in plans["medecin"]["existing_ids"]
+                or str(patient_oid) in plans["patient"]["deleted_ids"]
+                or str(medecin_oid) in plans["medecin"]["deleted_ids"]):
+            set_result(index, 404, "Patient ou medecin non trouve")
+        else:
+            valid_assignments.append((index, str(patient_oid), str(medecin_oid)))
+    if valid_assignments:
+        linked = sync_manager.sync_medecin_traitant_assignments(
+            [(patient_id, medecin_id) for _, patient_id, medecin_id in valid_assignments]
+        )
+        for index, patient_id, medecin_id in valid_assignments:
+            if linked:
+                set_result(index, 200, "Medecin traitant assigne avec succes")
+            else:
+                set_result(index, 500, "Erreur lors de l'assignation du medecin traitant")
+
+    return jsonify({"results": results}), 200
+
+# --- Admin Routes : Exports ---
+@app.route("/admin/export/consultations", methods=["GET"])
+@jwt_required()
+def export_consultations():
+    """
+    Streams the consultations of a date range (?start=&end=, end excluded) as NDJSON
+    or CSV (?format=ndjson|csv). Only an admin can perform this action.
+    """
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in export.EXPORT_MIMETYPES:
+        return jsonify({"msg": "Format inconnu (ndjson ou csv)"}), 400
+    chunks = export.export_consultations(mongo_db, fmt, request.args.get("start"), request.args.get("end"))
+    return Response(stream_with_context(chunks), mimetype=export.EXPORT_MIMETYPES[fmt],
+                    headers={"Content-Disposition": f"attachment; filename=consultations.{fmt}"})
+
+@app.route("/admin/export/patients", methods=["GET"])
+@jwt_required()
+def export_patients():
+    """Streams all patients as NDJSON or CSV (?format=ndjson|csv). Only an admin can perform this action."""
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in export.EXPORT_MIMETYPES:
+        return jsonify({"msg": "Format inconnu (ndjson ou csv)"}), 400
+    chunks = export.export_patients(mongo_db, fmt)
+    return Response(stream_with_context(chunks), mimetype=export.EXPORT_MIMETYPES[fmt],
+                    headers={"Content-Disposition": f"attachment; filename=patients.{fmt}"})
+
+# --- Admin Routes : Metrics ---
+@app.route("/admin/stats", methods=["GET"])
+@jwt_required()
+def get_stats():
+    """
+    Dashboard statistics read from the `stats` rollups (no scan of the consultations):
+    consultations per doctor and per specialty for each period (?granularity=month|day,
+    ?from=/?to= inclusive periods, optional ?medecin_id=), panel sizes per doctor and
+    assigned patients per specialty. Only an admin can perform this action.
+    """
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    granularity = request.args.get("granularity", "month")
+    if granularity not in ("month", "day"):
+        return jsonify({"msg": "granularity doit valoir 'month' ou 'day'"}), 400
+
+    stats = sync_manager.stats
+    consultations = stats.consultations(
+        granularity, request.args.get("from"), request.args.get("to"), request.args.get("medecin_id")
+    )
+    by_specialite = {}
+    for row in consultations:
+        key = (row.get("specialite"), row["period"])
+        by_specialite[key] = by_specialite.get(key, 0) + row["count"]
+    panels = stats.panels()
+    patients_by_specialite = {}
+    for panel in panels:
+        totals = patients_by_specialite.setdefault(panel.get("specialite"), {"patients": 0, "medecins": 0})
+        totals["patients"] += panel["count"]
+        totals["medecins"] += 1
+
+    return jsonify({
+        "consultations_par_medecin": consultations,
+        "consultations_par_specialite": [
+            {"specialite": specialite, "period": period, "count": count}
+            for (specialite, period), count in sorted(by_specialite.items(), key=lambda item: (item[0][1], str(item[0][0])))
+        ],
+        "patienteles": panels,
+        "patients_par_specialite": [
+            {"specialite": specialite, **totals} for specialite, totals in sorted(
+                patients_by_specialite.items(), key=lambda item: str(item[0]))
+        ],
+    }), 200
+
+@app.route("/admin/metrics", methods=["GET"])
+@jwt_required()
+def get_metrics():
+    """Returns the metrics of this API process. Only an admin can perform this action."""
+    current_entity_id, role, entity_doc = get_current_entity_and_role()
+    if role != "admin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    return jsonify(metrics.snapshot()), 200
+
 # --- Doctor Routes : Consultation Management ---
 @app.route("/medecin/consultations", methods=["POST"])
 @jwt_required()
@@ -353,28 +739,33 @@ def create_consultation():
     consultation_id = mongo_db.add_consultation(data)
     if consultation_id:
         try:
-            # Direct call to create the Consultation node in Neo4j
-            sync_manager.neo4j_db.create_consultation_node(
-                consultation_id,
-                data.get("date_heure"),
-                data.get("motif")
-            )
-
-            # Direct call to link the patient to the consultation
-            patient_id_str = data.get("patient_id")
-            sync_manager.neo4j_db.link_patient_consultation(
-                patient_id_str,
-                consultation_id
-            )
-
-            # Direct call to link the consultation to the doctor
-            medecin_id_str = data.get("medecin_id")
-            sync_manager.neo4j_db.link_consultation_medecin(
-                consultation_id,
-                medecin_id_str
-            )
+            # Node and links are created in one Neo4j transaction
+            with sync_manager.neo4j_db.transaction():
+                # Direct call to create the Consultation node in Neo4j
+                sync_manager.neo4j_db.create_consultation_node(
+                    consultation_id,
+                    data.get("date_heure"),
+                    data.get("motif")
+                )
+
+                # Direct call to link the patient to the consultation
+                patient_id_str = data.get("patient_id")
+                sync_manager.neo4j_db.link_patient_consultation(
+                    patient_id_str,
+                    consultation_id
+                )
+
+                # Direct call to link the consultation to the doctor
+                medecin_id_str = data.get("medecin_id")
+                sync_manager.neo4j_db.link_consultation_medecin(
+                    consultation_id,
+                    medecin_id_str
+                )
         except Exception as e:
             return jsonify({"msg": f"Erreur lors de la synchronisation Neo4j: {e}"}), 500
+        finally:
+            sync_manager.sync_consultation_summary_creation(consultation_id, data)
+            sync_manager.sync_consultation_stats_creation(data, (medecin_doc or {}).get("specialite"))
 
         return jsonify({"msg": "Consultation ajoutee avec succes ", "id": consultation_id}), 201
     return jsonify({"msg": "Erreur lors de l'ajout de la consultation"}), 500
@@ -410,6 +801,36 @@ def get_medecin_consultations():
     return jsonify(enriched_consultations), 200
 
 
+def consultation_search_response(scope):
+    """
+    Runs the full-text consultation search of the request (?q=...&page=...&per_page=...)
+    within `scope` and returns the page, with the X-Page and X-Has-More headers.
+    """
+    text = request.args.get("q", "")
+    if not text.strip():
+        return jsonify({"msg": "Parametre q requis"}), 400
+    try:
+        page = int(request.args.get("page", 1))
+        per_page = int(request.args.get("per_page", config.CONSULTATION_SEARCH_PER_PAGE))
+    except ValueError:
+        return jsonify({"msg": "Parametres de pagination invalides"}), 400
+    if not 1 <= page <= config.CONSULTATION_SEARCH_MAX_PAGE or per_page < 1:
+        return jsonify({"msg": "Parametres de pagination invalides"}), 400
+    consultations, has_more = mongo_db.search_consultations(text, scope, page, per_page)
+    response = jsonify(mongo_to_json(consultations))
+    response.headers["X-Page"] = str(page)
+    response.headers["X-Has-More"] = "true" if has_more else "false"
+    return response, 200
+
+@app.route("/medecin/consultations/search", methods=["GET"])
+@jwt_required()
+def search_medecin_consultations():
+    """Full-text search over the connected doctor's consultations (motif, diagnostic)."""
+    current_entity_id, role, medecin_doc = get_current_entity_and_role()
+    if role != "medecin":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    return consultation_search_response({"medecin_id": current_entity_id})
+
 @app.route("/medecin/consultations/<string:consultation_id>", methods=["PUT"])
 @jwt_required()
 def update_consultation(consultation_id):
@@ -428,12 +849,9 @@ def update_consultation(consultation_id):
         return jsonify({"msg": "Consultation non trouvee ou acces non autorise"}), 403
 
     if mongo_db.update_consultation(consultation_id, data):
-        # IMPORTANT NOTE: The call to sync_consultation_creation here might recreate links
-        # or nodes if the Neo4j logic is not idempotent for updates.
-        # Ideally, for an update, SyncManager should have a dedicated method
-        # like `sync_consultation_update` that updates existing Neo4j node properties
-        # and doesn't affect relationships if they haven't changed.
-        sync_manager.sync_consultation_creation(consultation_id, data) 
+        sync_manager.sync_consultation_update(consultation_id, consultation, data)
+        sync_manager.sync_consultation_summary_update(consultation, data)
+        sync_manager.sync_consultation_stats_update(consultation, data)
         return jsonify({"msg": "Consultation mise a jour avec succes"}), 200
     return jsonify({"msg": "Consultation non trouvee ou aucune modification"}), 404
 
@@ -452,6 +870,8 @@ def delete_consultation(consultation_id):
 
     if mongo_db.delete_consultation(consultation_id):
         sync_manager.sync_consultation_deletion(consultation_id)
+        sync_manager.sync_consultation_summary_deletion(consultation)
+        sync_manager.sync_consultation_stats_deletion(consultation)
         return jsonify({"msg": "Consultation supprimee avec succes"}), 200
     return jsonify({"msg": "Consultation non trouvee"}), 404
 
@@ -489,26 +909,37 @@ def get_my_patients():
 
     medecin_id = current_entity_id # L'ID du médecin est directement le current_entity_id
     
-    # 1. Récupérer les IDs des patients ayant eu une consultation avec ce médecin
-    consultations = mongo_db.get_consultations_by_medecin(medecin_id)
-    patient_ids_from_consultations = {c["patient_id"] for c in consultations} # Utilise un set pour éviter les doublons d'IDs
-
-    # 2. Récupérer les IDs des patients assignés à ce médecin via Neo4j
-    # Assurez-vous que sync_manager.neo4j_db est correctement initialisé et accessible
-    assigned_patient_ids = sync_manager.neo4j_db.get_patients_assigned_to_medecin(medecin_id)
-    patient_ids_from_assignments = set(assigned_patient_ids) # Convertir en set
-
-    # 3. Combiner tous les IDs uniques de patients
-    all_unique_patient_ids = patient_ids_from_consultations.union(patient_ids_from_assignments)
-
-    # 4. Récupérer les informations complètes de ces patients depuis MongoDB
-    patients_info = []
-    for p_id in all_unique_patient_ids:
-        patient = mongo_db.get_patient(p_id)
-        if patient:
-            patients_info.append(mongo_to_json(patient))
-            
-    return jsonify(patients_info), 200
+    # Les requetes simultanees du meme medecin partagent un seul calcul
+    def list_my_patients():
+        # 1. Récupérer les IDs des patients ayant eu une consultation avec ce médecin
+        consultations = mongo_db.get_consultations_by_medecin(medecin_id)
+        patient_ids_from_consultations = {c["patient_id"] for c in consultations} # Utilise un set pour éviter les doublons d'IDs
+
+        # 2. Récupérer les IDs des patients assignés à ce médecin via Neo4j
+        # Si Neo4j est indisponible, mode degrade : seulement les patients issus des consultations
+        degraded = False
+        try:
+            assigned_patient_ids = sync_manager.neo4j_db.get_patients_assigned_to_medecin(medecin_id)
+        except GraphUnavailableError as e:
+            print(f"Mode degrade /medecin/mes_patients: {e}")
+            metrics.increment("degraded.mes_patients")
+            assigned_patient_ids, degraded = [], True
+        patient_ids_from_assignments = set(assigned_patient_ids) # Convertir en set
+
+        # 3. Combiner tous les IDs uniques de patients
+        all_unique_patient_ids = patient_ids_from_consultations.union(patient_ids_from_assignments)
+
+        # 4. Récupérer les informations de ces patients depuis MongoDB, en une requete
+        patient_oids = [oid for oid in map(_parse_object_id, all_unique_patient_ids) if oid]
+        patients_info = [mongo_to_json(patient) for patient in
+                         mongo_db.find_documents_by_ids("patients", patient_oids, PATIENT_PROJECTION)]
+
+        response = jsonify(patients_info)
+        if degraded:
+            response.headers["X-Degraded-Mode"] = "graph-unavailable"
+        return response, 200
+
+    return coalesced_response(("medecin", medecin_id), list_my_patients)
 
 
 @app.route("/patient/historique_consultations", methods=["GET", "OPTIONS"]) # Add OPTIONS here
@@ -530,22 +961,24 @@ def get_patient_history():
     if role != "patient":
         return jsonify({"msg": "Accès non autorisé"}), 403
 
-    patient_id = current_entity_id
-    consultations = mongo_db.get_consultations_by_patient(patient_id)
-    
-    # Enriches consultations with doctor names
-    enriched_consultations = []
-    for consult in consultations:
-        medecin = mongo_db.get_medecin(consult["medecin_id"])
-        consult_data = mongo_to_json(consult)
-        consult_data["medecin_nom"] = f"{medecin.get('prenom', '')} {medecin.get('nom', '')}" if medecin else "Inconnu"
-        enriched_consultations.append(consult_data)
-        
-    return jsonify(enriched_consultations), 200
+    # Single read of the denormalized summary (last consultations with doctor names)
+    summary = sync_manager.patient_summaries.get(current_entity_id)
+    response = jsonify(summary["consultations"])
+    response.headers["X-Total-Count"] = str(summary["consultation_count"])
+    return response, 200
 
 
 
 
+@app.route("/patient/consultations/search", methods=["GET"])
+@jwt_required()
+def search_patient_consultations():
+    """Full-text search over the connected patient's consultation history (motif, diagnostic)."""
+    current_entity_id, role, patient_doc = get_current_entity_and_role()
+    if role != "patient":
+        return jsonify({"msg": "Acces non autorise"}), 403
+    return consultation_search_response({"patient_id": current_entity_id})
+
 @app.route("/patient/change_password", methods=["PUT"])
 @jwt_required()
 def change_patient_password():
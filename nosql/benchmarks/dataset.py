@@ -0,0 +1,268 @@
+"""
+Synthetic clinic dataset generator.
+
+Generates patients, doctors, consultations and admin users shaped like production
+data, reproducibly from a seed, and writes them directly into MongoDB and Neo4j
+through the bulk paths (insert_many and UNWIND queries):
+- doctor panel sizes (A_POUR_MEDECIN_TRAITANT) follow a Zipf-like distribution, so a
+  few doctors treat many patients;
+- history lengths follow a Pareto distribution, so a few patients have long histories;
+- most consultations are with the patient's treating doctor.
+
+Usage (from the nosql/ directory):
+    python -m benchmarks.dataset --patients 100000 --medecins 300 --consultations 1000000 \
+        --seed 42 --reset --credentials-out credentials.json
+"""
+import argparse
+import bisect
+import itertools
+import json
+import random
+from datetime import date, datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from database.normalization import patient_keys
+from synchronization.stats_rollups import StatsRollupManager
+
+CHUNK_SIZE = 10000
+DEFAULT_PASSWORD = "password123"
+
+NOMS = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau",
+        "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux", "Vincent", "Fournier",
+        "Morel", "Girard", "Andre", "Lefevre", "Mercier", "Dupont", "Lambert", "Bonnet", "Francois", "Martinez",
+        "Benali", "El Amrani", "Haddad", "Bouchard", "Gauthier", "Chevalier", "Lemaire", "Hélène", "Benoît", "Noël"]
+PRENOMS = ["Jean", "Marie", "Pierre", "Michel", "André", "Philippe", "Nathalie", "Isabelle", "Sophie", "Céline",
+           "Nicolas", "Julien", "Camille", "Léa", "Chloé", "Manon", "Hugo", "Lucas", "Inès", "Yasmine",
+           "Mohamed", "Ali", "Fatima", "Amine", "Sarah", "Emma", "Louis", "Gabriel", "Zoé", "Jérôme"]
+SPECIALITES = ["Generaliste"] * 6 + ["Cardiologie", "Dermatologie", "Pediatrie", "Neurologie",
+                                      "Gynecologie", "Ophtalmologie", "Psychiatrie", "Rhumatologie"]
+MOTIFS = ["Controle annuel", "Douleur thoracique", "Fievre persistante", "Suivi diabete", "Renouvellement ordonnance",
+          "Migraine", "Douleur lombaire", "Vaccination", "Toux chronique", "Hypertension arterielle",
+          "Eruption cutanee", "Angine", "Suivi grossesse", "Anxiete", "Entorse cheville", "Bilan sanguin"]
+
+
+class WeightedChooser:
+    """O(log n) weighted choice over a fixed population (cumulative weights + bisect)."""
+
+    def __init__(self, rng, items, weights):
+        self.rng = rng
+        self.items = items
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def choice(self):
+        return self.items[bisect.bisect_right(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+
+def _chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _unique_username(base, taken):
+    username, suffix = base, 1
+    while username in taken:
+        suffix += 1
+        username = f"{base}{suffix}"
+    taken.add(username)
+    return username
+
+
+def reset_stores(mongo_db, neo4j_db):
+    """Empties the Mongo database and the graph."""
+    mongo_db.client.drop_database(mongo_db.db.name)
+    neo4j_db.clear()
+
+
+class ClinicDatasetGenerator:
+    def __init__(self, mongo_db, neo4j_db, seed=42, zipf_exponent=1.1, history_alpha=1.5,
+                 treating_doctor_share=0.7, start=date(2018, 1, 1), end=date(2025, 12, 31)):
+        self.mongo_db = mongo_db
+        self.neo4j_db = neo4j_db
+        self.rng = random.Random(seed)
+        self.zipf_exponent = zipf_exponent
+        self.history_alpha = history_alpha
+        self.treating_doctor_share = treating_doctor_share
+        self.start = datetime.combine(start, datetime.min.time())
+        self.span_minutes = int((datetime.combine(end, datetime.min.time()) - self.start).total_seconds() // 60)
+
+    # --- Entity generation ---
+    def _person(self):
+        return self.rng.choice(NOMS), self.rng.choice(PRENOMS)
+
+    def _medecins(self, count):
+        taken = set()
+        for _ in range(count):
+            nom, prenom = self._person()
+            yield {
+                "_id": ObjectId(), "nom": nom, "prenom": prenom, "specialite": self.rng.choice(SPECIALITES),
+                "username": _unique_username(f"{nom.lower()}.{prenom.lower()}_medecin", taken),
+                "password": DEFAULT_PASSWORD,
+            }
+
+    def _patients(self, count):
+        taken = set()
+        for _ in range(count):
+            nom, prenom = self._person()
+            birth = date(1930, 1, 1) + timedelta(days=self.rng.randint(0, 95 * 365))
+            patient = {
+                "_id": ObjectId(), "nom": nom, "prenom": prenom, "date_naissance": birth.isoformat(),
+                "username": _unique_username(f"{nom.lower()}_{prenom.lower()}_patient", taken),
+                "password": DEFAULT_PASSWORD,
+            }
+            patient.update(patient_keys(patient))
+            yield patient
+
+    def _date_heure(self):
+        moment = self.start + timedelta(minutes=self.rng.randrange(0, self.span_minutes, 15))
+        return moment.replace(hour=8 + moment.hour % 11).strftime("%Y-%m-%dT%H:%M")
+
+    # --- Bulk writers ---
+    def _write_medecins(self, medecins):
+        self.mongo_db.get_collection("medecins").insert_many(medecins)
+        self.neo4j_db.create_nodes("Medecin", [
+            {"id": str(m["_id"]), "nom": m["nom"], "prenom": m["prenom"], "specialite": m["specialite"]}
+            for m in medecins
+        ])
+
+    def _write_patients(self, patients, treating):
+        self.mongo_db.get_collection("patients").insert_many(patients)
+        self.neo4j_db.create_nodes("Patient", [
+            {"id": str(p["_id"]), "nom": p["nom"], "prenom": p["prenom"], "date_naissance": p["date_naissance"]}
+            for p in patients
+        ])
+        self.neo4j_db.link_patients_to_medecins_traitants([(str(p["_id"]), treating[str(p["_id"])]) for p in patients])
+
+    def _write_consultations(self, consultations):
+        self.mongo_db.get_collection("consultations").insert_many(consultations)
+        self.neo4j_db.create_nodes("Consultation", [
+            {"id": str(c["_id"]), "date_heure": c["date_heure"], "motif": c["motif"]} for c in consultations
+        ])
+        self.neo4j_db.create_relationships("Patient", "Consultation", "CONSULTE",
+                                           [{"from_id": c["patient_id"], "to_id": str(c["_id"])} for c in consultations])
+        self.neo4j_db.create_relationships("Consultation", "Medecin", "EST_ASSIGNEE_A",
+                                           [{"from_id": str(c["_id"]), "to_id": c["medecin_id"]} for c in consultations])
+
+    def _write_admins(self, count):
+        admins = [{"_id": ObjectId(), "username": f"admin{i}", "password": DEFAULT_PASSWORD, "role": "admin",
+                   "entite_id": None} for i in range(count)]
+        if admins:
+            self.mongo_db.get_collection("users").insert_many(admins)
+            self.neo4j_db.create_nodes("Utilisateur", [
+                {"id": str(a["_id"]), "username": a["username"], "role": "admin"} for a in admins
+            ])
+        return admins
+
+    # --- Entry point ---
+    def generate(self, patients, medecins, consultations, admins=1, credentials_sample=1000):
+        """Generates the dataset and returns sample ids and credentials for benchmarks and load tests."""
+        self.neo4j_db.ensure_indexes()
+        admin_docs = self._write_admins(admins)
+
+        medecin_docs = list(self._medecins(medecins))
+        for chunk in _chunks(medecin_docs):
+            self._write_medecins(chunk)
+        medecin_ids = [str(m["_id"]) for m in medecin_docs]
+        # Zipf-like panel sizes: the k-th doctor is chosen with weight 1 / k^s
+        panel_chooser = WeightedChooser(self.rng, medecin_ids,
+                                        [1 / (rank ** self.zipf_exponent) for rank in range(1, len(medecin_ids) + 1)])
+        uniform_medecin = WeightedChooser(self.rng, medecin_ids, [1] * len(medecin_ids))
+
+        patient_ids, history_weights, treating = [], [], {}
+        patient_credentials, medecin_panels = [], {}  # a few patients per doctor, for load-test sessions
+        for chunk in _chunks(self._patients(patients)):
+            for patient in chunk:
+                patient_id = str(patient["_id"])
+                treating[patient_id] = panel_chooser.choice()
+                panel = medecin_panels.setdefault(treating[patient_id], [])
+                if len(panel) < 20:
+                    panel.append(patient_id)
+                patient_ids.append(patient_id)
+                # Pareto-distributed history lengths: a few patients consult very often
+                history_weights.append(self.rng.paretovariate(self.history_alpha))
+                if len(patient_credentials) < credentials_sample:
+                    patient_credentials.append({"id": patient_id, "username": patient["username"]})
+            self._write_patients(chunk, treating)
+        patient_chooser = WeightedChooser(self.rng, patient_ids, history_weights)
+
+        def consultation():
+            patient_id = patient_chooser.choice()
+            if self.rng.random() < self.treating_doctor_share:
+                medecin_id = treating[patient_id]
+            else:
+                medecin_id = uniform_medecin.choice()
+            return {"_id": ObjectId(), "patient_id": patient_id, "medecin_id": medecin_id,
+                    "date_heure": self._date_heure(), "motif": self.rng.choice(MOTIFS)}
+
+        last_consultation, written = None, 0
+        for chunk in _chunks(consultation() for _ in range(consultations)):
+            self._write_consultations(chunk)
+            last_consultation = chunk[-1]
+            written += len(chunk)
+            print(f"Consultations generees: {written}/{consultations}", end="\r")
+
+        self.mongo_db.ensure_indexes()
+        print()
+        # Bulk writes bypass the sync layer: derive the statistics rollups once at the end
+        StatsRollupManager(self.mongo_db, self.neo4j_db).rebuild_all()
+
+        medecin_by_id = {str(m["_id"]): m for m in medecin_docs}
+        sample = last_consultation or {"patient_id": patient_ids[0], "medecin_id": medecin_ids[0], "_id": None,
+                                       "date_heure": self._date_heure()}
+        return {
+            "admin_id": str(admin_docs[0]["_id"]) if admin_docs else None,
+            "admin_username": admin_docs[0]["username"] if admin_docs else None,
+            "medecin_id": sample["medecin_id"],
+            "medecin_username": medecin_by_id[sample["medecin_id"]]["username"],
+            "patient_id": sample["patient_id"],
+            "patient_username": self.mongo_db.get_patient(sample["patient_id"])["username"],
+            "consultation_id": str(sample["_id"]) if sample["_id"] else None,
+            "date_sample": sample["date_heure"][:10],
+            "password": DEFAULT_PASSWORD,
+            "credentials": {
+                "admins": [a["username"] for a in admin_docs],
+                "medecins": [{"id": str(m["_id"]), "username": m["username"],
+                              "patient_ids": medecin_panels.get(str(m["_id"]), [])}
+                             for m in medecin_docs[:credentials_sample]],
+                "patients": patient_credentials,
+            },
+        }
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--medecins", type=int, default=50)
+    parser.add_argument("--consultations", type=int, default=100000)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="exposant de la distribution des tailles de patientele")
+    parser.add_argument("--reset", action="store_true", help="vide la base Mongo et le graphe avant generation")
+    parser.add_argument("--credentials-out", help="fichier JSON des identifiants pour le test de charge")
+    args = parser.parse_args(argv)
+
+    mongo_db, neo4j_db = create_stores()
+    try:
+        if args.reset:
+            reset_stores(mongo_db, neo4j_db)
+        summary = ClinicDatasetGenerator(mongo_db, neo4j_db, seed=args.seed, zipf_exponent=args.zipf).generate(
+            args.patients, args.medecins, args.consultations, args.admins
+        )
+    finally:
+        neo4j_db.close()
+    print(f"Jeu de donnees genere: {args.patients} patients, {args.medecins} medecins, "
+          f"{args.consultations} consultations, {args.admins} admins (graine {args.seed}).")
+    if args.credentials_out:
+        with open(args.credentials_out, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Identifiants ecrits dans {args.credentials_out}")
+
+
+if __name__ == "__main__":
+    main()
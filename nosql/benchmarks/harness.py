@@ -0,0 +1,314 @@
+"""
+Benchmark harness for the data layer (MongoDB / Neo4jDB methods) and the API routes.
+
+For every dataset size, the stores are reset and seeded (see benchmarks/dataset.py),
+then each case is run repeatedly and reported with its p50/p95/p99 latency and the
+average number of database calls it makes (Mongo collection accesses, Neo4j queries).
+Results can be saved as a baseline and later runs compared against it: a case whose
+p95 grows beyond the threshold, or which makes more database calls, is flagged and
+the process exits with status 1.
+
+With --backend memory the stores are the in-process engines, which isolates the
+Python overhead of each case from database latency. Against the servers
+(--backend mongo_neo4j), the benchmark uses its own Mongo database (--mongo-db) but
+the graph has no such isolation, so it refuses to run unless --wipe is given.
+
+Usage (from the nosql/ directory):
+    python -m benchmarks.harness --backend memory --sizes 1000 100000
+    python -m benchmarks.harness --sizes 1000 100000 1000000 --wipe --save-baseline
+    python -m benchmarks.harness --sizes 1000 100000 --wipe
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import config
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+# --- Instrumentation ---
+class DBCallCounter:
+    """Counts database calls by wrapping MongoDB.get_collection and the graph store's _execute_query."""
+
+    def __init__(self):
+        self.mongo = 0
+        self.neo4j = 0
+
+    def reset(self):
+        self.mongo = 0
+        self.neo4j = 0
+
+    @contextmanager
+    def installed(self, graph_class):
+        from database.mongo_db import MongoDB
+
+        original_get_collection = MongoDB.get_collection
+        original_execute_query = graph_class._execute_query
+        counter = self
+
+        def get_collection(db, collection_name):
+            counter.mongo += 1
+            return original_get_collection(db, collection_name)
+
+        def execute_query(db, *args, **kwargs):
+            counter.neo4j += 1
+            return original_execute_query(db, *args, **kwargs)
+
+        MongoDB.get_collection = get_collection
+        graph_class._execute_query = execute_query
+        try:
+            yield self
+        finally:
+            MongoDB.get_collection = original_get_collection
+            graph_class._execute_query = original_execute_query
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_case(fn, counter, iterations, time_budget, min_iterations=5):
+    """Runs `fn` up to `iterations` times (or until `time_budget` seconds) and returns its statistics."""
+    fn()  # warm-up (connections, caches)
+    latencies, mongo_calls, neo4j_calls = [], 0, 0
+    deadline = time.perf_counter() + time_budget
+    for i in range(iterations):
+        counter.reset()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+        mongo_calls += counter.mongo
+        neo4j_calls += counter.neo4j
+        if i + 1 >= min_iterations and time.perf_counter() > deadline:
+            break
+    latencies.sort()
+    return {
+        "iterations": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mongo_calls": mongo_calls / len(latencies),
+        "neo4j_calls": neo4j_calls / len(latencies),
+    }
+
+
+# --- Cases ---
+def data_layer_cases(mongo_db, neo4j_db, ids):
+    """(name, callable) pairs exercising each MongoDB / Neo4jDB method once."""
+    from database.patient_matching import PatientDuplicateDetector
+
+    def add_delete_patient():
+        patient_id = mongo_db.add_patient({"nom": "Bench", "prenom": "Patient"})
+        mongo_db.delete_patient(patient_id)
+
+    def create_delete_patient_node():
+        neo4j_db.create_patient_node("bench-patient", "Bench", "Patient")
+        neo4j_db.delete_patient_node("bench-patient")
+
+    def link_unlink_medecin_traitant():
+        neo4j_db.link_patient_to_medecin_traitant(ids["patient_id"], ids["medecin_id"])
+        neo4j_db.remove_patient_medecin_traitant_link(ids["patient_id"], ids["medecin_id"])
+
+    duplicate_detector = PatientDuplicateDetector(mongo_db)
+    patient = mongo_db.get_patient(ids["patient_id"])
+
+    return [
+        ("mongo.get_patient", lambda: mongo_db.get_patient(ids["patient_id"])),
+        ("mongo.get_all_patients", lambda: mongo_db.get_all_patients()),
+        ("mongo.get_all_medecins", lambda: mongo_db.get_all_medecins()),
+        ("mongo.find_patient_by_username", lambda: mongo_db.find_patient_by_username(ids["patient_username"])),
+        ("mongo.get_consultation", lambda: mongo_db.get_consultation(ids["consultation_id"])),
+        ("mongo.get_consultations_by_patient", lambda: mongo_db.get_consultations_by_patient(ids["patient_id"])),
+        ("mongo.get_consultations_by_medecin", lambda: mongo_db.get_consultations_by_medecin(ids["medecin_id"])),
+        ("mongo.iter_consultations_between(1 day)", lambda: sum(1 for _ in mongo_db.iter_consultations_between(
+            ids["date_sample"], ids["date_sample"] + "T99"))),
+        ("mongo.search_patients(prefix)", lambda: mongo_db.search_patients(ids["patient_username"][:3])),
+        ("mongo.search_consultations(medecin)", lambda: mongo_db.search_consultations(
+            "douleur", {"medecin_id": ids["medecin_id"]})),
+        ("matching.find_duplicates", lambda: duplicate_detector.find_duplicates(
+            patient, exclude_id=patient["_id"])),
+        ("mongo.update_patient", lambda: mongo_db.update_patient(ids["patient_id"], {"nom": "Nom"})),
+        ("mongo.add_patient+delete_patient", add_delete_patient),
+        ("neo4j.find_node(Patient)", lambda: neo4j_db.find_node("Patient", "id", ids["patient_id"])),
+        ("neo4j.get_patients_assigned_to_medecin", lambda: neo4j_db.get_patients_assigned_to_medecin(ids["medecin_id"])),
+        ("neo4j.update_patient_node", lambda: neo4j_db.update_patient_node(ids["patient_id"], {"nom": "Nom"})),
+        ("neo4j.create+delete_patient_node", create_delete_patient_node),
+        ("neo4j.link+remove_medecin_traitant", link_unlink_medecin_traitant),
+    ]
+
+
+def endpoint_cases(app, ids):
+    """(name, callable) pairs calling each API route once through the Flask test client."""
+    from flask_jwt_extended import create_access_token
+
+    client = app.test_client()
+    with app.app_context():
+        tokens = {role: create_access_token(identity=ids[f"{role}_id"], expires_delta=False)
+                  for role in ("admin", "medecin", "patient")}
+
+    def call(method, path, role=None, body=None, expected=(200, 201)):
+        headers = {"Authorization": f"Bearer {tokens[role]}"} if role else {}
+        def request():
+            response = client.open(path, method=method, json=body() if callable(body) else body, headers=headers)
+            response.get_data()
+            if response.status_code not in expected:
+                raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return request
+
+    update_counter = iter(range(10 ** 9))
+
+    def create_delete_consultation():
+        headers = {"Authorization": f"Bearer {tokens['medecin']}"}
+        response = client.post("/medecin/consultations", headers=headers, json={
+            "patient_id": ids["patient_id"], "date_heure": "2025-06-01T10:00", "motif": "Benchmark"})
+        client.delete(f"/medecin/consultations/{response.get_json()['id']}", headers=headers)
+
+    def create_delete_patient():
+        headers = {"Authorization": f"Bearer {tokens['admin']}"}
+        response = client.post("/admin/patients", headers=headers, json={"nom": "Bench", "prenom": "Route"})
+        client.delete(f"/admin/patients/{response.get_json()['id']}", headers=headers)
+
+    return [
+        ("POST /login", call("POST", "/login", body={"username": ids["admin_username"], "password": "password123"})),
+        ("POST /login/medecin", call("POST", "/login/medecin", body={"username": ids["medecin_username"], "password": "password123"})),
+        ("POST /login/patient", call("POST", "/login/patient", body={"username": ids["patient_username"], "password": "password123"})),
+        ("GET /admin/patients", call("GET", "/admin/patients", "admin")),
+        ("GET /admin/patients/search", call("GET", f"/admin/patients/search?q={ids['patient_username'][:4]}", "admin")),
+        ("GET /admin/patients/<id>", call("GET", f"/admin/patients/{ids['patient_id']}", "admin")),
+        ("PUT /admin/patients/<id>", call("PUT", f"/admin/patients/{ids['patient_id']}", "admin",
+                                          lambda: {"adresse": f"{next(update_counter)} rue du Bench"})),
+        ("POST+DELETE /admin/patients", create_delete_patient),
+        ("POST /admin/patients/<id>/assign_medecin/<id>", call(
+            "POST", f"/admin/patients/{ids['patient_id']}/assign_medecin/{ids['medecin_id']}", "admin")),
+        ("GET /admin/stats", call("GET", "/admin/stats", "admin")),
+        ("GET /admin/medecins", call("GET", "/admin/medecins", "admin")),
+        ("GET /admin/medecins/<id>", call("GET", f"/admin/medecins/{ids['medecin_id']}", "admin")),
+        ("PUT /admin/medecins/<id>", call("PUT", f"/admin/medecins/{ids['medecin_id']}", "admin",
+                                          lambda: {"telephone": str(next(update_counter))})),
+        ("POST /admin/batch (10 updates)", call("POST", "/admin/batch", "admin", lambda: {"operations": [
+            {"action": "update", "entity": "patient", "id": ids["patient_id"], "data": {"adresse": str(next(update_counter))}}
+        ] + [{"action": "assign", "patient_id": ids["patient_id"], "medecin_id": ids["medecin_id"]}] * 9})),
+        ("GET /admin/export/consultations (1 day)", call(
+            "GET", f"/admin/export/consultations?start={ids['date_sample']}&end={ids['date_sample']}T99", "admin")),
+        ("GET /medecin/my_consultations", call("GET", "/medecin/my_consultations", "medecin")),
+        ("GET /medecin/mes_patients", call("GET", "/medecin/mes_patients", "medecin")),
+        ("GET /medecin/consultations/search", call("GET", "/medecin/consultations/search?q=douleur", "medecin")),
+        ("PUT /medecin/consultations/<id>", call("PUT", f"/medecin/consultations/{ids['consultation_id']}", "medecin",
+                                                 lambda: {"motif": f"Controle {next(update_counter)}"})),
+        ("POST+DELETE /medecin/consultations", create_delete_consultation),
+        ("GET /patient/historique_consultations", call("GET", "/patient/historique_consultations", "patient")),
+        ("GET /patient/consultations/search", call("GET", "/patient/consultations/search?q=suivi", "patient")),
+        ("PUT /patient/change_password", call("PUT", "/patient/change_password", "patient", {"new_password": "password123"},
+                                              expected=(200, 500))),
+    ]
+
+
+# --- Reporting ---
+def print_results(size, results):
+    print(f"\n=== {size} consultations ===")
+    print(f"{'case':<50}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mongo':>8}{'neo4j':>8}")
+    for name, r in results.items():
+        print(f"{name:<50}{r['iterations']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['mongo_calls']:>8.1f}{r['neo4j_calls']:>8.1f}")
+
+
+def compare_to_baseline(all_results, baseline, threshold, min_delta_ms):
+    """Returns a list of human-readable regressions against the baseline."""
+    regressions = []
+    for key, result in all_results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        if (result["p95_ms"] > reference["p95_ms"] * threshold
+                and result["p95_ms"] - reference["p95_ms"] > min_delta_ms):
+            regressions.append(f"{key}: p95 {reference['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        for calls in ("mongo_calls", "neo4j_calls"):
+            if result[calls] > reference[calls] + 0.01:
+                regressions.append(f"{key}: {calls} {reference[calls]:.1f} -> {result[calls]:.1f} par requete")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["mongo_neo4j", "memory"], default=config.STORAGE_BACKEND)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--iterations", type=int, default=200, help="maximum iterations per case")
+    parser.add_argument("--time-budget", type=float, default=5.0, help="seconds per case before stopping early")
+    parser.add_argument("--only", choices=["methods", "endpoints"], help="run only one family of cases")
+    parser.add_argument("--mongo-db", default="cabinet_medical_bench", help="Mongo database used for the benchmark")
+    parser.add_argument("--wipe", action="store_true", help="allow the harness to empty the bench database and the graph")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed p95 ratio against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 regressions smaller than this")
+    parser.add_argument("--output", help="write the raw results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.backend == "mongo_neo4j" and not args.wipe:
+        parser.error("le benchmark vide la base de test et le graphe Neo4j: relancer avec --wipe")
+
+    # Must happen before the data layer and the app are imported
+    config.STORAGE_BACKEND = args.backend
+    config.MONGO_DB_NAME = args.mongo_db
+
+    from benchmarks.dataset import ClinicDatasetGenerator, reset_stores
+    import app as api
+
+    mongo_db = api.mongo_db
+    neo4j_db = api.neo4j_db
+    counter = DBCallCounter()
+    all_results = {}
+
+    for size in args.sizes:
+        print(f"Preparation du jeu de donnees ({size} consultations)...")
+        reset_stores(mongo_db, neo4j_db)
+        ids = ClinicDatasetGenerator(mongo_db, neo4j_db).generate(
+            patients=max(10, size // 10), medecins=max(10, size // 1000), consultations=size, admins=1
+        )
+        cases = []
+        if args.only != "endpoints":
+            cases += data_layer_cases(mongo_db, neo4j_db, ids)
+        if args.only != "methods":
+            cases += endpoint_cases(api.app, ids)
+
+        results = {}
+        with counter.installed(type(neo4j_db)):
+            for name, fn in cases:
+                results[name] = run_case(fn, counter, args.iterations, args.time_budget)
+        print_results(size, results)
+        all_results.update({f"{args.backend}:{size}:{name}": r for name, r in results.items()})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(all_results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(all_results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline enregistree dans {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nAucune baseline: relancer avec --save-baseline pour en enregistrer une.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(all_results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("\nAucune regression par rapport a la baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
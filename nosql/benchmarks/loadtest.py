@@ -0,0 +1,215 @@
+"""
+Closed-loop load test against a running API.
+
+Each virtual user is a separate process that replays sessions back to back (no think
+time by default): admin, doctor or patient sessions drawn from a configurable mix,
+each one logging in first, then loading its dashboards, then writing. The test runs
+for `--duration` seconds at each concurrency level and reports throughput and latency
+percentiles per level, i.e. the throughput/latency curve as concurrency increases.
+
+Credentials come from the file written by the dataset generator:
+    python -m benchmarks.dataset --patients 10000 --consultations 100000 --reset --credentials-out credentials.json
+    python -m benchmarks.loadtest --url http://localhost:5001 --credentials credentials.json \
+        --concurrency 1 2 4 8 16 32 --duration 30
+"""
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import random
+import time
+from urllib.parse import urlsplit
+
+
+class ApiClient:
+    """
+    Minimal keep-alive JSON client (one persistent connection per virtual user) that
+    records the latency and status of every request it sends.
+    """
+
+    def __init__(self, base_url, samples, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.samples = samples  # list of (route name, latency seconds, status)
+        self.connection = None
+        self.token = None
+
+    def _send(self, method, path, payload, headers):
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def call(self, name, method, path, body=None):
+        """Sends a request, records it under `name` and returns (status, decoded JSON or None)."""
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            status, data = self._send(method, path, payload, headers)
+        except (http.client.HTTPException, OSError):
+            status, data = None, b""
+        self.samples.append((name, time.perf_counter() - start, status))
+        try:
+            decoded = json.loads(data) if data else None
+        except ValueError:
+            decoded = None
+        return status, decoded
+
+    def login(self, name, path, username, password):
+        """Logs in and keeps the access token for the following requests."""
+        status, body = self.call(name, "POST", path, {"username": username, "password": password})
+        self.token = body.get("access_token") if status == 200 and isinstance(body, dict) else None
+        return self.token is not None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# --- Sessions: login, then dashboards, then writes ---
+def admin_session(client, rng, credentials):
+    if not client.login("POST /login", "/login", rng.choice(credentials["admins"]), credentials["password"]):
+        return
+    client.call("GET /admin/patients", "GET", "/admin/patients")
+    client.call("GET /admin/medecins", "GET", "/admin/medecins")
+    patient = rng.choice(credentials["patients"])
+    client.call("PUT /admin/patients/<id>", "PUT", f"/admin/patients/{patient['id']}",
+                {"telephone": f"06{rng.randint(0, 99999999):08d}"})
+    medecin = rng.choice(credentials["medecins"])
+    client.call("POST /admin/patients/<id>/assign_medecin/<id>", "POST",
+                f"/admin/patients/{patient['id']}/assign_medecin/{medecin['id']}")
+
+
+def medecin_session(client, rng, credentials):
+    medecin = rng.choice(credentials["medecins_with_patients"] or credentials["medecins"])
+    if not client.login("POST /login/medecin", "/login/medecin", medecin["username"], credentials["password"]):
+        return
+    client.call("GET /medecin/mes_patients", "GET", "/medecin/mes_patients")
+    client.call("GET /medecin/my_consultations", "GET", "/medecin/my_consultations")
+    if not medecin["patient_ids"]:
+        return
+    status, created = client.call("POST /medecin/consultations", "POST", "/medecin/consultations", {
+        "patient_id": rng.choice(medecin["patient_ids"]),
+        "date_heure": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(8, 18):02d}:00",
+        "motif": "Consultation de charge",
+    })
+    if status == 201 and isinstance(created, dict):
+        client.call("PUT /medecin/consultations/<id>", "PUT", f"/medecin/consultations/{created['id']}",
+                    {"motif": "Consultation de charge (suivi)"})
+
+
+def patient_session(client, rng, credentials):
+    patient = rng.choice(credentials["patients"])
+    if not client.login("POST /login/patient", "/login/patient", patient["username"], credentials["password"]):
+        return
+    client.call("GET /patient/historique_consultations", "GET", "/patient/historique_consultations")
+
+
+SESSIONS = {"admin": admin_session, "medecin": medecin_session, "patient": patient_session}
+
+
+def virtual_user(worker_id, base_url, credentials, mix, duration, think_time, seed, results):
+    """Runs sessions back to back until `duration` elapses and sends its samples to `results`."""
+    rng = random.Random(seed * 1000 + worker_id)
+    samples = []
+    kinds, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        client = ApiClient(base_url, samples)
+        SESSIONS[rng.choices(kinds, weights)[0]](client, rng, credentials)
+        client.close()
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+    results.put(samples)
+
+
+def percentile(sorted_values, pct):
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_level(concurrency, args, credentials, mix):
+    """Runs one concurrency level and returns its aggregated statistics."""
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=virtual_user, args=(
+            i, args.url, credentials, mix, args.duration, args.think_time, args.seed, results))
+        for i in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = []
+    for _ in workers:
+        samples.extend(results.get())
+    for worker in workers:
+        worker.join()
+
+    latencies = sorted(latency for _, latency, _ in samples)
+    errors = sum(1 for _, _, status in samples if status is None or status >= 500)
+    per_route = {}
+    for name, latency, status in samples:
+        per_route.setdefault(name, []).append(latency)
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "throughput": len(samples) / args.duration,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else 0,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else 0,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else 0,
+        "routes": {name: {"count": len(values), "p95_ms": percentile(sorted(values), 95) * 1000}
+                   for name, values in per_route.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--credentials", required=True, help="fichier JSON ecrit par benchmarks.dataset")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=30, help="secondes par niveau de concurrence")
+    parser.add_argument("--mix", default="admin=1,medecin=4,patient=5", help="poids des types de sessions")
+    parser.add_argument("--think-time", type=float, default=0, help="pause moyenne entre sessions (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="ecrit les resultats en JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.credentials) as f:
+        summary = json.load(f)
+    credentials = {**summary["credentials"], "password": summary["password"]}
+    credentials["medecins_with_patients"] = [m for m in credentials["medecins"] if m["patient_ids"]]
+    mix = {kind: float(weight) for kind, weight in (item.split("=") for item in args.mix.split(","))}
+    if not credentials["admins"]:
+        mix.pop("admin", None)
+
+    levels = []
+    print(f"{'users':>6}{'req':>9}{'req/s':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        level = run_level(concurrency, args, credentials, mix)
+        levels.append(level)
+        print(f"{level['concurrency']:>6}{level['requests']:>9}{level['throughput']:>10.1f}{level['errors']:>8}"
+              f"{level['p50_ms']:>10.1f}{level['p95_ms']:>10.1f}{level['p99_ms']:>10.1f}")
+
+    print("\np95 par route au dernier niveau:")
+    for name, route in sorted(levels[-1]["routes"].items()):
+        print(f"  {name:<50}{route['count']:>8}{route['p95_ms']:>10.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(levels, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
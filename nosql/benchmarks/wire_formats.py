@@ -0,0 +1,118 @@
+"""
+Wire format benchmark: bytes on the wire and server CPU time of API responses, for each
+Accept / Accept-Encoding combination a client can send.
+
+Requests go through the Flask test client, so the numbers cover the served path: the
+negotiating JSON provider behind jsonify (JSON or MessagePack), then the compression
+middleware (COMPRESSION_MIN_SIZE for buffered responses, COMPRESSION_STREAM_FLUSH_SIZE
+for the streamed exports). The stores are the in-memory engines, so the database cost
+is the same for every combination of a route.
+
+Usage (from the nosql/ directory):
+    python -m benchmarks.wire_formats --consultations 10000
+"""
+import argparse
+import random
+import time
+
+from bson.objectid import ObjectId
+
+import config
+
+MOTIFS = ["Controle annuel", "Douleur thoracique", "Fievre persistante", "Suivi diabete",
+          "Renouvellement ordonnance", "Migraine", "Douleur lombaire", "Vaccination"]
+
+
+def seed_consultations(mongo_db, count, patients=2000, seed=42):
+    """
+    Stores an admin, a doctor, `patients` patients and `count` consultations of that doctor.
+    Returns (admin id, doctor id).
+    """
+    rng = random.Random(seed)
+    admin_id = mongo_db.add_user({"username": "bench_admin", "password": "password123", "role": "admin"})
+    medecin_id = mongo_db.add_medecin({"nom": "Bench", "prenom": "Medecin", "specialite": "Generaliste",
+                                       "username": "bench.medecin_medecin", "password": "password123"})
+    patient_docs = [{"_id": ObjectId(), "nom": f"Nom{rng.randint(1, 500)}", "prenom": f"Prenom{rng.randint(1, 500)}"}
+                    for _ in range(patients)]
+    mongo_db.get_collection("patients").insert_many(patient_docs)
+    mongo_db.get_collection("consultations").insert_many([{
+        "_id": ObjectId(),
+        "patient_id": str(rng.choice(patient_docs)["_id"]),
+        "medecin_id": medecin_id,
+        "date_heure": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(8, 18):02d}:{rng.choice(['00', '15', '30', '45'])}",
+        "motif": rng.choice(MOTIFS),
+    } for _ in range(count)])
+    return admin_id, medecin_id
+
+
+def measure(encode, repeat):
+    """Returns (payload, best CPU seconds) for `encode` over `repeat` runs."""
+    best = None
+    payload = None
+    for _ in range(repeat):
+        start = time.process_time()
+        payload = encode()
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return payload, best
+
+
+def run(count, repeat):
+    # Must happen before the data layer and the app are imported
+    config.STORAGE_BACKEND = "memory"
+    from flask_jwt_extended import create_access_token
+
+    import app as api
+    from middleware.compression import MSGPACK_MIMETYPE, brotli, msgpack
+
+    admin_id, medecin_id = seed_consultations(api.mongo_db, count)
+    client = api.app.test_client()
+    with api.app.app_context():
+        tokens = {"admin": create_access_token(identity=admin_id, expires_delta=False),
+                  "medecin": create_access_token(identity=medecin_id, expires_delta=False)}
+
+    buffered = ["application/json"] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+    cases = [
+        ("GET /admin/medecins/<id>", f"/admin/medecins/{medecin_id}", "admin", buffered),
+        ("GET /medecin/my_consultations", "/medecin/my_consultations", "medecin", buffered),
+        ("GET /admin/export/consultations", "/admin/export/consultations?format=ndjson", "admin", [None]),
+        ("GET /admin/export/consultations", "/admin/export/consultations?format=csv", "admin", [None]),
+    ]
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"{count} consultations (gzip level {config.COMPRESSION_LEVEL}, brotli quality {config.BROTLI_QUALITY}, "
+          f"seuil {config.COMPRESSION_MIN_SIZE} o, flush {config.COMPRESSION_STREAM_FLUSH_SIZE} o)")
+    print(f"{'route':<34}{'format':<22}{'accepted':<10}{'served':<10}{'bytes':>12}{'ratio':>8}{'cpu ms':>10}")
+    for name, path, role, accepts in cases:
+        for accept in accepts:
+            reference = None
+            for encoding in encodings:
+                headers = {"Authorization": f"Bearer {tokens[role]}", "Accept-Encoding": encoding}
+                if accept:
+                    headers["Accept"] = accept
+
+                def fetch():
+                    response = client.get(path, headers=headers)
+                    response.get_data()  # consumes streamed responses inside the timed section
+                    return response
+
+                response, cpu = measure(fetch, repeat)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+                size = len(response.get_data())
+                reference = reference or size
+                served = response.headers.get("Content-Encoding", "identity")
+                print(f"{name:<34}{response.mimetype:<22}{encoding:<10}{served:<10}{size:>12}{size / reference:>8.2f}"
+                      f"{cpu * 1000:>10.1f}")
+    if msgpack is None:
+        print("msgpack non installe: format MessagePack ignore.")
+    if brotli is None:
+        print("brotli non installe: encodage br ignore.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultations", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.consultations, args.repeat)
@@ -1,8 +1,74 @@
 # config.py
+import os
+
+# Storage backend: "mongo_neo4j" (MongoDB + Neo4j servers) or "memory" (in-process engines, no server)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "mongo_neo4j")
 
 MONGO_URI = "mongodb://localhost:27017/"
 MONGO_DB_NAME = "cabinet_medical_db"
 
-NEO4J_URI = "bolt://localhost:7687"
+# neo4j:// enables routing: with a cluster, read transactions are served by followers
+NEO4J_URI = "neo4j://localhost:7687"
 NEO4J_USER = "ali"
-NEO4J_PASSWORD = "alialiali" 
\ No newline at end of file
+NEO4J_PASSWORD = "alialiali" 
+NEO4J_DATABASE = None  # None: the server's default database
+
+# Maximum number of operations accepted by a single /admin/batch request
+BATCH_MAX_OPERATIONS = 500
+
+# Response compression (gzip, brotli if installed) and MessagePack negotiation
+COMPRESSION_MIN_SIZE = 1024  # bytes; smaller buffered responses are sent as-is
+COMPRESSION_LEVEL = 6        # gzip level (1-9)
+COMPRESSION_STREAM_FLUSH_SIZE = 32 * 1024  # bytes of input between two flushes of a compressed stream
+BROTLI_QUALITY = 4           # brotli quality (0-11)
+MSGPACK_ENABLED = True       # serve application/msgpack when requested and msgpack is installed
+
+# Streaming exports
+EXPORT_BATCH_SIZE = 2000         # documents fetched per cursor round trip
+EXPORT_NAME_CACHE_SIZE = 10000   # doctor/patient names kept in the bounded lookup cache
+
+# Number of most recent consultations kept in each patient_summaries document
+PATIENT_SUMMARY_SIZE = 50
+
+# Hot/cold tiering of consultations
+ARCHIVE_HORIZON_DAYS = 730             # consultations older than this are moved to consultations_archive
+ARCHIVE_BATCH_SIZE = 1000              # consultations moved per batch
+ARCHIVE_BLOCK_COMPRESSOR = "zstd"      # WiredTiger block compressor of the archive collection
+ARCHIVE_HORIZON_CACHE_SECONDS = 60     # how long the API caches the archive horizon
+
+# Single-flight coalescing of concurrent identical reads on hot endpoints
+COALESCING_ENABLED = True
+
+# Cache of treating-physician assignments (medecin id -> assigned patient ids), per process
+ASSIGNMENT_CACHE_SIZE = 1000      # doctors kept; 0 disables the cache
+ASSIGNMENT_CACHE_TTL = 300        # seconds; bounds staleness for writes made by other processes
+ASSIGNMENT_CACHE_WARMUP = 50      # most active doctors loaded at startup; 0 disables the warm-up
+
+# Graph maintenance: duplicate node groups merged per batch by maintenance.dedup_graph_nodes
+DEDUP_BATCH_SIZE = 1000
+
+# Neo4j timeouts and circuit breaker
+NEO4J_QUERY_TIMEOUT = 5.0                  # seconds; server-side transaction timeout of each query
+NEO4J_BULK_QUERY_TIMEOUT = 600.0           # seconds; timeout of maintenance and bulk queries (outside the breaker)
+NEO4J_BULK_ROWS = 500                      # UNWIND queries above this many rows run as bulk queries
+NEO4J_CONNECTION_TIMEOUT = 3.0             # seconds to establish a connection
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = 5.0 # seconds to obtain a connection from the pool
+NEO4J_MAX_TRANSACTION_RETRY_TIME = 5.0     # seconds during which transient errors of a query are retried
+NEO4J_BREAKER_FAILURE_THRESHOLD = 5        # consecutive failures (or slow calls) that open the breaker
+NEO4J_BREAKER_SLOW_CALL_SECONDS = 2.0      # a query slower than this counts as a failure
+NEO4J_BREAKER_RESET_SECONDS = 30           # time the breaker stays open before a trial query
+
+# Patient search (/admin/patients/search)
+PATIENT_SEARCH_DEFAULT_LIMIT = 20   # results returned when no limit is given
+PATIENT_SEARCH_MAX_LIMIT = 50       # upper bound of the limit parameter
+PATIENT_SEARCH_CANDIDATES = 200     # documents read from the index before ranking
+
+# Full-text consultation search
+CONSULTATION_SEARCH_PER_PAGE = 20       # results per page when per_page is not given
+CONSULTATION_SEARCH_MAX_PER_PAGE = 100  # upper bound of per_page
+CONSULTATION_SEARCH_MAX_PAGE = 50       # deepest page served (each page re-reads the previous ones)
+
+# Patient duplicate detection
+DUPLICATE_SCORE_THRESHOLD = 0.9   # similarity from which two patients are reported as probable duplicates
+DUPLICATE_CANDIDATE_LIMIT = 50    # candidates read per blocking lookup on create
+DUPLICATE_MAX_BLOCK_SIZE = 200    # larger blocks (very common name + date) are skipped by the batch scan
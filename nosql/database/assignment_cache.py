@@ -0,0 +1,112 @@
+"""
+Bounded in-process cache of treating-physician assignments: medecin id -> ids of the
+patients linked to it by A_POUR_MEDECIN_TRAITANT.
+
+Entries are kept exact by relationship-level invalidation: linking or unlinking a
+patient updates the cached set of that doctor in place, deleting a patient removes it
+from every cached set (through a reverse index), deleting a doctor drops its entry.
+A TTL bounds staleness for writes made by other processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from middleware import metrics
+
+
+class AssignmentCache:
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = config.ASSIGNMENT_CACHE_SIZE if max_size is None else max_size
+        self.ttl = config.ASSIGNMENT_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # medecin_id -> (set of patient ids, loaded_at)
+        self._by_patient = {}          # patient_id -> set of cached medecin ids holding it
+        # Bumped by every invalidation; a load started before an invalidation is not stored.
+        self._generation = 0
+
+    def generation(self):
+        """Token to pass to put() so that a load racing with a write is discarded."""
+        with self._lock:
+            return self._generation
+
+    def get(self, medecin_id):
+        """Returns the cached patient ids of a doctor (as a list), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(medecin_id)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                self._drop(medecin_id)
+                entry = None
+            if entry is None:
+                metrics.increment("assignment_cache.misses")
+                return None
+            self._entries.move_to_end(medecin_id)
+            metrics.increment("assignment_cache.hits")
+            return list(entry[0])
+
+    def put(self, medecin_id, patient_ids, generation=None):
+        """Stores the patient ids of a doctor, unless an invalidation happened since `generation`."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._drop(medecin_id)
+            patient_ids = set(patient_ids)
+            self._entries[medecin_id] = (patient_ids, time.monotonic())
+            for patient_id in patient_ids:
+                self._by_patient.setdefault(patient_id, set()).add(medecin_id)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                metrics.increment("assignment_cache.evictions")
+
+    # --- Invalidation ---
+    def add_link(self, patient_id, medecin_id):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(medecin_id)
+            if entry is not None:
+                entry[0].add(patient_id)
+                self._by_patient.setdefault(patient_id, set()).add(medecin_id)
+
+    def remove_link(self, patient_id, medecin_id):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(medecin_id)
+            if entry is not None:
+                entry[0].discard(patient_id)
+                self._unindex(patient_id, medecin_id)
+
+    def remove_patient(self, patient_id):
+        with self._lock:
+            self._generation += 1
+            for medecin_id in self._by_patient.pop(patient_id, ()):
+                self._entries[medecin_id][0].discard(patient_id)
+
+    def remove_medecin(self, medecin_id):
+        with self._lock:
+            self._generation += 1
+            self._drop(medecin_id)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_patient.clear()
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _drop(self, medecin_id):
+        entry = self._entries.pop(medecin_id, None)
+        if entry is not None:
+            for patient_id in entry[0]:
+                self._unindex(patient_id, medecin_id)
+
+    def _unindex(self, patient_id, medecin_id):
+        medecins = self._by_patient.get(patient_id)
+        if medecins is not None:
+            medecins.discard(medecin_id)
+            if not medecins:
+                del self._by_patient[patient_id]
@@ -0,0 +1,22 @@
+"""
+Storage backend selection (config.STORAGE_BACKEND):
+- "mongo_neo4j": MongoDB server + Neo4j server (default);
+- "memory": in-process document engine and graph, no server needed.
+"""
+import config
+from database.mongo_db import MongoDB
+
+BACKENDS = ("mongo_neo4j", "memory")
+
+
+def create_stores(backend=None):
+    """Returns a (document store, graph store) pair for the configured backend."""
+    backend = backend or config.STORAGE_BACKEND
+    if backend == "memory":
+        from database.memory_graph import MemoryGraphDB
+        from database.memory_store import MemoryClient
+        return MongoDB(client=MemoryClient()), MemoryGraphDB()
+    if backend == "mongo_neo4j":
+        from database.neo4j_db import Neo4jDB
+        return MongoDB(), Neo4jDB()
+    raise ValueError(f"Backend de stockage inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
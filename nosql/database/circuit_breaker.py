@@ -0,0 +1,75 @@
+"""
+Circuit breaker for a remote backend.
+
+closed: calls go through; consecutive failures (errors, or calls slower than the latency
+threshold) are counted and the breaker opens when they reach the failure threshold.
+open: calls are rejected immediately until the reset timeout has elapsed.
+half_open: a single trial call goes through; its success closes the breaker, its
+failure opens it again.
+"""
+import threading
+import time
+
+from middleware import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, slow_call_seconds, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        metrics.register_gauge(f"{name}.breaker.state", self.state)
+
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """True if a call may go through now (the caller must then report its outcome)."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        metrics.increment(f"{self.name}.breaker.rejected")
+        return False
+
+    def record_success(self, duration):
+        """Reports a successful call; a call slower than the latency threshold counts as a failure."""
+        if self.slow_call_seconds and duration > self.slow_call_seconds:
+            metrics.increment(f"{self.name}.breaker.slow_calls")
+            self.record_failure()
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    metrics.increment(f"{self.name}.breaker.opened")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
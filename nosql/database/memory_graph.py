@@ -0,0 +1,296 @@
+"""
+In-process graph backend: nodes in dicts indexed by (label, id) and relationships in
+adjacency lists, implementing the same GraphStore primitives as Neo4jDB (including
+get_patients_assigned_to_medecin) without a Neo4j server.
+"""
+import itertools
+import threading
+
+from database.storage import GraphStore
+
+
+class MemoryGraphDB(GraphStore):
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = itertools.count()
+        self._writes = itertools.count()  # write order of the nodes (Neo4jDB's WRITTEN_AT)
+        self.clear()
+
+    def _execute_query(self, operation, *args):
+        """Runs a graph operation atomically (the in-process counterpart of a Cypher query)."""
+        with self._lock:
+            return operation(*args)
+
+    # --- Lifecycle ---
+    def close(self):
+        pass
+
+    def ensure_indexes(self):
+        pass
+
+    def transaction(self):
+        """Holds the store lock for the enclosed block, so it is applied atomically (no rollback)."""
+        return self._lock
+
+    def clear(self):
+        with self._lock:
+            self._nodes = {}     # key -> {"label": str, "props": dict, "written": write order}
+            self._labels = {}    # label -> {key: None} (ordered set)
+            self._by_id = {}     # (label, id) -> [keys]
+            self._out = {}       # key -> {rel_type: {target key: props}}
+            self._in = {}        # key -> {rel_type: {source key: props}}
+
+    # --- Internals ---
+    def _match(self, label, property_name, property_value):
+        if property_name == "id":
+            return list(self._by_id.get((label, property_value), ()))
+        return [key for key in self._labels.get(label, ())
+                if self._nodes[key]["props"].get(property_name) == property_value]
+
+    def _add_node(self, label, properties):
+        key = next(self._keys)
+        props = {k: v for k, v in properties.items() if v is not None}
+        self._nodes[key] = {"label": label, "props": props, "written": next(self._writes)}
+        self._labels.setdefault(label, {})[key] = None
+        if "id" in props:
+            self._by_id.setdefault((label, props["id"]), []).append(key)
+        self._out[key], self._in[key] = {}, {}
+        return key
+
+    def _merge_node(self, label, properties):
+        """MERGE on `id`: updates the existing node with this id, or creates it. Returns (key, created)."""
+        keys = self._by_id.get((label, properties.get("id")), ()) if "id" in properties else ()
+        if keys:
+            self._set_props(keys[0], properties)
+            return keys[0], False
+        return self._add_node(label, properties), True
+
+    def _set_props(self, key, properties):
+        node = self._nodes[key]
+        node["written"] = next(self._writes)
+        old_id = node["props"].get("id")
+        for k, v in properties.items():
+            if v is None:
+                node["props"].pop(k, None)
+            else:
+                node["props"][k] = v
+        new_id = node["props"].get("id")
+        if new_id != old_id:
+            if old_id is not None:
+                self._by_id[(node["label"], old_id)].remove(key)
+            if new_id is not None:
+                self._by_id.setdefault((node["label"], new_id), []).append(key)
+        return len(properties)
+
+    def _remove_node(self, key):
+        node = self._nodes.pop(key)
+        del self._labels[node["label"]][key]
+        if "id" in node["props"]:
+            keys = self._by_id[(node["label"], node["props"]["id"])]
+            keys.remove(key)
+            if not keys:
+                del self._by_id[(node["label"], node["props"]["id"])]
+        for rel_type, targets in self._out.pop(key).items():
+            for target in targets:
+                self._in[target][rel_type].pop(key, None)
+        for rel_type, sources in self._in.pop(key).items():
+            for source in sources:
+                self._out[source][rel_type].pop(key, None)
+
+    def _link(self, from_key, to_key, rel_type, properties):
+        """MERGE semantics: returns (props, created)."""
+        targets = self._out[from_key].setdefault(rel_type, {})
+        if to_key in targets:
+            return targets[to_key], False
+        props = dict(properties)
+        targets[to_key] = props
+        self._in[to_key].setdefault(rel_type, {})[from_key] = props
+        return props, True
+
+    def _unlink(self, from_key, to_key, rel_type):
+        if self._out[from_key].get(rel_type, {}).pop(to_key, None) is None:
+            return False
+        self._in[to_key][rel_type].pop(from_key, None)
+        return True
+
+    def _props(self, key):
+        return dict(self._nodes[key]["props"])
+
+    def _neighbours(self, key, rel_type, direction="out", label=None):
+        adjacency = self._out if direction == "out" else self._in
+        return [other for other in adjacency[key].get(rel_type, ())
+                if label is None or self._nodes[other]["label"] == label]
+
+    # --- CRUD for Nodes ---
+    def create_node(self, label, properties):
+        return self._execute_query(lambda: self._props(self._merge_node(label, properties)[0]))
+
+    def find_node(self, label, property_name, property_value):
+        def operation():
+            keys = self._match(label, property_name, property_value)
+            return self._props(keys[0]) if keys else None
+        return self._execute_query(operation)
+
+    def update_node(self, label, match_prop_name, match_prop_value, new_properties):
+        def operation():
+            keys = self._match(label, match_prop_name, match_prop_value)
+            for key in keys:
+                self._set_props(key, new_properties)
+            return self._props(keys[0]) if keys else None
+        return self._execute_query(operation)
+
+    def delete_node(self, label, property_name, property_value):
+        def operation():
+            keys = self._match(label, property_name, property_value)
+            for key in keys:
+                self._remove_node(key)
+            return len(keys) > 0
+        return self._execute_query(operation)
+
+    # --- Relationship Management ---
+    def create_relationship(self, from_label, from_prop_name, from_prop_value,
+                            to_label, to_prop_name, to_prop_value,
+                            rel_type, rel_properties={}):
+        def operation():
+            result = None
+            for from_key in self._match(from_label, from_prop_name, from_prop_value):
+                for to_key in self._match(to_label, to_prop_name, to_prop_value):
+                    props, _ = self._link(from_key, to_key, rel_type, rel_properties)
+                    result = result or dict(props)
+            return result
+        return self._execute_query(operation)
+
+    def delete_relationship(self, from_label, from_prop_name, from_prop_value,
+                            to_label, to_prop_name, to_prop_value,
+                            rel_type):
+        def operation():
+            deleted = False
+            for from_key in self._match(from_label, from_prop_name, from_prop_value):
+                for to_key in self._match(to_label, to_prop_name, to_prop_value):
+                    deleted = self._unlink(from_key, to_key, rel_type) or deleted
+            return deleted
+        return self._execute_query(operation)
+
+    # --- Batch Operations ---
+    def create_nodes(self, label, rows):
+        return self._execute_query(lambda: sum(self._merge_node(label, row)[1] for row in rows))
+
+    def update_nodes(self, label, rows):
+        def operation():
+            return sum(self._set_props(key, row["props"])
+                       for row in rows for key in self._match(label, "id", row["id"]))
+        return self._execute_query(operation)
+
+    def delete_nodes(self, label, ids):
+        def operation():
+            deleted = 0
+            for node_id in ids:
+                for key in self._match(label, "id", node_id):
+                    self._remove_node(key)
+                    deleted += 1
+            return deleted
+        return self._execute_query(operation)
+
+    def create_relationships(self, from_label, to_label, rel_type, pairs):
+        def operation():
+            created = 0
+            for pair in pairs:
+                for from_key in self._match(from_label, "id", pair["from_id"]):
+                    for to_key in self._match(to_label, "id", pair["to_id"]):
+                        created += self._link(from_key, to_key, rel_type, {})[1]
+            return created
+        return self._execute_query(operation)
+
+    # --- Maintenance ---
+    def dedup_nodes(self, label, batch_size):
+        def operation():
+            groups = [sorted(keys, key=lambda k: self._nodes[k]["written"]) for (node_label, _), keys
+                      in self._by_id.items() if node_label == label and len(keys) > 1][:batch_size]
+            removed = 0
+            for keys in groups:
+                keep, duplicates = keys[0], keys[1:]
+                for dup in duplicates:
+                    self._set_props(keep, self._nodes[dup]["props"])
+                    self._move_relationships(keep, dup)
+                    self._remove_node(dup)
+                    removed += 1
+            return removed
+        return self._execute_query(operation)
+
+    def merge_nodes(self, label, keep_id, duplicate_id):
+        def operation():
+            keep_keys, duplicate_keys = self._match(label, "id", keep_id), self._match(label, "id", duplicate_id)
+            if not keep_keys or not duplicate_keys or keep_id == duplicate_id:
+                return False
+            keep = keep_keys[0]
+            for dup in duplicate_keys:
+                self._move_relationships(keep, dup)
+                self._remove_node(dup)
+            return True
+        return self._execute_query(operation)
+
+    def _move_relationships(self, keep, dup):
+        for rel_type, targets in self._out[dup].items():
+            for target, props in targets.items():
+                if target != keep:
+                    self._link(keep, target, rel_type, {})[0].update(props)
+        for rel_type, sources in self._in[dup].items():
+            for source, props in sources.items():
+                if source != keep:
+                    self._link(source, keep, rel_type, {})[0].update(props)
+
+    # --- Graph Queries ---
+    def get_patients_assigned_to_medecin(self, medecin_id):
+        def operation():
+            patient_ids = []
+            for medecin_key in self._match("Medecin", "id", medecin_id):
+                for patient_key in self._neighbours(medecin_key, "A_POUR_MEDECIN_TRAITANT", "in", "Patient"):
+                    patient_ids.append(self._nodes[patient_key]["props"].get("id"))
+            return patient_ids
+        return self._execute_query(operation)
+
+    def count_patients_assigned_to_medecins(self, medecin_ids):
+        def operation():
+            counts = {}
+            for medecin_id in medecin_ids:
+                counts[medecin_id] = sum(
+                    len(self._neighbours(medecin_key, "A_POUR_MEDECIN_TRAITANT", "in", "Patient"))
+                    for medecin_key in self._match("Medecin", "id", medecin_id))
+            return counts
+        return self._execute_query(operation)
+
+    def get_medecins_traitants_of_patients(self, patient_ids):
+        def operation():
+            medecin_ids = {}
+            for patient_id in patient_ids:
+                for patient_key in self._match("Patient", "id", patient_id):
+                    for medecin_key in self._neighbours(patient_key, "A_POUR_MEDECIN_TRAITANT", "out", "Medecin"):
+                        medecin_ids[self._nodes[medecin_key]["props"].get("id")] = None
+            return list(medecin_ids)
+        return self._execute_query(operation)
+
+    def collapse_consultation_nodes(self, consultation_ids):
+        def operation():
+            groups = {}  # (patient key, medecin key) -> {consultation id: date_heure}
+            to_delete = []
+            for consultation_id in consultation_ids:
+                for key in self._match("Consultation", "id", consultation_id):
+                    to_delete.append(key)
+                    date_heure = self._nodes[key]["props"].get("date_heure")
+                    for patient_key in self._neighbours(key, "CONSULTE", "in", "Patient"):
+                        for medecin_key in self._neighbours(key, "EST_ASSIGNEE_A", "out", "Medecin"):
+                            groups.setdefault((patient_key, medecin_key), {})[consultation_id] = date_heure
+            for (patient_key, medecin_key), consultations in groups.items():
+                props, _ = self._link(patient_key, medecin_key, "HISTORIQUE_CONSULTATIONS", {})
+                dates = [d for d in consultations.values() if d is not None]
+                props["nombre"] = props.get("nombre", 0) + len(consultations)
+                if dates:
+                    first, last = min(dates), max(dates)
+                    if props.get("premiere_consultation") is None or first < props["premiere_consultation"]:
+                        props["premiere_consultation"] = first
+                    if props.get("derniere_consultation") is None or last > props["derniere_consultation"]:
+                        props["derniere_consultation"] = last
+            for key in to_delete:
+                self._remove_node(key)
+            return len(to_delete)
+        return self._execute_query(operation)
@@ -0,0 +1,796 @@
+"""
+In-process document engine exposing the subset of the pymongo client API used by
+`MongoDB`: collections are dicts keyed by _id with hash indexes on the fields passed
+to create_index, so `MongoDB(client=MemoryClient())` runs without a mongod server.
+
+Supported:
+- queries: equality (dotted paths, array membership), $eq $ne $in $nin $gt $gte $lt $lte
+  $exists $regex, $and $or $nor, $text (terms OR'ed, "-term" negation, accent- and
+  case-insensitive; no stemming nor phrases) with {"$meta": "textScore"} projection/sort;
+- updates: $set $unset $inc $min $max $push ($each/$sort/$slice) $addToSet $pull
+  $setOnInsert, filtered positional operators ($[name] with array_filters), upserts;
+- find cursors with sort/skip/limit, projections, count_documents, bulk_write (with the
+  InsertOp / UpdateOp / DeleteOp operations of database.mongo_db),
+  unique indexes (DuplicateKeyError / BulkWriteError with code 11000);
+- aggregate: $match $project $unwind $group ($sum $push) $sort $limit;
+- collection rename (dropTarget) for staging-and-swap rebuilds.
+"""
+import copy
+import re
+import threading
+from types import SimpleNamespace
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from database.mongo_db import DeleteOp, InsertOp, UpdateOp
+from database.normalization import tokenize
+
+DUPLICATE_KEY = 11000
+_MISSING = object()
+
+
+# --- Document paths ---
+def _resolve(value, parts):
+    """Values found at a dotted path, traversing arrays of subdocuments like MongoDB does."""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        if parts[0] in value:
+            return _resolve(value[parts[0]], parts[1:])
+        return []
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _resolve(value[index], parts[1:]) if index < len(value) else []
+        found = []
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_resolve(item, parts))
+        return found
+    return []
+
+
+def get_values(document, path):
+    """Candidate values of `path` for matching: each value, plus the elements of array values."""
+    values = []
+    for value in _resolve(document, path.split(".")):
+        values.append(value)
+        if isinstance(value, list):
+            values.extend(value)
+    return values
+
+
+def _type_rank(value):
+    if value is None or value is _MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 5
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 6
+    return 7
+
+
+def sort_key(value):
+    """Orders values of mixed types the way MongoDB does (null < numbers < strings < ...)."""
+    rank = _type_rank(value)
+    if rank in (0, 3, 4):
+        return (rank, str(value) if rank else "")
+    return (rank, value)
+
+
+# --- Query matching ---
+def _compare(values, operand, op):
+    for value in values:
+        if _type_rank(value) != _type_rank(operand):
+            continue
+        try:
+            if op(value, operand):
+                return True
+        except TypeError:
+            continue
+    return False
+
+
+def _regex(condition):
+    pattern = condition["$regex"]
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option in condition.get("$options", ""):
+        flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def match_condition(values, condition):
+    """True if the values of a field satisfy `condition` (a literal or an operator dict)."""
+    if isinstance(condition, re.Pattern):
+        return any(isinstance(v, str) and condition.search(v) for v in values)
+    if not (isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)):
+        if condition is None and not values:
+            return True
+        return any(v == condition for v in values)
+
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            ok = match_condition(values, operand)
+        elif operator == "$ne":
+            ok = not match_condition(values, operand)
+        elif operator == "$in":
+            ok = any(match_condition(values, candidate) for candidate in operand)
+        elif operator == "$nin":
+            ok = not any(match_condition(values, candidate) for candidate in operand)
+        elif operator == "$gt":
+            ok = _compare(values, operand, lambda a, b: a > b)
+        elif operator == "$gte":
+            ok = _compare(values, operand, lambda a, b: a >= b)
+        elif operator == "$lt":
+            ok = _compare(values, operand, lambda a, b: a < b)
+        elif operator == "$lte":
+            ok = _compare(values, operand, lambda a, b: a <= b)
+        elif operator == "$exists":
+            ok = bool(values) == bool(operand)
+        elif operator == "$regex":
+            regex = _regex(condition)
+            ok = any(isinstance(v, str) and regex.search(v) for v in values)
+        elif operator == "$options":
+            ok = True
+        elif operator == "$not":
+            ok = not match_condition(values, operand)
+        elif operator == "$size":
+            ok = any(isinstance(v, list) and len(v) == operand for v in values)
+        else:
+            raise NotImplementedError(f"Operateur de requete non supporte par le moteur memoire: {operator}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(document, query):
+    """True if `document` matches the MongoDB `query`."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub) for sub in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Operateur de requete non supporte par le moteur memoire: {key}")
+        elif not match_condition(get_values(document, key), condition):
+            return False
+    return True
+
+
+def _is_text_score(value):
+    return isinstance(value, dict) and value.get("$meta") == "textScore"
+
+
+# --- Projections ---
+def project(document, projection, score=None):
+    """Applies an inclusion or exclusion projection ({"$meta": "textScore"} fields receive `score`)."""
+    if not projection:
+        return document
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    meta_fields = [k for k, v in projection.items() if _is_text_score(v)]
+    if meta_fields:
+        projection = {k: v for k, v in projection.items() if k not in meta_fields}
+        result = project(document, projection) if projection else document
+        for field in meta_fields:
+            result[field] = score
+        return result
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(fields.values()):
+        result = {}
+        for field in fields:
+            head = field.split(".")[0]
+            if head in document:
+                result[head] = document[head]
+    else:
+        result = {k: v for k, v in document.items() if k not in fields}
+    if include_id and "_id" in document:
+        result["_id"] = document["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+# --- Aggregation ---
+def _group_value(document, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        return (get_values(document, expression[1:]) or [None])[0]
+    return expression
+
+
+def aggregate(documents, pipeline):
+    """Runs the supported aggregation stages over `documents` (copies)."""
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            documents = [d for d in documents if matches(d, spec)]
+        elif name == "$project":
+            documents = [project(d, spec) for d in documents]
+        elif name == "$unwind":
+            path = spec if isinstance(spec, str) else spec["path"]
+            field = path[1:]
+            documents = [{**d, field: value} for d in documents
+                         for value in (d.get(field) if isinstance(d.get(field), list) else [])]
+        elif name == "$group":
+            groups = {}
+            for document in documents:
+                key = _group_value(document, spec["_id"])
+                group = groups.setdefault(sort_key(key), {"_id": key})
+                for field, accumulator in spec.items():
+                    if field == "_id":
+                        continue
+                    (operator, expression), = accumulator.items()
+                    value = _group_value(document, expression)
+                    if operator == "$sum":
+                        group[field] = group.get(field, 0) + value
+                    elif operator == "$push":
+                        group.setdefault(field, []).append(value)
+                    else:
+                        raise NotImplementedError(f"Accumulateur non supporte par le moteur memoire: {operator}")
+            documents = list(groups.values())
+        elif name == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                documents.sort(key=lambda d: sort_key((get_values(d, field) or [None])[0]), reverse=direction < 0)
+        elif name == "$limit":
+            documents = documents[:spec]
+        else:
+            raise NotImplementedError(f"Etape d'agregation non supportee par le moteur memoire: {name}")
+    return documents
+
+
+# --- Updates ---
+def _array_filter_matches(element, identifier, array_filters):
+    for array_filter in array_filters or []:
+        for key, condition in array_filter.items():
+            head, _, rest = key.partition(".")
+            if head != identifier:
+                continue
+            values = get_values(element, rest) if rest else [element]
+            if not match_condition(values, condition):
+                return False
+    return True
+
+
+def _apply_at_path(container, parts, operation, array_filters):
+    """Calls operation(parent, key) for every target of a dotted update path."""
+    head, rest = parts[0], parts[1:]
+    if isinstance(container, list):
+        if head.startswith("$[") and head.endswith("]"):
+            identifier = head[2:-1]
+            for index, element in enumerate(container):
+                if not identifier or _array_filter_matches(element, identifier, array_filters):
+                    if rest:
+                        _apply_at_path(element, rest, operation, array_filters)
+                    else:
+                        operation(container, index)
+            return
+        index = int(head)
+        while len(container) <= index:
+            container.append(None)
+        if rest:
+            if not isinstance(container[index], (dict, list)):
+                container[index] = {}
+            _apply_at_path(container[index], rest, operation, array_filters)
+        else:
+            operation(container, index)
+        return
+    if not rest:
+        operation(container, head)
+        return
+    if not isinstance(container.get(head), (dict, list)):
+        container[head] = {}
+    _apply_at_path(container[head], rest, operation, array_filters)
+
+
+def _get(parent, key):
+    if isinstance(parent, list):
+        return parent[key] if key < len(parent) else _MISSING
+    return parent.get(key, _MISSING)
+
+
+def _push(parent, key, spec, unique=False):
+    current = _get(parent, key)
+    array = list(current) if isinstance(current, list) else []
+    if isinstance(spec, dict) and "$each" in spec:
+        items = spec["$each"]
+    else:
+        items, spec = [spec], {}
+    for item in items:
+        if not unique or item not in array:
+            array.append(copy.deepcopy(item))
+    if "$sort" in spec:
+        order = spec["$sort"]
+        if isinstance(order, dict):
+            for field, direction in reversed(list(order.items())):
+                array.sort(key=lambda e: sort_key((get_values(e, field) or [None])[0]), reverse=direction < 0)
+        else:
+            array.sort(key=sort_key, reverse=order < 0)
+    if "$slice" in spec:
+        limit = spec["$slice"]
+        array = array[:limit] if limit >= 0 else array[limit:]
+    parent[key] = array
+
+
+def apply_update(document, update, array_filters=None, inserting=False):
+    """Applies a MongoDB update document in place."""
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            parts = path.split(".")
+            if operator in ("$set", "$setOnInsert"):
+                op = lambda parent, key, value=value: parent.__setitem__(key, copy.deepcopy(value))
+            elif operator == "$unset":
+                def op(parent, key):
+                    if isinstance(parent, dict):
+                        parent.pop(key, None)
+                    elif key < len(parent):
+                        parent[key] = None
+            elif operator == "$inc":
+                def op(parent, key, value=value):
+                    current = _get(parent, key)
+                    parent[key] = (0 if current is _MISSING or current is None else current) + value
+            elif operator in ("$max", "$min"):
+                def op(parent, key, value=value, operator=operator):
+                    current = _get(parent, key)
+                    if current is _MISSING or current is None:
+                        parent[key] = value
+                    elif value is not None:
+                        new, old = sort_key(value), sort_key(current)
+                        if (operator == "$max" and new > old) or (operator == "$min" and new < old):
+                            parent[key] = value
+            elif operator in ("$push", "$addToSet"):
+                op = lambda parent, key, value=value, unique=(operator == "$addToSet"): _push(parent, key, value, unique)
+            elif operator == "$pull":
+                def op(parent, key, value=value):
+                    current = _get(parent, key)
+                    if isinstance(current, list):
+                        if isinstance(value, dict):
+                            parent[key] = [e for e in current if not (
+                                matches(e, value) if isinstance(e, dict) else match_condition([e], value))]
+                        else:
+                            parent[key] = [e for e in current if e != value]
+            else:
+                raise NotImplementedError(f"Operateur de mise a jour non supporte par le moteur memoire: {operator}")
+            _apply_at_path(document, parts, op, array_filters)
+
+
+def _is_operator_update(update):
+    return any(key.startswith("$") for key in update)
+
+
+def _upsert_seed(query):
+    """Document seeded from the equality conditions of an upsert query."""
+    seed = {}
+    for key, condition in (query or {}).items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            if "$eq" in condition:
+                seed[key] = condition["$eq"]
+            continue
+        seed[key] = condition
+    return seed
+
+
+# --- Collection ---
+class MemoryCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _evaluate(self):
+        documents, scores = self._collection._scored_matching(self._query)
+        for field, direction in reversed(self._sort):
+            if _is_text_score(direction):
+                documents.sort(key=lambda d: scores[d["_id"]], reverse=True)
+            else:
+                documents.sort(key=lambda d: sort_key((get_values(d, field) or [None])[0]), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return iter([project(copy.deepcopy(d), self._projection, scores.get(d["_id"])) for d in documents])
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = self._evaluate()
+        return next(self._iterator)
+
+    next = __next__
+
+    def close(self):
+        self._iterator = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._documents = {}   # _id -> document, in insertion order
+        self._indexes = {}     # field -> {value -> set of _id}
+        self._unique = set()   # fields with a unique index
+        self._text_weights = None  # field -> weight of the text index, if any
+        self.index_information_specs = {"_id_": [("_id", 1)]}
+        self._lock = threading.RLock()
+
+    # --- Indexes ---
+    @staticmethod
+    def _index_values(document, field):
+        values = get_values(document, field)
+        if not values:
+            return [None]
+        return [v for v in values if not isinstance(v, (dict, list))] or [None]
+
+    def _index_add(self, document):
+        for field, index in self._indexes.items():
+            for value in self._index_values(document, field):
+                index.setdefault(value, set()).add(document["_id"])
+
+    def _index_remove(self, document):
+        for field, index in self._indexes.items():
+            for value in self._index_values(document, field):
+                ids = index.get(value)
+                if ids:
+                    ids.discard(document["_id"])
+                    if not ids:
+                        del index[value]
+
+    def _check_unique(self, document, ignore_id=None):
+        if document["_id"] in self._documents and document["_id"] != ignore_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_",
+                                    DUPLICATE_KEY)
+        for field in self._unique:
+            for value in self._index_values(document, field):
+                if value is None:
+                    continue
+                if self._indexes[field].get(value, set()) - {ignore_id}:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}",
+                                            DUPLICATE_KEY)
+
+    def create_index(self, keys, unique=False, name=None, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        keys = list(keys)
+        index_name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        text_fields = [field for field, direction in keys if direction == "text"]
+        if text_fields:
+            weights = kwargs.get("weights") or {}
+            text_weights = {field: weights.get(field, 1) for field in text_fields}
+            with self._lock:
+                if self._text_weights is not None and self._text_weights != text_weights:
+                    raise OperationFailure("Une collection ne peut avoir qu'un seul index texte")
+                self._text_weights = text_weights
+                self.index_information_specs[index_name] = keys
+            return index_name
+        self.index_information_specs[index_name] = keys
+        field = keys[0][0]
+        with self._lock:
+            if field not in self._indexes:
+                self._indexes[field] = {}
+                for document in self._documents.values():
+                    for value in self._index_values(document, field):
+                        self._indexes[field].setdefault(value, set()).add(document["_id"])
+            if unique and len(keys) == 1:
+                self._unique.add(field)
+        return index_name
+
+    def index_information(self):
+        return {name: {"key": keys} for name, keys in self.index_information_specs.items()}
+
+    def drop_indexes(self):
+        with self._lock:
+            self._indexes.clear()
+            self._unique.clear()
+            self._text_weights = None
+            self.index_information_specs = {"_id_": [("_id", 1)]}
+
+    def _candidates(self, query):
+        """Narrows the scan with the _id or a hash index when the query has an equality / $in on it."""
+        for field, condition in (query or {}).items():
+            if field.startswith("$"):
+                continue
+            if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+                if set(condition) - {"$in", "$eq"}:
+                    continue
+                values = condition.get("$in", [condition.get("$eq")] if "$eq" in condition else [])
+            else:
+                values = [condition]
+            if any(isinstance(v, (dict, list, re.Pattern)) for v in values):
+                continue
+            if field == "_id":
+                return [self._documents[v] for v in values if v in self._documents]
+            if field in self._indexes:
+                ids = set()
+                for value in values:
+                    ids.update(self._indexes[field].get(value, ()))
+                return [self._documents[i] for i in ids if i in self._documents]
+        return list(self._documents.values())
+
+    def _text_score(self, document, terms, excluded):
+        """Sum over the text fields of weight * (0.5 + 0.5 * term frequency) per matching term; 0 if excluded."""
+        score = 0.0
+        for field, weight in self._text_weights.items():
+            tokens = [t for value in get_values(document, field) if isinstance(value, str) for t in tokenize(value)]
+            if excluded.intersection(tokens):
+                return 0.0
+            for term in terms:
+                count = tokens.count(term)
+                if count:
+                    score += weight * (0.5 + 0.5 * count / len(tokens))
+        return score
+
+    def _scored_matching(self, query):
+        """Matching documents and, for $text queries, their text scores by _id."""
+        query = dict(query or {})
+        text = query.pop("$text", None)
+        with self._lock:
+            documents = [d for d in self._candidates(query) if matches(d, query)]
+            if text is None:
+                return documents, {}
+            if self._text_weights is None:
+                raise OperationFailure("index texte requis pour la requete $text")
+            words = text["$search"].split()
+            excluded = {t for w in words if w.startswith("-") for t in tokenize(w)}
+            terms = {t for w in words if not w.startswith("-") for t in tokenize(w)}
+            scores = {}
+            for document in documents:
+                score = self._text_score(document, terms, excluded)
+                if score:
+                    scores[document["_id"]] = score
+            return [d for d in documents if d["_id"] in scores], scores
+
+    def _matching(self, query):
+        return self._scored_matching(query)[0]
+
+    # --- Reads ---
+    def find(self, filter=None, projection=None, **kwargs):
+        cursor = MemoryCursor(self, filter or {}, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    def find_one(self, filter=None, projection=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        return next(self.find(filter, projection, limit=1, **kwargs), None)
+
+    def count_documents(self, filter, **kwargs):
+        return len(self._matching(filter))
+
+    def aggregate(self, pipeline, **kwargs):
+        with self._lock:
+            documents = [copy.deepcopy(d) for d in self._documents.values()]
+        return iter(aggregate(documents, pipeline))
+
+    def estimated_document_count(self):
+        return len(self._documents)
+
+    # --- Writes ---
+    def insert_one(self, document):
+        with self._lock:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            stored = copy.deepcopy(document)
+            self._check_unique(stored)
+            self._documents[stored["_id"]] = stored
+            self._index_add(stored)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    def insert_many(self, documents, ordered=True):
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted.append(self.insert_one(document).inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    def _replace_stored(self, old, new):
+        self._check_unique(new, ignore_id=old["_id"])
+        self._index_remove(old)
+        self._documents[new["_id"]] = new
+        self._index_add(new)
+
+    def _update(self, filter, update, upsert, array_filters, many, replace=False):
+        with self._lock:
+            targets = self._matching(filter)
+            if not many:
+                targets = targets[:1]
+            modified = 0
+            for document in targets:
+                if replace:
+                    updated = {"_id": document["_id"], **copy.deepcopy(update)}
+                else:
+                    updated = copy.deepcopy(document)
+                    apply_update(updated, update, array_filters)
+                if updated != document:
+                    self._replace_stored(document, updated)
+                    modified += 1
+            upserted_id = None
+            if not targets and upsert:
+                document = _upsert_seed(filter)
+                if replace:
+                    document.update(copy.deepcopy(update))
+                else:
+                    apply_update(document, update, array_filters, inserting=True)
+                upserted_id = self.insert_one(document).inserted_id
+        return SimpleNamespace(matched_count=len(targets), modified_count=modified,
+                               upserted_id=upserted_id, acknowledged=True)
+
+    def update_one(self, filter, update, upsert=False, array_filters=None, **kwargs):
+        return self._update(filter, update, upsert, array_filters, many=False)
+
+    def update_many(self, filter, update, upsert=False, array_filters=None, **kwargs):
+        return self._update(filter, update, upsert, array_filters, many=True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self._update(filter, replacement, upsert, None, many=False, replace=True)
+
+    def _delete(self, filter, many):
+        with self._lock:
+            targets = self._matching(filter)
+            if not many:
+                targets = targets[:1]
+            for document in targets:
+                self._index_remove(document)
+                del self._documents[document["_id"]]
+        return SimpleNamespace(deleted_count=len(targets), acknowledged=True)
+
+    def delete_one(self, filter, **kwargs):
+        return self._delete(filter, many=False)
+
+    def delete_many(self, filter, **kwargs):
+        return self._delete(filter, many=True)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        """Executes the write operations of database.mongo_db (InsertOp, UpdateOp, DeleteOp)."""
+        errors = []
+        counts = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0, "upserted": 0}
+        for index, operation in enumerate(requests):
+            try:
+                if isinstance(operation, InsertOp):
+                    self.insert_one(operation.document)
+                    counts["inserted"] += 1
+                elif isinstance(operation, UpdateOp):
+                    result = self._update(operation.filter, operation.update, operation.upsert, None, many=False)
+                    counts["matched"] += result.matched_count
+                    counts["modified"] += result.modified_count
+                    counts["upserted"] += result.upserted_id is not None
+                elif isinstance(operation, DeleteOp):
+                    counts["deleted"] += self._delete(operation.filter, many=False).deleted_count
+                else:
+                    raise NotImplementedError(
+                        f"Operation bulk non supportee par le moteur memoire: {type(operation).__name__}")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": counts["inserted"]})
+        return SimpleNamespace(inserted_count=counts["inserted"], matched_count=counts["matched"],
+                               modified_count=counts["modified"], deleted_count=counts["deleted"],
+                               upserted_count=counts["upserted"], acknowledged=True)
+
+    def drop(self):
+        self.database.drop_collection(self.name)
+
+    def rename(self, new_name, dropTarget=False, **kwargs):
+        self.database.rename_collection(self.name, new_name, dropTarget)
+
+
+class MemoryDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    def create_collection(self, name, **kwargs):
+        return self[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def drop_collection(self, name):
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def rename_collection(self, name, new_name, drop_target=False):
+        """Atomically replaces (or creates) `new_name` by the collection `name`."""
+        with self._lock:
+            if new_name in self._collections and not drop_target:
+                raise OperationFailure(f"target namespace exists: {new_name}")
+            collection = self._collections.pop(name)
+            collection.name = new_name
+            self._collections[new_name] = collection
+
+
+class MemoryClient:
+    """Drop-in replacement for pymongo.MongoClient backed by process memory."""
+
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(self, name)
+            return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    def drop_database(self, name):
+        with self._lock:
+            self._databases.pop(getattr(name, "name", name), None)
+
+    def list_database_names(self):
+        return list(self._databases)
+
+    def close(self):
+        pass
@@ -1,11 +1,66 @@
-from pymongo import MongoClient
+from collections import namedtuple
+from pymongo import MongoClient, ASCENDING, DESCENDING, DeleteOne, InsertOne, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
+import re
+import time
 import config
+from database.normalization import PATIENT_KEY_FIELDS, match_score, patient_keys, tokenize
+
+ARCHIVE_COLLECTION = "consultations_archive"
+MAINTENANCE_COLLECTION = "maintenance_state"
+# Set on hot consultations while an archive batch moves them (see maintenance.archive_consultations)
+ARCHIVE_BATCH_FIELD = "archive_batch"
+# Free-text consultation fields covered by the text index, with their relevance weights
+CONSULTATION_TEXT_FIELDS = {"motif": 1, "diagnostic": 1}
+# Patient fields never returned to clients: the password and the internal derived keys
+PATIENT_PROJECTION = {"password": 0, "search_keys": 0, "blocking_keys": 0}
+
+# Write operations accepted by MongoDB.bulk_write: translated to pymongo requests for a
+# MongoDB server, executed as-is by the in-memory engine (database.memory_store)
+InsertOp = namedtuple("InsertOp", ["document"])
+UpdateOp = namedtuple("UpdateOp", ["filter", "update", "upsert"], defaults=[False])
+DeleteOp = namedtuple("DeleteOp", ["filter"])
+
+
+def _to_request(operation):
+    """pymongo request of a bulk write operation."""
+    if isinstance(operation, InsertOp):
+        return InsertOne(operation.document)
+    if isinstance(operation, UpdateOp):
+        return UpdateOne(operation.filter, operation.update, upsert=operation.upsert)
+    if isinstance(operation, DeleteOp):
+        return DeleteOne(operation.filter)
+    raise TypeError(f"Operation bulk inconnue: {operation!r}")
 
 class MongoDB:
-    def __init__(self):
-        self.client = MongoClient(config.MONGO_URI)
+    def __init__(self, client=None):
+        # Any client exposing the pymongo API works (see database.memory_store.MemoryClient)
+        self.client = client if client is not None else MongoClient(config.MONGO_URI)
         self.db = self.client[config.MONGO_DB_NAME]
+        self._archive_horizon = None
+        self._archive_horizon_loaded_at = float("-inf")
+
+    def ensure_indexes(self):
+        """Creates the secondary indexes used by the application (idempotent)."""
+        consultations = self.get_collection("consultations")
+        consultations.create_index([("date_heure", ASCENDING)])
+        consultations.create_index([("patient_id", ASCENDING), ("date_heure", ASCENDING)])
+        consultations.create_index([("medecin_id", ASCENDING)])
+        self._create_consultation_text_index(consultations)
+        self.get_collection("patient_summaries").create_index([("consultations.medecin_id", ASCENDING)])
+        self.create_stats_indexes(self.get_collection("stats"))
+        # Multikey index of normalized name tokens, scanned by prefix in search_patients
+        self.get_collection("patients").create_index([("search_keys", ASCENDING)])
+        # Multikey index of phonetic name + birth date keys, used by the duplicate detection
+        self.get_collection("patients").create_index([("blocking_keys", ASCENDING)])
+
+    @staticmethod
+    def create_stats_indexes(collection):
+        """Indexes of the `stats` rollups (also created on the staging collection of a rebuild)."""
+        collection.create_index([("kind", ASCENDING), ("granularity", ASCENDING), ("period", ASCENDING)])
+        collection.create_index([("medecin_id", ASCENDING)])
 
     def get_collection(self, collection_name):
         """Returns a specific MongoDB collection."""
@@ -18,15 +73,36 @@ class MongoDB:
         result = collection.insert_one(data)
         return str(result.inserted_id)
 
-    def find_document(self, collection_name, query):
+    def find_document(self, collection_name, query, projection=None):
         """Finds a single document matching the query."""
         collection = self.get_collection(collection_name)
-        return collection.find_one(query)
+        return collection.find_one(query, projection)
 
-    def find_documents(self, collection_name, query={}):
+    def find_documents(self, collection_name, query={}, projection=None):
         """Finds multiple documents matching the query."""
         collection = self.get_collection(collection_name)
-        return list(collection.find(query))
+        return list(collection.find(query, projection))
+
+    def iter_documents(self, collection_name, query={}, projection=None, sort=None, batch_size=None):
+        """
+        Iterates over the documents matching the query through a server-side cursor,
+        fetching `batch_size` documents per round trip instead of materializing the result.
+        """
+        collection = self.get_collection(collection_name)
+        cursor = collection.find(query, projection, no_cursor_timeout=True,
+                                 batch_size=batch_size or config.EXPORT_BATCH_SIZE)
+        if sort:
+            cursor = cursor.sort(sort)
+        with cursor:
+            for document in cursor:
+                yield document
+
+    def find_documents_by_ids(self, collection_name, ids, projection=None):
+        """Finds the documents whose _id is in `ids` with a single query."""
+        if not ids:
+            return []
+        collection = self.get_collection(collection_name)
+        return list(collection.find({"_id": {"$in": list(ids)}}, projection))
 
     def update_document(self, collection_name, query, new_data):
         """Updates a document matching the query with new data."""
@@ -40,22 +116,89 @@ class MongoDB:
         result = collection.delete_one(query)
         return result.deleted_count > 0
 
+    # --- Bulk Operations ---
+    def bulk_write(self, collection_name, operations):
+        """
+        Executes a list of write operations (InsertOp, UpdateOp, DeleteOp) in a single
+        unordered round trip.
+        Returns a dict mapping the index of each failed operation to its error message.
+        """
+        if not operations:
+            return {}
+        collection = self.get_collection(collection_name)
+        if isinstance(collection, Collection):
+            operations = [_to_request(operation) for operation in operations]
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            return {err["index"]: err.get("errmsg", "Erreur d'ecriture") for err in e.details.get("writeErrors", [])}
+        return {}
+
+    def find_existing_ids(self, collection_name, ids):
+        """Returns the subset of the given ObjectIds that exist in the collection."""
+        if not ids:
+            return set()
+        collection = self.get_collection(collection_name)
+        return {doc["_id"] for doc in collection.find({"_id": {"$in": list(ids)}}, {"_id": 1})}
+
+    def find_existing_values(self, collection_name, field, values):
+        """Returns the subset of the given values already used by `field` in the collection."""
+        if not values:
+            return set()
+        collection = self.get_collection(collection_name)
+        return {doc[field] for doc in collection.find({field: {"$in": list(values)}}, {field: 1, "_id": 0})}
+
     # --- Specific Functions for Patients ---
     def add_patient(self, patient_data):
-        """Adds a new patient document."""
+        """Adds a new patient document (with its search and blocking keys)."""
+        patient_data.update(patient_keys(patient_data))
         return self.create_document("patients", patient_data)
 
-    def get_patient(self, patient_id):
-        """Retrieves a patient document by ID."""
-        return self.find_document("patients", {"_id": ObjectId(patient_id)})
+    def get_patient(self, patient_id, projection=None):
+        """Retrieves a patient document by ID (pass PATIENT_PROJECTION for documents returned to clients)."""
+        return self.find_document("patients", {"_id": ObjectId(patient_id)}, projection)
 
-    def get_all_patients(self):
-        """Retrieves all patient documents."""
-        return self.find_documents("patients")
+    def get_all_patients(self, projection=None):
+        """Retrieves all patient documents (pass PATIENT_PROJECTION for documents returned to clients)."""
+        return self.find_documents("patients", {}, projection)
 
     def update_patient(self, patient_id, new_data):
-        """Updates an existing patient document."""
-        return self.update_document("patients", {"_id": ObjectId(patient_id)}, new_data)
+        """Updates an existing patient document (and its search/blocking keys when a field they derive from changes)."""
+        query = {"_id": ObjectId(patient_id)}
+        if any(field in new_data for field in PATIENT_KEY_FIELDS):
+            current = self.find_document("patients", query)
+            if current:
+                new_data = {**new_data, **patient_keys({**current, **new_data})}
+        return self.update_document("patients", query, new_data)
+
+    def search_patients(self, text, limit=None):
+        """
+        Accent- and case-insensitive prefix search on nom/prenom/username: every word of `text`
+        must prefix a word of the patient. Candidates (at most PATIENT_SEARCH_CANDIDATES) come
+        from the search_keys index, patients matching every word exactly first, then from an
+        anchored range scan for prefix matches; they are ranked by match_score.
+        """
+        limit = min(limit or config.PATIENT_SEARCH_DEFAULT_LIMIT, config.PATIENT_SEARCH_MAX_LIMIT)
+        query_tokens = tokenize(text)
+        if not query_tokens:
+            return []
+        # The longest token is the most selective one: it drives the index scan
+        query_tokens.sort(key=len, reverse=True)
+        collection = self.get_collection("patients")
+        # Exact matches are read first so that they are never cut off by the candidate limit
+        candidates = list(collection.find(
+            {"$and": [{"search_keys": token} for token in query_tokens]}, PATIENT_PROJECTION
+        ).limit(config.PATIENT_SEARCH_CANDIDATES))
+        remaining = config.PATIENT_SEARCH_CANDIDATES - len(candidates)
+        if remaining > 0:
+            conditions = [{"search_keys": {"$regex": f"^{re.escape(token)}"}} for token in query_tokens]
+            conditions.append({"_id": {"$nin": [p["_id"] for p in candidates]}})
+            candidates += collection.find({"$and": conditions}, PATIENT_PROJECTION).limit(remaining)
+        ranked = sorted(
+            candidates,
+            key=lambda p: (-match_score(query_tokens, p), tokenize(p.get("nom")), tokenize(p.get("prenom")))
+        )
+        return ranked[:limit]
 
     def delete_patient(self, patient_id):
         """Deletes a patient document by ID."""
@@ -83,29 +226,158 @@ class MongoDB:
         return self.delete_document("medecins", {"_id": ObjectId(medecin_id)})
 
     # --- Specific Functions for Consultations ---
+    # Consultations older than the archive horizon live in `consultations_archive`.
+    # Reads only query the archive when the requested period reaches before the horizon.
     def add_consultation(self, consultation_data):
         """Adds a new consultation document."""
         return self.create_document("consultations", consultation_data)
 
     def get_consultation(self, consultation_id):
-        """Retrieves a consultation document by ID."""
-        return self.find_document("consultations", {"_id": ObjectId(consultation_id)})
+        """Retrieves a consultation document by ID (hot collection first, then the archive)."""
+        query = {"_id": ObjectId(consultation_id)}
+        consultation = self.find_document("consultations", query)
+        if consultation is None and self.get_archive_horizon():
+            consultation = self.find_document(ARCHIVE_COLLECTION, query)
+        return consultation
 
-    def get_consultations_by_patient(self, patient_id):
-        """Retrieves consultations for a specific patient."""
-        return self.find_documents("consultations", {"patient_id": patient_id})
+    def _find_consultations(self, query, since=None):
+        """Finds consultations matching the query, including the archive if `since` precedes the horizon."""
+        if since:
+            query = {**query, "date_heure": {"$gte": since}}
+        consultations = self.find_documents("consultations", query)
+        if self.spans_archive(since):
+            consultations = self.find_documents(ARCHIVE_COLLECTION, query) + consultations
+        return consultations
 
-    def get_consultations_by_medecin(self, medecin_id):
-        """Retrieves consultations for a specific doctor."""
-        return self.find_documents("consultations", {"medecin_id": medecin_id})
+    def get_consultations_by_patient(self, patient_id, since=None):
+        """Retrieves consultations for a specific patient (optionally only those since a date)."""
+        return self._find_consultations({"patient_id": patient_id}, since)
+
+    def get_consultations_by_medecin(self, medecin_id, since=None):
+        """Retrieves consultations for a specific doctor (optionally only those since a date)."""
+        return self._find_consultations({"medecin_id": medecin_id}, since)
+
+    def iter_consultations_between(self, start=None, end=None, batch_size=None):
+        """Iterates over consultations with start <= date_heure < end, ordered by date."""
+        date_filter = {}
+        if start:
+            date_filter["$gte"] = start
+        if end:
+            date_filter["$lt"] = end
+        query = {"date_heure": date_filter} if date_filter else {}
+        sort = [("date_heure", ASCENDING)]
+        if self.spans_archive(start):
+            yield from self.iter_documents(ARCHIVE_COLLECTION, query, sort=sort, batch_size=batch_size)
+        yield from self.iter_documents("consultations", query, sort=sort, batch_size=batch_size)
 
     def update_consultation(self, consultation_id, new_data):
-        """Updates an existing consultation document."""
-        return self.update_document("consultations", {"_id": ObjectId(consultation_id)}, new_data)
+        """
+        Updates an existing consultation document (hot collection first, then the archive).
+        Updating a hot consultation takes it back from an archive batch in progress.
+        """
+        query = {"_id": ObjectId(consultation_id)}
+        result = self.get_collection("consultations").update_one(
+            query, {"$set": new_data, "$unset": {ARCHIVE_BATCH_FIELD: ""}}
+        )
+        if result.modified_count > 0:
+            return True
+        return bool(self.get_archive_horizon()) and self.update_document(ARCHIVE_COLLECTION, query, new_data)
 
     def delete_consultation(self, consultation_id):
-        """Deletes a consultation document by ID."""
-        return self.delete_document("consultations", {"_id": ObjectId(consultation_id)})
+        """
+        Deletes a consultation document by ID. Once consultations have been archived, it is
+        also deleted from the archive, which may already hold a copy of a hot consultation
+        being moved.
+        """
+        query = {"_id": ObjectId(consultation_id)}
+        deleted = self.delete_document("consultations", query)
+        if self.get_archive_horizon():
+            deleted = self.delete_document(ARCHIVE_COLLECTION, query) or deleted
+        return deleted
+
+    @staticmethod
+    def _create_consultation_text_index(collection):
+        collection.create_index(
+            [(field, "text") for field in CONSULTATION_TEXT_FIELDS],
+            weights=CONSULTATION_TEXT_FIELDS, default_language="french", name="consultation_text"
+        )
+
+    def search_consultations(self, text, scope, page=1, per_page=None):
+        """
+        Full-text search over the consultation text fields, restricted to `scope` (e.g.
+        {"medecin_id": ...}), best matches first (then most recent). Returns (page of
+        consultations with their "score", has_more). The archive is searched too once
+        consultations have been archived.
+        """
+        per_page = min(per_page or config.CONSULTATION_SEARCH_PER_PAGE, config.CONSULTATION_SEARCH_MAX_PER_PAGE)
+        # One extra result tells whether another page exists
+        wanted = page * per_page + 1
+        query = {"$text": {"$search": text}, **scope}
+        projection = {"score": {"$meta": "textScore"}}
+        sort = [("score", {"$meta": "textScore"}), ("date_heure", DESCENDING)]
+        collections = ["consultations"] + ([ARCHIVE_COLLECTION] if self.spans_archive() else [])
+        results = []
+        for collection_name in collections:
+            cursor = self.get_collection(collection_name).find(query, projection).sort(sort).limit(wanted)
+            results.extend(cursor)
+        if len(collections) > 1:
+            results.sort(key=lambda c: (c["score"], c.get("date_heure") or ""), reverse=True)
+        start = (page - 1) * per_page
+        return results[start:start + per_page], len(results) > start + per_page
+
+    # --- Consultation Archive ---
+    def get_archive_horizon(self):
+        """
+        Returns the archive horizon (a date_heure value): every consultation before it may be
+        in the archive. None if nothing was ever archived. Cached for ARCHIVE_HORIZON_CACHE_SECONDS.
+        """
+        now = time.monotonic()
+        if now - self._archive_horizon_loaded_at > config.ARCHIVE_HORIZON_CACHE_SECONDS:
+            state = self.find_document(MAINTENANCE_COLLECTION, {"_id": ARCHIVE_COLLECTION})
+            self._archive_horizon = state.get("horizon") if state else None
+            self._archive_horizon_loaded_at = now
+        return self._archive_horizon
+
+    def set_archive_horizon(self, horizon):
+        """Moves the archive horizon forward (it never moves back), recording when it was published."""
+        current = self.get_archive_horizon()
+        if current and current >= horizon:
+            return current
+        self.get_collection(MAINTENANCE_COLLECTION).update_one(
+            {"_id": ARCHIVE_COLLECTION}, {"$set": {"horizon": horizon, "published_at": time.time()}}, upsert=True
+        )
+        self._archive_horizon = horizon
+        self._archive_horizon_loaded_at = time.monotonic()
+        return horizon
+
+    def archive_horizon_pending_seconds(self):
+        """
+        Seconds before every process sees the last published horizon (their cached value
+        expires after ARCHIVE_HORIZON_CACHE_SECONDS); 0 once it is visible everywhere.
+        """
+        state = self.find_document(MAINTENANCE_COLLECTION, {"_id": ARCHIVE_COLLECTION})
+        published_at = state.get("published_at") if state else None
+        if published_at is None:
+            return 0
+        return max(0.0, published_at + config.ARCHIVE_HORIZON_CACHE_SECONDS - time.time())
+
+    def spans_archive(self, since=None):
+        """True if a read starting at `since` (None = from the beginning) reaches archived consultations."""
+        horizon = self.get_archive_horizon()
+        return bool(horizon) and (not since or since < horizon)
+
+    def ensure_archive_collection(self):
+        """Creates the archive collection with compressed block storage and its indexes."""
+        if ARCHIVE_COLLECTION not in self.db.list_collection_names():
+            self.db.create_collection(
+                ARCHIVE_COLLECTION,
+                storageEngine={"wiredTiger": {"configString": f"block_compressor={config.ARCHIVE_BLOCK_COMPRESSOR}"}},
+            )
+        archive = self.get_collection(ARCHIVE_COLLECTION)
+        archive.create_index([("date_heure", ASCENDING)])
+        archive.create_index([("patient_id", ASCENDING), ("date_heure", ASCENDING)])
+        archive.create_index([("medecin_id", ASCENDING)])
+        self._create_consultation_text_index(archive)
 
     # --- Authentication ---
     def add_user(self, user_data):
@@ -1,39 +1,216 @@
-from neo4j import GraphDatabase
+import threading
+import time
+from contextlib import contextmanager
+
+from neo4j import GraphDatabase, unit_of_work
+from neo4j.exceptions import ConnectionPoolError, Neo4jError, ServiceUnavailable, SessionExpired, TransientError
 import config
+from database.storage import GraphStore, GraphUnavailableError, NODE_LABELS, RELATIONSHIP_TYPES
+from database.assignment_cache import AssignmentCache
+from database.circuit_breaker import CircuitBreaker
+
+TREATING_PHYSICIAN_REL = "A_POUR_MEDECIN_TRAITANT"
+# Set to the server time on every node write, to order duplicate nodes in dedup_nodes
+WRITTEN_AT = "written_at"
 
-class Neo4jDB:
+
+class Neo4jDB(GraphStore):
     def __init__(self):
         self.driver = GraphDatabase.driver(
             config.NEO4J_URI,
-            auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+            auth=(config.NEO4J_USER, config.NEO4J_PASSWORD),
+            connection_timeout=config.NEO4J_CONNECTION_TIMEOUT,
+            connection_acquisition_timeout=config.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+            max_transaction_retry_time=config.NEO4J_MAX_TRANSACTION_RETRY_TIME
+        )
+        # Per-thread state: request-scoped session and open explicit transaction
+        self._local = threading.local()
+        self.breaker = CircuitBreaker(
+            "neo4j",
+            config.NEO4J_BREAKER_FAILURE_THRESHOLD,
+            config.NEO4J_BREAKER_SLOW_CALL_SECONDS,
+            config.NEO4J_BREAKER_RESET_SECONDS
         )
+        # medecin id -> assigned patient ids, kept exact by the write methods below
+        self.assignment_cache = AssignmentCache()
 
     def close(self):
         self.driver.close()
 
-    def _execute_query(self, query, parameters=None, fetch_type='all'):
+    def clear(self):
+        """Deletes every node and relationship, in batches."""
+        while self._execute_query(
+            "MATCH (n) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*) AS deleted", fetch_type='single',
+            bulk=True, write=True
+        )["deleted"]:
+            pass
+        self.assignment_cache.clear()
+
+    def ensure_indexes(self):
+        """
+        Creates a uniqueness constraint on `id` for each label (it also indexes `id`), replacing
+        the plain index of older deployments. While duplicate nodes remain the constraint cannot
+        be created, so the plain index is kept until maintenance.dedup_graph_nodes has run.
+        """
+        for label in NODE_LABELS:
+            try:
+                self._execute_query(f"DROP INDEX {label.lower()}_id IF EXISTS", fetch_type='consume', bulk=True,
+                                    write=True)
+                self._execute_query(
+                    f"CREATE CONSTRAINT {label.lower()}_id_unique IF NOT EXISTS "
+                    f"FOR (n:{label}) REQUIRE n.id IS UNIQUE", fetch_type='consume', bulk=True, write=True
+                )
+            except Exception as e:
+                print(f"Contrainte d'unicite {label}.id non creee (doublons ?): {e}")
+                self._execute_query(
+                    f"CREATE INDEX {label.lower()}_id IF NOT EXISTS FOR (n:{label}) ON (n.id)", fetch_type='consume',
+                    bulk=True, write=True
+                )
+
+    @staticmethod
+    def _is_unavailability(error):
+        """
+        True for errors meaning the graph is unreachable or overloaded, as opposed to a bad
+        query or a driver misuse/misconfiguration (ResultConsumedError, SessionError,
+        ConfigurationError...), which must not open the circuit breaker.
+        """
+        # ServiceUnavailable covers Read/Write/RoutingServiceUnavailable, ConnectionPoolError
+        # covers ConnectionAcquisitionTimeoutError
+        if isinstance(error, (ServiceUnavailable, SessionExpired, TransientError, ConnectionPoolError)):
+            return True
+        return isinstance(error, Neo4jError) and "TimedOut" in (error.code or "")
+
+    # --- Sessions and Transactions ---
+    def begin_request(self):
+        """Makes the queries of the current request (thread) share one session, opened on first use."""
+        self._local.request_scoped = True
+
+    def end_request(self):
+        """Closes the request-scoped session, if one was opened."""
+        self._local.request_scoped = False
+        session, self._local.session = getattr(self._local, "session", None), None
+        if session is not None:
+            session.close()
+
+    @contextmanager
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None and getattr(self._local, "request_scoped", False):
+            session = self._local.session = self.driver.session(database=config.NEO4J_DATABASE)
+        if session is not None:
+            yield session
+        else:
+            with self.driver.session(database=config.NEO4J_DATABASE) as session:
+                yield session
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs every query of the enclosed block in one explicit write transaction, committed
+        at the end of the block and rolled back if it raises. Nested blocks join the outer
+        transaction. Unlike single queries, the block is not retried on transient errors.
+        """
+        if getattr(self._local, "tx", None) is not None:
+            yield
+            return
+        with self._session() as session:
+            tx = self._guarded(lambda: session.begin_transaction(timeout=config.NEO4J_QUERY_TIMEOUT))
+            self._local.tx = tx
+            try:
+                yield
+                self._guarded(tx.commit)
+            except BaseException:
+                # Cache updates made inside the block may not have been committed
+                self.assignment_cache.clear()
+                raise
+            finally:
+                self._local.tx = None
+                tx.close()
+
+    def _guarded(self, operation, attempt=None, bulk=False):
+        """
+        Runs a driver operation behind the circuit breaker: outages and timeouts raise
+        GraphUnavailableError (immediately while the breaker is open). The latency reported
+        to the breaker is the one of the last attempt (`attempt["duration"]`, set by the
+        operation), not of the driver's retry loop. Bulk operations bypass the breaker:
+        their failures and durations say nothing about the health of interactive queries.
+        """
+        if bulk:
+            try:
+                return operation()
+            except Exception as e:
+                if self._is_unavailability(e):
+                    raise GraphUnavailableError(f"Neo4j indisponible: {e}") from e
+                raise
+        if not self.breaker.allow():
+            raise GraphUnavailableError("Neo4j indisponible (circuit ouvert)")
+        attempt = {} if attempt is None else attempt
+        started = time.monotonic()
+        try:
+            value = operation()
+        except Exception as e:
+            if self._is_unavailability(e):
+                self.breaker.record_failure()
+                raise GraphUnavailableError(f"Neo4j indisponible: {e}") from e
+            self.breaker.record_success(attempt.get("duration", time.monotonic() - started))
+            raise
+        self.breaker.record_success(attempt.get("duration", time.monotonic() - started))
+        return value
+
+    @staticmethod
+    def _fetch(result, fetch_type):
+        if fetch_type == 'single':
+            return result.single() # Returns a Record object or None
+        elif fetch_type == 'consume':
+            return result.consume() # Returns a ResultSummary object
+        else: # Default 'all'
+            return list(result) # Returns a list of Record objects
+
+    def _execute_query(self, query, parameters=None, fetch_type='all', bulk=False, write=False):
         """
         Executes a Cypher query and processes the result based on fetch_type.
         'single': Returns the first record (or None if no records).
         'consume': Returns the ResultSummary (for operations like DELETE).
         'all': Returns a list of all records.
+        Inside transaction(), the query joins the open transaction. Otherwise it runs as a
+        managed transaction, retried by the driver on transient errors for up to
+        NEO4J_MAX_TRANSACTION_RETRY_TIME seconds: a write transaction when the caller passes
+        `write=True`, else a read transaction (which can be routed to cluster followers).
+        Maintenance and bulk queries pass `bulk=True`: they get NEO4J_BULK_QUERY_TIMEOUT and
+        bypass the circuit breaker.
         """
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            if fetch_type == 'single':
-                return result.single() # Returns a Record object or None
-            elif fetch_type == 'consume':
-                return result.consume() # Returns a ResultSummary object
-            else: # Default 'all'
-                return list(result) # Returns a list of Record objects
+        attempt = {}
+
+        @unit_of_work(timeout=config.NEO4J_BULK_QUERY_TIMEOUT if bulk else config.NEO4J_QUERY_TIMEOUT)
+        def work(tx):
+            started = time.monotonic()
+            value = self._fetch(tx.run(query, parameters), fetch_type)
+            attempt["duration"] = time.monotonic() - started
+            return value
+
+        def run():
+            tx = getattr(self._local, "tx", None)
+            if tx is not None:
+                return work(tx)
+            with self._session() as session:
+                if write:
+                    return session.execute_write(work)
+                return session.execute_read(work)
+
+        return self._guarded(run, attempt, bulk)
 
     # --- CRUD for Nodes ---
     def create_node(self, label, properties):
-        """Creates a new node with the given label and properties."""
+        """Creates a new node with the given label and properties (MERGE on `id` when present)."""
+        if "id" in properties:
+            query = f"MERGE (n:{label} {{id: $id}}) SET n += $props, n.{WRITTEN_AT} = timestamp() RETURN n"
+            record = self._execute_query(query, {"id": properties["id"], "props": properties}, fetch_type='single',
+                                         write=True)
+            return record[0] if record else None
         props_str = ", ".join(f"{k}: ${k}" for k in properties.keys())
-        query = f"CREATE (n:{label} {{{props_str}}}) RETURN n"
+        query = f"CREATE (n:{label} {{{props_str}}}) SET n.{WRITTEN_AT} = timestamp() RETURN n"
         # Use fetch_type='single' because we expect one node back
-        record = self._execute_query(query, properties, fetch_type='single')
+        record = self._execute_query(query, properties, fetch_type='single', write=True)
         return record[0] if record else None # Access the node from the Record
 
     def find_node(self, label, property_name, property_value):
@@ -45,18 +222,20 @@ class Neo4jDB:
 
     def update_node(self, label, match_prop_name, match_prop_value, new_properties):
         """Updates properties of an existing node."""
-        set_str = ", ".join(f"n.{k} = ${k}" for k in new_properties.keys())
+        set_str = ", ".join([f"n.{k} = ${k}" for k in new_properties.keys()] + [f"n.{WRITTEN_AT} = timestamp()"])
         query = f"MATCH (n:{label} {{{match_prop_name}: $match_value}}) SET {set_str} RETURN n"
         params = {"match_value": match_prop_value, **new_properties}
         # Use fetch_type='single' because we expect one node back
-        record = self._execute_query(query, params, fetch_type='single')
+        record = self._execute_query(query, params, fetch_type='single', write=True)
         return record[0] if record else None
 
     def delete_node(self, label, property_name, property_value):
         """Deletes a node and its relationships."""
         query = f"MATCH (n:{label} {{{property_name}: $value}}) DETACH DELETE n"
         # Use fetch_type='consume' for DELETE operations to get the summary
-        summary = self._execute_query(query, {"value": property_value}, fetch_type='consume')
+        summary = self._execute_query(query, {"value": property_value}, fetch_type='consume', write=True)
+        if property_name == "id":
+            self._invalidate_deleted_nodes(label, [property_value])
         return summary.counters.nodes_deleted > 0
 
     # --- Relationship Management ---
@@ -74,7 +253,9 @@ class Neo4jDB:
             **rel_properties
         }
         # Use fetch_type='single' because we expect one relationship back
-        record = self._execute_query(query, params, fetch_type='single')
+        record = self._execute_query(query, params, fetch_type='single', write=True)
+        if record and self._is_assignment(from_label, from_prop_name, to_label, to_prop_name, rel_type):
+            self.assignment_cache.add_link(from_prop_value, to_prop_value)
         return record[0] if record else None
 
     def delete_relationship(self, from_label, from_prop_name, from_prop_value,
@@ -88,76 +269,132 @@ class Neo4jDB:
             "to_value": to_prop_value
         }
         # Use fetch_type='consume' for DELETE operations to get the summary
-        summary = self._execute_query(query, params, fetch_type='consume')
+        summary = self._execute_query(query, params, fetch_type='consume', write=True)
+        if self._is_assignment(from_label, from_prop_name, to_label, to_prop_name, rel_type):
+            self.assignment_cache.remove_link(from_prop_value, to_prop_value)
         return summary.counters.relationships_deleted > 0
 
-    # --- Specific Functions for Entities ---
-    def create_patient_node(self, patient_id, nom, prenom, date_naissance=None):
-        """Creates a patient node."""
-        properties = {"id": patient_id, "nom": nom, "prenom": prenom}
-        if date_naissance:
-            properties["date_naissance"] = date_naissance
-        return self.create_node("Patient", properties)
-
-    def update_patient_node(self, patient_id, new_data):
-        """Updates a patient node."""
-        return self.update_node("Patient", "id", patient_id, new_data)
-
-    def delete_patient_node(self, patient_id):
-        """Deletes a patient node."""
-        return self.delete_node("Patient", "id", patient_id)
-
-    def create_medecin_node(self, medecin_id, nom, prenom, specialite):
-        """Creates a doctor node."""
-        properties = {"id": medecin_id, "nom": nom, "prenom": prenom, "specialite": specialite}
-        return self.create_node("Medecin", properties)
-
-    def update_medecin_node(self, medecin_id, new_data):
-        """Updates a doctor node."""
-        return self.update_node("Medecin", "id", medecin_id, new_data)
-
-    def delete_medecin_node(self, medecin_id):
-        """Deletes a doctor node."""
-        return self.delete_node("Medecin", "id", medecin_id)
-
-    def create_consultation_node(self, consultation_id, date_heure, motif):
-        """Creates a consultation node."""
-        properties = {"id": consultation_id, "date_heure": date_heure, "motif": motif}
-        return self.create_node("Consultation", properties)
-
-    def delete_consultation_node(self, consultation_id):
-        """Deletes a consultation node."""
-        return self.delete_node("Consultation", "id", consultation_id)
-
-    def link_patient_to_medecin_traitant(self, patient_id, medecin_id):
-        """Links a patient to their treating doctor."""
-        return self.create_relationship(
-            "Patient", "id", patient_id,
-            "Medecin", "id", medecin_id,
-            "A_POUR_MEDECIN_TRAITANT"
+    # --- Batch Operations (one UNWIND query per operation type) ---
+    def create_nodes(self, label, rows):
+        """Creates one node per properties dict in `rows`, merging on `id`."""
+        if not rows:
+            return 0
+        query = f"UNWIND $rows AS row MERGE (n:{label} {{id: row.id}}) SET n += row, n.{WRITTEN_AT} = timestamp()"
+        summary = self._execute_query(query, {"rows": rows}, fetch_type='consume',
+                                      bulk=len(rows) > config.NEO4J_BULK_ROWS, write=True)
+        return summary.counters.nodes_created
+
+    def update_nodes(self, label, rows):
+        """Updates nodes matched by id. Each row is {"id": ..., "props": {...}}."""
+        if not rows:
+            return 0
+        query = f"UNWIND $rows AS row MATCH (n:{label} {{id: row.id}}) SET n += row.props, n.{WRITTEN_AT} = timestamp()"
+        summary = self._execute_query(query, {"rows": rows}, fetch_type='consume',
+                                      bulk=len(rows) > config.NEO4J_BULK_ROWS, write=True)
+        return summary.counters.properties_set
+
+    def delete_nodes(self, label, ids):
+        """Deletes the nodes whose id is in `ids`, with their relationships."""
+        if not ids:
+            return 0
+        query = f"UNWIND $ids AS node_id MATCH (n:{label} {{id: node_id}}) DETACH DELETE n"
+        summary = self._execute_query(query, {"ids": list(ids)}, fetch_type='consume',
+                                      bulk=len(ids) > config.NEO4J_BULK_ROWS, write=True)
+        self._invalidate_deleted_nodes(label, ids)
+        return summary.counters.nodes_deleted
+
+    def create_relationships(self, from_label, to_label, rel_type, pairs):
+        """Creates (MERGE) a relationship for each {"from_id": ..., "to_id": ...} pair."""
+        if not pairs:
+            return 0
+        query = (f"UNWIND $pairs AS pair "
+                 f"MATCH (a:{from_label} {{id: pair.from_id}}), (b:{to_label} {{id: pair.to_id}}) "
+                 f"MERGE (a)-[r:{rel_type}]->(b)")
+        summary = self._execute_query(query, {"pairs": pairs}, fetch_type='consume',
+                                      bulk=len(pairs) > config.NEO4J_BULK_ROWS, write=True)
+        if self._is_assignment(from_label, "id", to_label, "id", rel_type):
+            for pair in pairs:
+                self.assignment_cache.add_link(pair["from_id"], pair["to_id"])
+        return summary.counters.relationships_created
+
+    # --- Maintenance ---
+    def dedup_nodes(self, label, batch_size):
+        """
+        Merges up to `batch_size` groups of `label` nodes sharing the same id, in write order
+        (WRITTEN_AT, then elementId for nodes written before it existed, whose order is
+        arbitrary): the least recently written node is kept, takes the properties of the
+        others in that order (the last written wins) and their relationships, then the
+        duplicates are deleted. Returns the number of nodes removed.
+        """
+        query = (
+            f"MATCH (n:{label}) WHERE n.id IS NOT NULL "
+            f"WITH n ORDER BY coalesce(n.{WRITTEN_AT}, 0), elementId(n) "
+            f"WITH n.id AS node_id, collect(n) AS nodes WHERE size(nodes) > 1 "
+            f"WITH nodes LIMIT $batch_size "
+            f"WITH head(nodes) AS keep, tail(nodes) AS duplicates "
+            f"UNWIND duplicates AS dup "
+            f"SET keep += properties(dup) "
+            f"{self._relationship_moves()} "
+            f"DETACH DELETE dup"
         )
+        summary = self._execute_query(query, {"batch_size": batch_size}, fetch_type='consume', bulk=True, write=True)
+        return summary.counters.nodes_deleted
 
-    def remove_patient_medecin_traitant_link(self, patient_id, medecin_id):
-        """Removes the link between a patient and their treating doctor."""
-        return self.delete_relationship(
-            "Patient", "id", patient_id,
-            "Medecin", "id", medecin_id,
-            "A_POUR_MEDECIN_TRAITANT"
+    def merge_nodes(self, label, keep_id, duplicate_id):
+        """
+        Merges the `label` node `duplicate_id` into `keep_id` in one query: its relationships
+        are re-created on the kept node (which keeps its own properties), then it is deleted.
+        Cached assignments involving the merged nodes are invalidated. Returns True if a node was removed.
+        """
+        query = (
+            f"MATCH (keep:{label} {{id: $keep_id}}), (dup:{label} {{id: $duplicate_id}}) WHERE keep <> dup "
+            f"{self._relationship_moves()} "
+            f"DETACH DELETE dup"
         )
+        summary = self._execute_query(query, {"keep_id": keep_id, "duplicate_id": duplicate_id},
+                                      fetch_type='consume', bulk=True, write=True)
+        if label == "Patient":
+            # The kept patient gains the doctors of the duplicate: cached sets are rebuilt
+            self.assignment_cache.clear()
+        elif label == "Medecin":
+            self._invalidate_deleted_nodes(label, [keep_id, duplicate_id])
+        return summary.counters.nodes_deleted > 0
 
-    def link_patient_consultation(self, patient_id, consultation_id):
-        """Links a patient to a consultation."""
-        return self.create_relationship(
-            "Patient", "id", patient_id,
-            "Consultation", "id", consultation_id,
-            "CONSULTE"
+    @staticmethod
+    def _relationship_moves():
+        """CALL subqueries re-creating every relationship of `dup` on `keep` (properties kept)."""
+        return " ".join(
+            f"CALL {{ WITH keep, dup MATCH (dup)-[r:{rel_type}]->(o) WHERE o <> keep "
+            f"MERGE (keep)-[k:{rel_type}]->(o) SET k += properties(r) }} "
+            f"CALL {{ WITH keep, dup MATCH (o)-[r:{rel_type}]->(dup) WHERE o <> keep "
+            f"MERGE (o)-[k:{rel_type}]->(keep) SET k += properties(r) }}"
+            for rel_type in RELATIONSHIP_TYPES
         )
-        
+
+    # --- Assignment cache invalidation ---
+    @staticmethod
+    def _is_assignment(from_label, from_prop_name, to_label, to_prop_name, rel_type):
+        return (rel_type == TREATING_PHYSICIAN_REL and from_label == "Patient" and to_label == "Medecin"
+                and from_prop_name == "id" and to_prop_name == "id")
+
+    def _invalidate_deleted_nodes(self, label, ids):
+        if label == "Patient":
+            for patient_id in ids:
+                self.assignment_cache.remove_patient(patient_id)
+        elif label == "Medecin":
+            for medecin_id in ids:
+                self.assignment_cache.remove_medecin(medecin_id)
+
+    # --- Graph Queries ---
     def get_patients_assigned_to_medecin(self, medecin_id):
         """
         Retrieves the IDs of all patients who are assigned to a specific doctor
-        as their treating physician in Neo4j.
+        as their treating physician in Neo4j. Served from the assignment cache when possible.
         """
+        cached = self.assignment_cache.get(medecin_id)
+        if cached is not None:
+            return cached
+        generation = self.assignment_cache.generation()
         query = (
             f"MATCH (p:Patient)-[:A_POUR_MEDECIN_TRAITANT]->(m:Medecin {{id: $medecin_id}}) "
             f"RETURN p.id AS patient_id"
@@ -166,26 +403,83 @@ class Neo4jDB:
         # Fetch all records, each record will have a 'patient_id' property
         records = self._execute_query(query, parameters, fetch_type='all')
         # Extract patient IDs from the records
-        return [record["patient_id"] for record in records]
-
-    def link_consultation_medecin(self, consultation_id, medecin_id):
-        """Links a consultation to a doctor."""
-        return self.create_relationship(
-            "Consultation", "id", consultation_id,
-            "Medecin", "id", medecin_id,
-            "EST_ASSIGNEE_A"
+        patient_ids = [record["patient_id"] for record in records]
+        self.assignment_cache.put(medecin_id, patient_ids, generation)
+        return patient_ids
+
+    def count_patients_assigned_to_medecins(self, medecin_ids):
+        """Panel sizes of several doctors, in one UNWIND query."""
+        medecin_ids = list(medecin_ids)
+        if not medecin_ids:
+            return {}
+        query = (
+            "UNWIND $ids AS medecin_id "
+            "OPTIONAL MATCH (p:Patient)-[:A_POUR_MEDECIN_TRAITANT]->(:Medecin {id: medecin_id}) "
+            "RETURN medecin_id, count(p) AS patients"
+        )
+        records = self._execute_query(query, {"ids": medecin_ids}, fetch_type='all',
+                                      bulk=len(medecin_ids) > config.NEO4J_BULK_ROWS)
+        return {record["medecin_id"]: record["patients"] for record in records}
+
+    def get_medecins_traitants_of_patients(self, patient_ids):
+        """Retrieves the distinct IDs of the treating physicians of several patients, in one query."""
+        if not patient_ids:
+            return []
+        query = (
+            "UNWIND $ids AS patient_id "
+            "MATCH (:Patient {id: patient_id})-[:A_POUR_MEDECIN_TRAITANT]->(m:Medecin) "
+            "RETURN DISTINCT m.id AS medecin_id"
+        )
+        records = self._execute_query(query, {"ids": list(patient_ids)}, fetch_type='all')
+        return [record["medecin_id"] for record in records]
+
+    def warm_assignment_cache(self, limit=None):
+        """
+        Loads the assignments of the `limit` most active doctors (by number of consultations)
+        into the cache, in one query. Returns the number of doctors loaded.
+        """
+        limit = config.ASSIGNMENT_CACHE_WARMUP if limit is None else limit
+        if limit <= 0:
+            return 0
+        generation = self.assignment_cache.generation()
+        query = (
+            "MATCH (m:Medecin) "
+            "OPTIONAL MATCH (m)<-[:EST_ASSIGNEE_A]-(c:Consultation) "
+            "WITH m, count(c) AS activity ORDER BY activity DESC LIMIT $limit "
+            "OPTIONAL MATCH (p:Patient)-[:A_POUR_MEDECIN_TRAITANT]->(m) "
+            "RETURN m.id AS medecin_id, collect(p.id) AS patient_ids"
+        )
+        records = self._execute_query(query, {"limit": limit}, fetch_type='all', bulk=True)
+        for record in records:
+            self.assignment_cache.put(record["medecin_id"], record["patient_ids"], generation)
+        return len(records)
+
+    def collapse_consultation_nodes(self, consultation_ids):
+        """
+        Replaces archived Consultation nodes by per-patient/per-doctor aggregates:
+        each (Patient)-[:HISTORIQUE_CONSULTATIONS]->(Medecin) relationship holds the number of
+        collapsed consultations and their first/last dates. Counting and deleting happen in
+        the same query, so re-running it on the same ids never counts a consultation twice.
+        """
+        if not consultation_ids:
+            return 0
+        query = (
+            "UNWIND $ids AS consultation_id "
+            "MATCH (c:Consultation {id: consultation_id}) "
+            "OPTIONAL MATCH (p:Patient)-[:CONSULTE]->(c) "
+            "OPTIONAL MATCH (c)-[:EST_ASSIGNEE_A]->(m:Medecin) "
+            "WITH p, m, collect(DISTINCT c) AS nodes, count(DISTINCT c.id) AS n, "
+            "     min(c.date_heure) AS first, max(c.date_heure) AS last "
+            "FOREACH (_ IN CASE WHEN p IS NULL OR m IS NULL THEN [] ELSE [1] END | "
+            "  MERGE (p)-[h:HISTORIQUE_CONSULTATIONS]->(m) "
+            "  SET h.nombre = coalesce(h.nombre, 0) + n, "
+            "      h.premiere_consultation = CASE WHEN h.premiere_consultation IS NULL OR first < h.premiere_consultation "
+            "                                     THEN first ELSE h.premiere_consultation END, "
+            "      h.derniere_consultation = CASE WHEN h.derniere_consultation IS NULL OR last > h.derniere_consultation "
+            "                                     THEN last ELSE h.derniere_consultation END) "
+            "FOREACH (c IN nodes | DETACH DELETE c)"
         )
+        summary = self._execute_query(query, {"ids": list(consultation_ids)}, fetch_type='consume', bulk=True,
+                                      write=True)
+        return summary.counters.nodes_deleted
 
-    # --- Bonus: User ---
-    def create_user_node(self, user_id, username, role):
-        """Creates a user node."""
-        properties = {"id": user_id, "username": username, "role": role}
-        return self.create_node("Utilisateur", properties)
-
-    def link_user_to_entity(self, user_id, entity_type, entity_id):
-        """Links a user to an entity (Patient or Medecin)."""
-        return self.create_relationship(
-            "Utilisateur", "id", user_id,
-            entity_type, "id", entity_id,
-            "EST_ASSOCIE_A"
-        )
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Text normalization shared by the search and matching features: accent- and
+case-insensitive tokens, French phonetic keys, Jaro-Winkler similarity, and the
+`search_keys` / `blocking_keys` stored on patient documents.
+"""
+import re
+import unicodedata
+
+# Patient fields covered by the search keys
+PATIENT_SEARCH_FIELDS = ("nom", "prenom", "username")
+# Patient fields the stored keys (search_keys, blocking_keys) are derived from
+PATIENT_KEY_FIELDS = ("nom", "prenom", "username", "date_naissance")
+
+# Spelling variants sharing a French pronunciation, applied in order by phonetic_key
+_PHONETIC_RULES = [
+    ("eaux", "o"), ("eau", "o"), ("ault", "o"), ("aud", "o"), ("aut", "o"), ("au", "o"), ("ou", "u"),
+    ("sch", "s"), ("ch", "s"), ("ph", "f"), ("qu", "k"), ("gu", "g"), ("ck", "k"), ("th", "t"),
+    ("gn", "n"), ("c", "k"), ("q", "k"), ("z", "s"), ("w", "v"), ("y", "i"), ("h", ""),
+]
+_CONSONANT_CLASSES = str.maketrans("bdgv", "ptkf")
+_SILENT_ENDINGS = "estdx"
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# Generated part of a patient username: "dupont_jean_2_patient" -> "dupont_jean"
+_USERNAME_SUFFIX = re.compile(r"(_\d+)?_patient$")
+
+
+def normalize_text(text):
+    """Lowercases, strips accents and replaces punctuation/underscores by spaces: "Lefèvre-Dupré" -> "lefevre dupre"."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    ascii_text = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return " ".join(_NON_ALNUM.split(ascii_text)).strip()
+
+
+def tokenize(text):
+    """Normalized tokens of `text`."""
+    return normalize_text(text).split()
+
+
+def field_tokens(document, field):
+    """
+    Normalized tokens of a searchable field. The generated "_patient" suffix and namesake
+    counter of a username are dropped: they are shared by every patient.
+    """
+    value = document.get(field)
+    if field == "username" and isinstance(value, str):
+        value = _USERNAME_SUFFIX.sub("", value)
+    return tokenize(value)
+
+
+def search_keys(document, fields=PATIENT_SEARCH_FIELDS):
+    """Sorted distinct normalized tokens of the searchable fields of a document."""
+    keys = set()
+    for field in fields:
+        keys.update(field_tokens(document, field))
+    return sorted(keys)
+
+
+def phonetic_key(text):
+    """
+    French phonetic key of a name: "Renaud", "Renault" and "Reno" -> "rn". Spelling
+    variants are folded, silent endings dropped, voiced/unvoiced consonants merged,
+    vowels after the first letter removed and repeated letters collapsed.
+    """
+    word = normalize_text(text).replace(" ", "")
+    if not word:
+        return ""
+    for pattern, replacement in _PHONETIC_RULES:
+        word = word.replace(pattern, replacement)
+    while len(word) > 2 and word[-1] in _SILENT_ENDINGS:
+        word = word[:-1]
+    word = word.translate(_CONSONANT_CLASSES)
+    key = word[:1]
+    for letter in word[1:]:
+        if letter not in "aeiou" and letter != key[-1]:
+            key += letter
+    return key
+
+
+def blocking_keys(document):
+    """
+    Keys under which a patient is compared with others by the duplicate detection: the
+    phonetic key of its nom and of its prenom, each combined with the birth date (or with
+    the other name's key when the birth date is unknown).
+    """
+    nom, prenom = phonetic_key(document.get("nom")), phonetic_key(document.get("prenom"))
+    birth_date = document.get("date_naissance")
+    if birth_date:
+        return sorted({f"{key}|{birth_date}" for key in (nom, prenom) if key})
+    return [f"{nom}|{prenom}"] if nom and prenom else []
+
+
+def patient_keys(document):
+    """The derived key fields stored on a patient document."""
+    return {"search_keys": search_keys(document), "blocking_keys": blocking_keys(document)}
+
+
+def jaro_winkler(a, b, prefix_scale=0.1):
+    """Jaro-Winkler similarity of two strings, between 0 and 1."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    window = max(max(len(a), len(b)) // 2 - 1, 0)
+    a_matched, b_matched = [False] * len(a), [False] * len(b)
+    matches = 0
+    for i, letter in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == letter:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+    a_letters = [letter for letter, matched in zip(a, a_matched) if matched]
+    b_letters = [letter for letter, matched in zip(b, b_matched) if matched]
+    transpositions = sum(x != y for x, y in zip(a_letters, b_letters)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+def match_score(query_tokens, document, weights=(("nom", 3), ("prenom", 2), ("username", 1))):
+    """
+    Relevance of a document for prefix query tokens: for each token, the weight of the best
+    field it matches, doubled when it matches a whole word rather than a prefix.
+    """
+    weighted_tokens = [(field_tokens(document, field), weight) for field, weight in weights]
+    score = 0
+    for query_token in query_tokens:
+        best = 0
+        for tokens, weight in weighted_tokens:
+            for token in tokens:
+                if token == query_token:
+                    best = max(best, 2 * weight)
+                elif token.startswith(query_token):
+                    best = max(best, weight)
+        score += best
+    return score
@@ -0,0 +1,107 @@
+"""
+Duplicate detection of patients. Candidates are only looked for among the patients
+sharing one of the `blocking_keys` of a document (phonetic nom or prenom + birth date),
+which keeps both the inline check on create (one indexed query) and the batch scan of
+the whole collection far from an all-pairs comparison. Candidates are then scored with
+Jaro-Winkler on the normalized names.
+"""
+from itertools import combinations
+
+import config
+from database.normalization import blocking_keys, jaro_winkler, normalize_text, phonetic_key
+
+MATCH_FIELDS = {"nom": 1, "prenom": 1, "date_naissance": 1, "username": 1}
+PHONETIC_MATCH_SCORE = 0.95  # name score of two spellings sharing a phonetic key ("Dupont" / "Dupond")
+
+
+def name_similarity(a, b):
+    """Similarity of two names: Jaro-Winkler of their normalized forms, or PHONETIC_MATCH_SCORE if they sound alike."""
+    a, b = normalize_text(a), normalize_text(b)
+    if not a or not b:
+        return 0.0
+    score = jaro_winkler(a, b)
+    if score < PHONETIC_MATCH_SCORE and phonetic_key(a) == phonetic_key(b):
+        return PHONETIC_MATCH_SCORE
+    return score
+
+
+def similarity(a, b):
+    """
+    Similarity of two patient documents between 0 and 1: the mean similarity of nom and
+    prenom (possibly swapped), halved when the birth dates differ and slightly lowered
+    when one of them is unknown.
+    """
+    score = max(
+        (name_similarity(a.get("nom"), b.get("nom")) + name_similarity(a.get("prenom"), b.get("prenom"))) / 2,
+        (name_similarity(a.get("nom"), b.get("prenom")) + name_similarity(a.get("prenom"), b.get("nom"))) / 2,
+    )
+    a_date, b_date = a.get("date_naissance"), b.get("date_naissance")
+    if a_date and b_date and a_date != b_date:
+        score *= 0.5
+    elif not a_date or not b_date:
+        score *= 0.9
+    return round(score, 4)
+
+
+class PatientDuplicateDetector:
+    def __init__(self, mongo_db, threshold=None):
+        self.mongo_db = mongo_db
+        self.threshold = config.DUPLICATE_SCORE_THRESHOLD if threshold is None else threshold
+
+    def find_duplicates(self, patient_data, exclude_id=None, limit=None, pending=()):
+        """
+        Probable duplicates of a (new or existing) patient, best first, as
+        {"id", "nom", "prenom", "date_naissance", "username", "score"} dicts. `pending` holds
+        documents about to be inserted (with their _id), compared as well.
+        """
+        keys = blocking_keys(patient_data)
+        if not keys:
+            return []
+        query = {"blocking_keys": {"$in": keys}}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        cursor = self.mongo_db.get_collection("patients").find(query, MATCH_FIELDS)
+        candidates = list(cursor.limit(limit or config.DUPLICATE_CANDIDATE_LIMIT))
+        candidates += [doc for doc in pending if set(keys) & set(blocking_keys(doc))]
+        matches = []
+        for candidate in candidates:
+            score = similarity(patient_data, candidate)
+            if score >= self.threshold:
+                matches.append({"id": str(candidate["_id"]), "nom": candidate.get("nom"),
+                                "prenom": candidate.get("prenom"),
+                                "date_naissance": candidate.get("date_naissance"),
+                                "username": candidate.get("username"), "score": score})
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches
+
+    def scan(self, batch_size=None, max_block_size=None):
+        """
+        Yields (id_a, id_b, score) for every pair of probable duplicates of the collection.
+        An aggregation on `blocking_keys` streams the blocks (ids of the patients sharing a
+        key, with at least two members); the documents of one block at a time are read and
+        only the pairs within it are scored. A pair sharing two keys is scored in the block
+        of the first one only. Blocks above `max_block_size` are skipped.
+        """
+        max_block_size = max_block_size or config.DUPLICATE_MAX_BLOCK_SIZE
+        pipeline = [
+            {"$project": {"blocking_keys": 1}},
+            {"$unwind": "$blocking_keys"},
+            {"$group": {"_id": "$blocking_keys", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        blocks = self.mongo_db.get_collection("patients").aggregate(
+            pipeline, allowDiskUse=True, batchSize=batch_size or config.EXPORT_BATCH_SIZE)
+        projection = {**MATCH_FIELDS, "blocking_keys": 1}
+        for block in blocks:
+            key = block["_id"]
+            if block["count"] > max_block_size:
+                print(f"Bloc '{key}' ignore ({block['count']} patients).")
+                continue
+            patients = sorted(self.mongo_db.find_documents_by_ids("patients", block["ids"], projection),
+                              key=lambda patient: patient["_id"])
+            for a, b in combinations(patients, 2):
+                if min(set(a["blocking_keys"]) & set(b["blocking_keys"])) != key:
+                    continue
+                score = similarity(a, b)
+                if score >= self.threshold:
+                    yield str(a["_id"]), str(b["_id"]), score
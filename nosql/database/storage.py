@@ -0,0 +1,241 @@
+"""
+Storage interfaces.
+
+Documents: `MongoDB` talks to any client exposing the pymongo API, so the document
+backend is chosen by the client it is given (pymongo.MongoClient or the in-process
+database.memory_store.MemoryClient).
+
+Graph: `GraphStore` declares the graph primitives every backend implements
+(`Neo4jDB` over Cypher, `MemoryGraphDB` over in-process adjacency lists); the
+entity-level helpers used by the application are built on top of them here.
+
+Backends are created by database.backends.create_stores, according to config.STORAGE_BACKEND.
+"""
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+
+# Node labels and relationship types of the clinic graph
+NODE_LABELS = ("Patient", "Medecin", "Consultation", "Utilisateur")
+RELATIONSHIP_TYPES = (
+    "A_POUR_MEDECIN_TRAITANT", "CONSULTE", "EST_ASSIGNEE_A", "EST_ASSOCIE_A", "HISTORIQUE_CONSULTATIONS"
+)
+
+
+class GraphUnavailableError(Exception):
+    """The graph backend is unreachable, timed out, or its circuit breaker is open."""
+
+
+class GraphStore(ABC):
+    # --- Lifecycle ---
+    @abstractmethod
+    def close(self):
+        """Releases the backend resources."""
+
+    @abstractmethod
+    def ensure_indexes(self):
+        """Creates the uniqueness constraints/indexes used to match nodes by id (idempotent)."""
+
+    @abstractmethod
+    def clear(self):
+        """Deletes every node and relationship."""
+
+    def begin_request(self):
+        """Called at the start of each API request (backends may open a request-scoped session)."""
+
+    def end_request(self):
+        """Called at the end of each API request, to release what begin_request acquired."""
+
+    def transaction(self):
+        """Context manager grouping the enclosed graph operations in one transaction, where supported."""
+        return nullcontext()
+
+    # --- CRUD for Nodes ---
+    @abstractmethod
+    def create_node(self, label, properties):
+        """Creates a node with the given label and properties; a node with the same id is updated instead."""
+
+    @abstractmethod
+    def find_node(self, label, property_name, property_value):
+        """Finds a node by label and a specific property."""
+
+    @abstractmethod
+    def update_node(self, label, match_prop_name, match_prop_value, new_properties):
+        """Updates properties of an existing node."""
+
+    @abstractmethod
+    def delete_node(self, label, property_name, property_value):
+        """Deletes a node and its relationships. Returns True if a node was deleted."""
+
+    # --- Relationship Management ---
+    @abstractmethod
+    def create_relationship(self, from_label, from_prop_name, from_prop_value,
+                            to_label, to_prop_name, to_prop_value,
+                            rel_type, rel_properties={}):
+        """Creates (merges) a relationship between two nodes."""
+
+    @abstractmethod
+    def delete_relationship(self, from_label, from_prop_name, from_prop_value,
+                            to_label, to_prop_name, to_prop_value,
+                            rel_type):
+        """Deletes a specific relationship between two nodes. Returns True if one was deleted."""
+
+    # --- Batch Operations ---
+    @abstractmethod
+    def create_nodes(self, label, rows):
+        """Creates (merges on id) one node per properties dict in `rows`. Returns the number created."""
+
+    @abstractmethod
+    def update_nodes(self, label, rows):
+        """Updates nodes matched by id. Each row is {"id": ..., "props": {...}}."""
+
+    @abstractmethod
+    def delete_nodes(self, label, ids):
+        """Deletes the nodes whose id is in `ids`. Returns the number deleted."""
+
+    @abstractmethod
+    def create_relationships(self, from_label, to_label, rel_type, pairs):
+        """Creates (merges) a relationship for each {"from_id": ..., "to_id": ...} pair."""
+
+    # --- Graph Queries ---
+    @abstractmethod
+    def get_patients_assigned_to_medecin(self, medecin_id):
+        """Retrieves the IDs of the patients whose treating physician is `medecin_id`."""
+
+    @abstractmethod
+    def count_patients_assigned_to_medecins(self, medecin_ids):
+        """Returns {medecin_id: number of patients whose treating physician it is} for `medecin_ids`."""
+
+    @abstractmethod
+    def get_medecins_traitants_of_patients(self, patient_ids):
+        """Retrieves the distinct IDs of the treating physicians of the patients in `patient_ids`."""
+
+    @abstractmethod
+    def collapse_consultation_nodes(self, consultation_ids):
+        """Replaces archived Consultation nodes by per-patient/per-doctor HISTORIQUE_CONSULTATIONS aggregates."""
+
+    # --- Maintenance ---
+    @abstractmethod
+    def dedup_nodes(self, label, batch_size):
+        """
+        Merges up to `batch_size` groups of `label` nodes sharing the same id into one node
+        (relationships moved, newest properties kept). Returns the number of nodes removed.
+        """
+
+    @abstractmethod
+    def merge_nodes(self, label, keep_id, duplicate_id):
+        """
+        Merges the `label` node `duplicate_id` into the node `keep_id`: its relationships are
+        moved to the kept node (whose properties are unchanged), then it is deleted.
+        Returns False when one of the two nodes does not exist.
+        """
+
+    # --- Specific Functions for Entities ---
+    def create_patient_node(self, patient_id, nom, prenom, date_naissance=None):
+        """Creates a patient node."""
+        properties = {"id": patient_id, "nom": nom, "prenom": prenom}
+        if date_naissance:
+            properties["date_naissance"] = date_naissance
+        return self.create_node("Patient", properties)
+
+    def update_patient_node(self, patient_id, new_data):
+        """Updates a patient node."""
+        return self.update_node("Patient", "id", patient_id, new_data)
+
+    def delete_patient_node(self, patient_id):
+        """Deletes a patient node."""
+        return self.delete_node("Patient", "id", patient_id)
+
+    def create_medecin_node(self, medecin_id, nom, prenom, specialite):
+        """Creates a doctor node."""
+        properties = {"id": medecin_id, "nom": nom, "prenom": prenom, "specialite": specialite}
+        return self.create_node("Medecin", properties)
+
+    def update_medecin_node(self, medecin_id, new_data):
+        """Updates a doctor node."""
+        return self.update_node("Medecin", "id", medecin_id, new_data)
+
+    def delete_medecin_node(self, medecin_id):
+        """Deletes a doctor node."""
+        return self.delete_node("Medecin", "id", medecin_id)
+
+    def create_consultation_node(self, consultation_id, date_heure, motif):
+        """Creates a consultation node."""
+        properties = {"id": consultation_id, "date_heure": date_heure, "motif": motif}
+        return self.create_node("Consultation", properties)
+
+    def update_consultation_node(self, consultation_id, new_data):
+        """Updates a consultation node."""
+        return self.update_node("Consultation", "id", consultation_id, new_data)
+
+    def delete_consultation_node(self, consultation_id):
+        """Deletes a consultation node."""
+        return self.delete_node("Consultation", "id", consultation_id)
+
+    def link_patient_to_medecin_traitant(self, patient_id, medecin_id):
+        """Links a patient to their treating doctor."""
+        return self.create_relationship(
+            "Patient", "id", patient_id,
+            "Medecin", "id", medecin_id,
+            "A_POUR_MEDECIN_TRAITANT"
+        )
+
+    def remove_patient_medecin_traitant_link(self, patient_id, medecin_id):
+        """Removes the link between a patient and their treating doctor."""
+        return self.delete_relationship(
+            "Patient", "id", patient_id,
+            "Medecin", "id", medecin_id,
+            "A_POUR_MEDECIN_TRAITANT"
+        )
+
+    def link_patients_to_medecins_traitants(self, pairs):
+        """Links several (patient_id, medecin_id) pairs in a single batch operation."""
+        return self.create_relationships(
+            "Patient", "Medecin", "A_POUR_MEDECIN_TRAITANT",
+            [{"from_id": patient_id, "to_id": medecin_id} for patient_id, medecin_id in pairs]
+        )
+
+    def link_patient_consultation(self, patient_id, consultation_id):
+        """Links a patient to a consultation."""
+        return self.create_relationship(
+            "Patient", "id", patient_id,
+            "Consultation", "id", consultation_id,
+            "CONSULTE"
+        )
+
+    def remove_patient_consultation_link(self, patient_id, consultation_id):
+        """Removes the link between a patient and a consultation."""
+        return self.delete_relationship(
+            "Patient", "id", patient_id,
+            "Consultation", "id", consultation_id,
+            "CONSULTE"
+        )
+
+    def link_consultation_medecin(self, consultation_id, medecin_id):
+        """Links a consultation to a doctor."""
+        return self.create_relationship(
+            "Consultation", "id", consultation_id,
+            "Medecin", "id", medecin_id,
+            "EST_ASSIGNEE_A"
+        )
+
+    def remove_consultation_medecin_link(self, consultation_id, medecin_id):
+        """Removes the link between a consultation and a doctor."""
+        return self.delete_relationship(
+            "Consultation", "id", consultation_id,
+            "Medecin", "id", medecin_id,
+            "EST_ASSIGNEE_A"
+        )
+
+    # --- Bonus: User ---
+    def create_user_node(self, user_id, username, role):
+        """Creates a user node."""
+        properties = {"id": user_id, "username": username, "role": role}
+        return self.create_node("Utilisateur", properties)
+
+    def link_user_to_entity(self, user_id, entity_type, entity_id):
+        """Links a user to an entity (Patient or Medecin)."""
+        return self.create_relationship(
+            "Utilisateur", "id", user_id,
+            entity_type, "id", entity_id,
+            "EST_ASSOCIE_A"
+        )
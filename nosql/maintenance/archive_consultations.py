@@ -0,0 +1,146 @@
+"""
+Archival job: moves consultations older than the archive horizon from `consultations`
+to the compressed `consultations_archive` collection, batch by batch, and collapses the
+matching Neo4j Consultation nodes into per-patient/per-doctor aggregates.
+
+A batch is first marked in the hot collection (ARCHIVE_BATCH_FIELD), then copied to the
+archive and deleted from the hot collection by that mark. API writes stay safe meanwhile:
+an update removes the mark, so the consultation stays hot and its archive copy is
+discarded; a delete also removes the archive copy (see MongoDB.update_consultation and
+MongoDB.delete_consultation). Only the consultations actually moved are collapsed.
+
+The job is resumable: the batch in progress is recorded in `maintenance_state` and
+settled at the next start, so an interrupted run can simply be started again.
+
+Usage (from the nosql/ directory):
+    python -m maintenance.archive_consultations --horizon-days 730
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+
+import config
+from database.mongo_db import ARCHIVE_BATCH_FIELD, ARCHIVE_COLLECTION, MAINTENANCE_COLLECTION
+
+
+class ConsultationArchiver:
+    def __init__(self, mongo_db, neo4j_db, batch_size=None):
+        self.mongo_db = mongo_db
+        self.neo4j_db = neo4j_db
+        self.batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+
+    @staticmethod
+    def horizon_for(days, now=None):
+        """date_heure value (YYYY-MM-DDTHH:MM) `days` days before now."""
+        return ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M")
+
+    def _record_batch(self, ids, deleting=False):
+        """Records the batch in progress (None once it is settled), for an interrupted run."""
+        state = self.mongo_db.get_collection(MAINTENANCE_COLLECTION)
+        if ids is None:
+            state.delete_one({"_id": ARCHIVE_BATCH_FIELD})
+        else:
+            state.update_one({"_id": ARCHIVE_BATCH_FIELD}, {"$set": {"ids": ids, "deleting": deleting}}, upsert=True)
+
+    def _copy_to_archive(self, consultations):
+        """Writes the batch to the archive, replacing any copy left by an interrupted run."""
+        archive = self.mongo_db.get_collection(ARCHIVE_COLLECTION)
+        archive.delete_many({"_id": {"$in": [c["_id"] for c in consultations]}})
+        archive.insert_many([{k: v for k, v in c.items() if k != ARCHIVE_BATCH_FIELD} for c in consultations])
+
+    def _settle(self, ids, deleting):
+        """
+        Discards the archive copies of the consultations that do not move: before the hot
+        delete, those deleted through the API; after it, those still hot (taken back by an
+        update), the others being collapsed in the graph. Returns the ids that move.
+        """
+        hot_ids = self.mongo_db.find_existing_ids("consultations", ids)
+        moving = [i for i in ids if (i in hot_ids) != deleting]
+        discarded = [i for i in ids if (i in hot_ids) == deleting]
+        if discarded:
+            self.mongo_db.get_collection(ARCHIVE_COLLECTION).delete_many({"_id": {"$in": discarded}})
+        if deleting:
+            self.neo4j_db.collapse_consultation_nodes([str(i) for i in moving])
+        return moving
+
+    def resume(self):
+        """Settles the batch left by an interrupted run, if any."""
+        state = self.mongo_db.find_document(MAINTENANCE_COLLECTION, {"_id": ARCHIVE_BATCH_FIELD})
+        if not state:
+            return
+        if state["deleting"]:
+            self._settle(state["ids"], deleting=True)
+        else:
+            # Nothing was deleted from the hot collection: the batch is redone from scratch
+            self.mongo_db.get_collection(ARCHIVE_COLLECTION).delete_many({"_id": {"$in": state["ids"]}})
+        self._record_batch(None)
+
+    def archive_batch(self, horizon):
+        """
+        Moves one batch of consultations older than `horizon`. Returns the number moved,
+        or None once no consultation older than `horizon` is left.
+        """
+        hot = self.mongo_db.get_collection("consultations")
+        ids = [c["_id"] for c in hot.find({"date_heure": {"$lt": horizon}}, {"_id": 1})
+               .sort("_id", ASCENDING).limit(self.batch_size)]
+        if not ids:
+            return None
+        token = ObjectId()
+        hot.update_many({"_id": {"$in": ids}, "date_heure": {"$lt": horizon}}, {"$set": {ARCHIVE_BATCH_FIELD: token}})
+        consultations = list(hot.find({ARCHIVE_BATCH_FIELD: token}))
+        if not consultations:
+            return 0
+        ids = [c["_id"] for c in consultations]
+        self._record_batch(ids)
+        self._copy_to_archive(consultations)
+        ids = self._settle(ids, deleting=False)
+        self._record_batch(ids, deleting=True)
+        hot.delete_many({ARCHIVE_BATCH_FIELD: token})
+        moved = self._settle(ids, deleting=True)
+        self._record_batch(None)
+        return len(moved)
+
+    def run(self, horizon_days=None):
+        """Archives every consultation older than `horizon_days` days. Returns the number moved."""
+        horizon = self.horizon_for(horizon_days if horizon_days is not None else config.ARCHIVE_HORIZON_DAYS)
+        self.mongo_db.ensure_archive_collection()
+        self.resume()
+        # The horizon is published before moving anything, and nothing is moved until the
+        # horizon cached by the API processes has expired: from then on, reads that reach
+        # before it union the archive, so moved consultations stay visible.
+        self.mongo_db.set_archive_horizon(horizon)
+        pending = self.mongo_db.archive_horizon_pending_seconds()
+        if pending:
+            print(f"Archivage: attente de {pending:.0f} s (propagation de l'horizon aux processus API)...")
+            time.sleep(pending)
+        total = 0
+        while True:
+            moved = self.archive_batch(horizon)
+            if moved is None:
+                break
+            total += moved
+            print(f"Archivage: {total} consultations deplacees...")
+        print(f"Archivage termine: {total} consultations anterieures a {horizon} archivees.")
+        return total
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Archivage des anciennes consultations.")
+    parser.add_argument("--horizon-days", type=int, default=config.ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--batch-size", type=int, default=config.ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    mongo_db, neo4j_db = create_stores()
+    try:
+        ConsultationArchiver(mongo_db, neo4j_db, args.batch_size).run(args.horizon_days)
+    finally:
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
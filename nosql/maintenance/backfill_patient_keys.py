@@ -0,0 +1,56 @@
+"""
+Backfill job: computes the derived keys (`search_keys`, `blocking_keys`) of every patient
+document (needed once for the patients created before these indexes existed, or after a
+normalization change).
+
+Patients are read through a server-side cursor and updated with one bulk_write per batch.
+The job is idempotent.
+
+Usage (from the nosql/ directory):
+    python -m maintenance.backfill_patient_keys
+"""
+import argparse
+
+import config
+from database.mongo_db import UpdateOp
+from database.normalization import PATIENT_KEY_FIELDS, patient_keys
+
+
+def backfill_patient_keys(mongo_db, batch_size=None):
+    """Rewrites the derived keys of every patient whose keys are missing or stale. Returns the number updated."""
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    projection = {field: 1 for field in PATIENT_KEY_FIELDS + ("search_keys", "blocking_keys")}
+    operations, updated = [], 0
+    for patient in mongo_db.iter_documents("patients", projection=projection, batch_size=batch_size):
+        keys = patient_keys(patient)
+        if any(patient.get(field) != value for field, value in keys.items()):
+            operations.append(UpdateOp({"_id": patient["_id"]}, {"$set": keys}))
+        if len(operations) >= batch_size:
+            mongo_db.bulk_write("patients", operations)
+            updated += len(operations)
+            operations = []
+            print(f"Cles patients: {updated} patients mis a jour...")
+    if operations:
+        mongo_db.bulk_write("patients", operations)
+        updated += len(operations)
+    print(f"Cles patients a jour ({updated} patients modifies).")
+    return updated
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Calcul des cles de recherche et de dedoublonnage des patients.")
+    parser.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    mongo_db, neo4j_db = create_stores()
+    try:
+        mongo_db.ensure_indexes()
+        backfill_patient_keys(mongo_db, args.batch_size)
+    finally:
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
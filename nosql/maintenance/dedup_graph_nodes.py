@@ -0,0 +1,62 @@
+"""
+One-off cleanup job: merges graph nodes that share the same label and id.
+
+Before node creation moved to MERGE on id, every consultation update created a new
+Consultation node with its own CONSULTE / EST_ASSIGNEE_A relationships. This job
+merges each group of duplicates into one node, applying their properties in write
+order (the last written wins, see Neo4jDB.dedup_nodes) and moving their relationships,
+batch by batch, then installs the uniqueness constraints that could not be created
+while duplicates existed. Nodes written before write times were recorded are merged in
+an arbitrary order. Re-running it is harmless.
+
+Usage (from the nosql/ directory):
+    python -m maintenance.dedup_graph_nodes
+"""
+import argparse
+
+import config
+from database.storage import NODE_LABELS
+
+
+class GraphNodeDeduplicator:
+    def __init__(self, neo4j_db, batch_size=None):
+        self.neo4j_db = neo4j_db
+        self.batch_size = batch_size or config.DEDUP_BATCH_SIZE
+
+    def dedup_label(self, label):
+        """Merges every group of duplicate `label` nodes. Returns the number of nodes removed."""
+        total = 0
+        while True:
+            removed = self.neo4j_db.dedup_nodes(label, self.batch_size)
+            if not removed:
+                break
+            total += removed
+            print(f"Dedoublonnage {label}: {total} noeuds fusionnes...")
+        return total
+
+    def run(self, labels=NODE_LABELS):
+        """Deduplicates every label, then creates the uniqueness constraints. Returns the counts per label."""
+        counts = {label: self.dedup_label(label) for label in labels}
+        self.neo4j_db.ensure_indexes()
+        print(f"Dedoublonnage termine: {counts}")
+        return counts
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Fusion des noeuds Neo4j en double.")
+    parser.add_argument("--label", action="append", choices=NODE_LABELS,
+                        help="Label a traiter (repetable, tous par defaut)")
+    parser.add_argument("--batch-size", type=int, default=config.DEDUP_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    _, neo4j_db = create_stores()
+    try:
+        GraphNodeDeduplicator(neo4j_db, args.batch_size).run(args.label or NODE_LABELS)
+    finally:
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Batch duplicate detection of patients, with optional merge.
+
+`scan` reads the blocks of patients sharing a blocking key (phonetic name + birth date,
+see database.patient_matching) one at a time, compares only the patients within a block
+and reports the probable duplicate pairs, optionally as NDJSON. It relies on the stored
+`blocking_keys` (see maintenance.backfill_patient_keys). With --merge, each pair is merged into its oldest
+patient. `merge` merges one explicit pair.
+
+Merging a duplicate into the kept patient:
+    - fills the fields missing from the kept document with those of the duplicate;
+    - re-points its consultations (hot and archived) and patient user accounts;
+    - deletes its document, then merges its Neo4j node into the kept one (relationships
+      moved) and refreshes the patient summaries and panel sizes.
+
+Usage (from the nosql/ directory):
+    python -m maintenance.dedup_patients scan [--output doublons.ndjson] [--merge]
+    python -m maintenance.dedup_patients merge <id_conserve> <id_doublon>
+"""
+import argparse
+import json
+
+import config
+from database.mongo_db import ARCHIVE_COLLECTION
+from database.patient_matching import PatientDuplicateDetector
+
+# Fields never copied from a duplicate: identity, login and derived keys
+_NOT_MERGED = {"_id", "username", "password", "search_keys", "blocking_keys"}
+
+
+class PatientMerger:
+    def __init__(self, mongo_db, sync_manager):
+        self.mongo_db = mongo_db
+        self.sync_manager = sync_manager
+
+    def merge(self, keep_id, duplicate_id):
+        """Merges the patient `duplicate_id` into `keep_id`. Returns False if either does not exist."""
+        keep_id, duplicate_id = str(keep_id), str(duplicate_id)
+        if keep_id == duplicate_id:
+            return False
+        keep, duplicate = self.mongo_db.get_patient(keep_id), self.mongo_db.get_patient(duplicate_id)
+        if not keep or not duplicate:
+            return False
+
+        filled_data = {k: v for k, v in duplicate.items()
+                       if k not in _NOT_MERGED and v not in (None, "") and keep.get(k) in (None, "")}
+        if filled_data:
+            self.mongo_db.update_patient(keep_id, filled_data)
+        for collection_name in ("consultations", ARCHIVE_COLLECTION):
+            self.mongo_db.get_collection(collection_name).update_many(
+                {"patient_id": duplicate_id}, {"$set": {"patient_id": keep_id}})
+        self.mongo_db.get_collection("users").update_many(
+            {"role": "patient", "entite_id": duplicate_id}, {"$set": {"entite_id": keep_id}})
+        self.mongo_db.delete_patient(duplicate_id)
+
+        self.sync_manager.sync_patient_merge(keep_id, duplicate_id, filled_data)
+        print(f"Patient {duplicate_id} fusionne dans {keep_id}.")
+        return True
+
+
+def scan(mongo_db, threshold=None, batch_size=None, max_block_size=None, output=None, merger=None):
+    """
+    Reports (and with a merger, merges) the probable duplicate pairs of the patients
+    collection. Returns the number of pairs found.
+    """
+    detector = PatientDuplicateDetector(mongo_db, threshold)
+    merged_into = {}  # duplicate id -> id of the patient it was merged into
+
+    def resolve(patient_id):
+        while patient_id in merged_into:
+            patient_id = merged_into[patient_id]
+        return patient_id
+
+    pairs = 0
+    for id_a, id_b, score in detector.scan(batch_size, max_block_size):
+        pairs += 1
+        line = {"patient_ids": [id_a, id_b], "score": score}
+        if output is not None:
+            output.write(json.dumps(line) + "\n")
+        else:
+            print(f"Doublon probable: {id_a} / {id_b} (score {score})")
+        if merger is not None:
+            # ObjectIds grow with creation time: the oldest patient is kept
+            keep_id, duplicate_id = sorted((resolve(id_a), resolve(id_b)))
+            if keep_id != duplicate_id and merger.merge(keep_id, duplicate_id):
+                merged_into[duplicate_id] = keep_id
+    print(f"Detection des doublons terminee: {pairs} paires, {len(merged_into)} patients fusionnes.")
+    return pairs
+
+
+def main(argv=None):
+    from database.backends import create_stores
+    from synchronization.sync_manager import SyncManager
+
+    parser = argparse.ArgumentParser(description="Detection et fusion des patients en double.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan_parser = subparsers.add_parser("scan", help="Detecte les doublons probables de toute la collection")
+    scan_parser.add_argument("--threshold", type=float, default=config.DUPLICATE_SCORE_THRESHOLD)
+    scan_parser.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE)
+    scan_parser.add_argument("--max-block-size", type=int, default=config.DUPLICATE_MAX_BLOCK_SIZE)
+    scan_parser.add_argument("--output", help="Fichier NDJSON des paires detectees")
+    scan_parser.add_argument("--merge", action="store_true", help="Fusionne chaque paire dans le patient le plus ancien")
+    merge_parser = subparsers.add_parser("merge", help="Fusionne un patient en double dans un autre")
+    merge_parser.add_argument("keep_id")
+    merge_parser.add_argument("duplicate_id")
+    args = parser.parse_args(argv)
+
+    mongo_db, neo4j_db = create_stores()
+    try:
+        merger = PatientMerger(mongo_db, SyncManager(mongo_db, neo4j_db))
+        if args.command == "merge":
+            if not merger.merge(args.keep_id, args.duplicate_id):
+                print("Fusion impossible: patient introuvable.")
+            return
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output:
+                scan(mongo_db, args.threshold, args.batch_size, args.max_block_size, output,
+                     merger if args.merge else None)
+        else:
+            scan(mongo_db, args.threshold, args.batch_size, args.max_block_size,
+                 merger=merger if args.merge else None)
+    finally:
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
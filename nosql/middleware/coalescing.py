@@ -0,0 +1,81 @@
+"""
+Single-flight request coalescing for hot read endpoints.
+
+Concurrent identical reads (same endpoint, same identity scope, same query string and
+Accept header) share one in-flight computation: the first request (the leader) runs
+it, the others (followers) wait for its response and receive a copy of it. Nothing is
+cached once the leader has answered. Coalescing is per process.
+"""
+import threading
+
+from flask import current_app, request
+
+import config
+from middleware import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Runs fn() once for concurrent callers of the same key. Returns (result, was_leader)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+        else:
+            call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, leader
+
+
+_flight = SingleFlight()
+
+
+def coalescing_ratio():
+    """Share of coalesced requests that were served by another request's computation."""
+    leaders, followers = metrics.get("coalescing.leaders"), metrics.get("coalescing.followers")
+    return round(followers / (leaders + followers), 4) if leaders + followers else 0.0
+
+metrics.register_gauge("coalescing.ratio", coalescing_ratio)
+
+
+def coalesced_response(scope, compute):
+    """
+    Returns the response of `compute()` (any Flask view return value), sharing it with
+    concurrent requests of the same endpoint, `scope` (identity scope, e.g. ("admin",)
+    or ("medecin", medecin_id)), query string and Accept header.
+    """
+    if not config.COALESCING_ENABLED:
+        return compute()
+    key = (request.endpoint, scope, request.query_string, request.headers.get("Accept", ""))
+
+    def run():
+        response = current_app.make_response(compute())
+        return response.get_data(), response.status_code, list(response.headers.items())
+
+    (data, status, headers), leader = _flight.do(key, run)
+    role = "leaders" if leader else "followers"
+    metrics.increment(f"coalescing.{role}")
+    metrics.increment(f"coalescing.{request.endpoint}.{role}")
+    return current_app.response_class(data, status=status, headers=headers)
@@ -0,0 +1,150 @@
+"""
+Content negotiation for API responses:
+- gzip / brotli compression (Accept-Encoding), above a size threshold for buffered
+  responses and chunk by chunk for streamed responses;
+- an optional MessagePack representation (Accept: application/msgpack) of the
+  payloads produced by jsonify.
+
+brotli and msgpack are optional packages: when they are not installed the
+corresponding format is simply never negotiated.
+"""
+import zlib
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from bson.objectid import ObjectId
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    MSGPACK_MIMETYPE,
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+
+# --- MessagePack ---
+def _msgpack_default(value):
+    """Fallback serializer for types msgpack does not know (ObjectId, datetime...)."""
+    return str(value)
+
+def wants_msgpack():
+    """True if the current request prefers MessagePack over JSON."""
+    if msgpack is None or not config.MSGPACK_ENABLED or not has_request_context():
+        return False
+    best = request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+def packb(data):
+    """Serializes `data` to MessagePack bytes."""
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider whose `response` (used by jsonify) emits MessagePack instead of
+    JSON when the client asks for it. Routes keep calling jsonify unchanged.
+    """
+    def default(self, o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        return super().default(o)
+
+    def response(self, *args, **kwargs):
+        if not wants_msgpack():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(packb(obj), mimetype=MSGPACK_MIMETYPE)
+
+
+# --- Compression ---
+def negotiate_encoding():
+    """Returns the best content encoding accepted by the client ('br', 'gzip' or None)."""
+    offers = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offers)
+
+def _new_compressor(encoding):
+    """Returns a (compress, flush, finish) triple of callables for `encoding`."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config.BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 produces a gzip container around the deflate stream
+    compressor = zlib.compressobj(config.COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    return (compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            lambda: compressor.flush(zlib.Z_FINISH))
+
+def compress_bytes(data, encoding):
+    """Compresses a whole payload."""
+    compress, _, finish = _new_compressor(encoding)
+    return compress(data) + finish()
+
+def compress_stream(chunks, encoding, flush_size=None):
+    """
+    Compresses an iterable of chunks lazily. The compressor is flushed once at least
+    `flush_size` input bytes went in since the previous flush, so the client receives
+    data as it is produced without a flush (and its compression loss) on every chunk.
+    """
+    flush_size = config.COMPRESSION_STREAM_FLUSH_SIZE if flush_size is None else flush_size
+    compress, flush, finish = _new_compressor(encoding)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += flush()
+            pending = 0
+        if data:
+            yield data
+    yield finish()
+
+def _add_vary(response, header):
+    vary = {h.strip() for h in response.headers.get("Vary", "").split(",") if h.strip()}
+    vary.add(header)
+    response.headers["Vary"] = ", ".join(sorted(vary))
+
+def compress_response(response):
+    """after_request hook: compresses the response if the client accepts it."""
+    if response.mimetype in ("application/json", MSGPACK_MIMETYPE):
+        _add_vary(response, "Accept")
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    _add_vary(response, "Accept-Encoding")
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < config.COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def init_compression(app):
+    """Installs MessagePack negotiation and response compression on a Flask app."""
+    app.json_provider_class = NegotiatingJSONProvider
+    app.json = NegotiatingJSONProvider(app)
+    app.after_request(compress_response)
@@ -0,0 +1,40 @@
+"""
+Per-process metrics registry: counters incremented by the application and gauges
+computed on demand. Exposed by the /admin/metrics route.
+"""
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def increment(name, value=1):
+    """Adds `value` to the counter `name`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def get(name):
+    """Current value of the counter `name`."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def register_gauge(name, fn):
+    """Registers a callable evaluated at snapshot time (state, ratios...)."""
+    with _lock:
+        _gauges[name] = fn
+
+
+def snapshot():
+    """Returns every counter and gauge value."""
+    with _lock:
+        values = dict(_counters)
+        gauges = dict(_gauges)
+    for name, fn in gauges.items():
+        try:
+            values[name] = fn()
+        except Exception as e:
+            values[name] = f"erreur: {e}"
+    return dict(sorted(values.items()))
@@ -0,0 +1,176 @@
+"""
+Streaming exports of consultations and patients as NDJSON or CSV.
+
+Documents are read through a server-side cursor and written out chunk by chunk,
+so memory use does not depend on the number of exported rows. Doctor and patient
+names are resolved through a bounded LRU cache, one $in query per cursor batch.
+
+CLI usage (from the nosql/ directory):
+    python -m reporting.export consultations --start 2025-01-01 --end 2025-07-01 --format csv -o consultations.csv
+    python -m reporting.export patients --format ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from collections import OrderedDict
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+import config
+from database.mongo_db import PATIENT_PROJECTION
+
+CONSULTATION_FIELDS = ["_id", "date_heure", "patient_id", "patient_nom", "medecin_id", "medecin_nom", "motif",
+                       "diagnostic"]
+PATIENT_FIELDS = ["_id", "nom", "prenom", "date_naissance", "username"]
+
+EXPORT_MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class NameLookupCache:
+    """Bounded LRU cache of entity id -> display name ("prenom nom") for one collection."""
+
+    def __init__(self, mongo_db, collection_name, max_size=None, unknown_name="Inconnu"):
+        self.mongo_db = mongo_db
+        self.collection_name = collection_name
+        self.max_size = max_size or config.EXPORT_NAME_CACHE_SIZE
+        self.unknown_name = unknown_name
+        self._names = OrderedDict()
+
+    def _store(self, entity_id, name):
+        self._names[entity_id] = name
+        self._names.move_to_end(entity_id)
+        while len(self._names) > self.max_size:
+            self._names.popitem(last=False)
+
+    def prefetch(self, entity_ids):
+        """Loads every uncached id of `entity_ids` with a single query."""
+        missing = {}
+        for entity_id in set(entity_ids):
+            if entity_id in self._names:
+                self._names.move_to_end(entity_id)
+                continue
+            try:
+                missing[ObjectId(entity_id)] = entity_id
+            except (InvalidId, TypeError):
+                self._store(entity_id, self.unknown_name)
+        if not missing:
+            return
+        documents = self.mongo_db.find_documents_by_ids(
+            self.collection_name, missing.keys(), {"nom": 1, "prenom": 1}
+        )
+        for document in documents:
+            self._store(missing.pop(document["_id"]), f"{document.get('prenom', '')} {document.get('nom', '')}")
+        for entity_id in missing.values():
+            self._store(entity_id, self.unknown_name)
+
+    def get(self, entity_id):
+        """Returns the name of `entity_id`, loading it if needed."""
+        if entity_id not in self._names:
+            self.prefetch([entity_id])
+        return self._names.get(entity_id, self.unknown_name)
+
+
+def _chunks(iterable, size):
+    """Groups an iterable into lists of at most `size` items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _serializable(document):
+    """Converts ObjectIds to strings."""
+    return {k: str(v) if isinstance(v, ObjectId) else v for k, v in document.items()}
+
+
+def iter_consultation_rows(mongo_db, start=None, end=None, batch_size=None):
+    """Yields consultations between `start` and `end`, enriched with doctor and patient names."""
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    patients = NameLookupCache(mongo_db, "patients", unknown_name="Patient Inconnu")
+    medecins = NameLookupCache(mongo_db, "medecins")
+    cursor = mongo_db.iter_consultations_between(start, end, batch_size=batch_size)
+    for chunk in _chunks(cursor, batch_size):
+        patients.prefetch(c.get("patient_id") for c in chunk)
+        medecins.prefetch(c.get("medecin_id") for c in chunk)
+        for consultation in chunk:
+            row = _serializable(consultation)
+            row["patient_nom"] = patients.get(consultation.get("patient_id"))
+            row["medecin_nom"] = medecins.get(consultation.get("medecin_id"))
+            yield row
+
+
+def iter_patient_rows(mongo_db, batch_size=None):
+    """Yields every patient, without credentials."""
+    for patient in mongo_db.iter_documents("patients", {}, PATIENT_PROJECTION, batch_size=batch_size):
+        yield _serializable(patient)
+
+
+def to_ndjson(rows, rows_per_chunk=500):
+    """Encodes rows as newline-delimited JSON, emitting one chunk every `rows_per_chunk` rows."""
+    for chunk in _chunks(rows, rows_per_chunk):
+        yield "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in chunk)
+
+
+def to_csv(rows, fields, rows_per_chunk=500):
+    """Encodes rows as CSV with a header line, emitting one chunk every `rows_per_chunk` rows."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in _chunks(rows, rows_per_chunk):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_consultations(mongo_db, fmt, start=None, end=None, batch_size=None):
+    """Returns an iterator of text chunks for the consultation export."""
+    rows = iter_consultation_rows(mongo_db, start, end, batch_size)
+    return to_csv(rows, CONSULTATION_FIELDS) if fmt == "csv" else to_ndjson(rows)
+
+
+def export_patients(mongo_db, fmt, batch_size=None):
+    """Returns an iterator of text chunks for the patient export."""
+    rows = iter_patient_rows(mongo_db, batch_size)
+    return to_csv(rows, PATIENT_FIELDS) if fmt == "csv" else to_ndjson(rows)
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Export streaming des consultations et patients.")
+    parser.add_argument("dataset", choices=["consultations", "patients"])
+    parser.add_argument("--format", choices=sorted(EXPORT_MIMETYPES), default="ndjson")
+    parser.add_argument("--start", help="Date de debut incluse (format de date_heure, ex. 2025-01-01)")
+    parser.add_argument("--end", help="Date de fin exclue")
+    parser.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="Fichier de sortie (stdout par defaut)")
+    args = parser.parse_args(argv)
+
+    mongo_db, neo4j_db = create_stores()
+    if args.dataset == "consultations":
+        chunks = export_consultations(mongo_db, args.format, args.start, args.end, args.batch_size)
+    else:
+        chunks = export_patients(mongo_db, args.format, args.batch_size)
+
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+`patient_summaries` read model: one document per patient holding the last
+PATIENT_SUMMARY_SIZE consultations (with the doctor's name), the consultation
+count and the last visit date, so the patient history is a single find_one.
+
+Document shape:
+    {"_id": "<patient_id>", "consultations": [...], "consultation_count": int, "last_visit": "<date_heure>"}
+
+Rebuild (from the nosql/ directory):
+    python -m synchronization.patient_summaries rebuild
+"""
+import argparse
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import DESCENDING
+
+import config
+from database.mongo_db import ARCHIVE_COLLECTION
+
+COLLECTION = "patient_summaries"
+
+
+def medecin_display_name(medecin):
+    """Display name of a doctor document, as shown in the patient history."""
+    return f"{medecin.get('prenom', '')} {medecin.get('nom', '')}" if medecin else "Inconnu"
+
+
+class PatientSummaryManager:
+    def __init__(self, mongo_db):
+        self.mongo_db = mongo_db
+        self.size = config.PATIENT_SUMMARY_SIZE
+
+    @property
+    def collection(self):
+        return self.mongo_db.get_collection(COLLECTION)
+
+    def _entry(self, consultation, medecin_nom):
+        """Denormalized history entry for a consultation."""
+        entry = {k: str(v) if isinstance(v, ObjectId) else v for k, v in consultation.items()}
+        entry["medecin_nom"] = medecin_nom
+        return entry
+
+    def _medecin_names(self, medecin_ids):
+        """Resolves doctor names with a single query."""
+        object_ids = []
+        for medecin_id in set(medecin_ids):
+            try:
+                object_ids.append(ObjectId(medecin_id))
+            except (InvalidId, TypeError):
+                pass
+        medecins = self.mongo_db.find_documents_by_ids("medecins", object_ids, {"nom": 1, "prenom": 1})
+        return {str(m["_id"]): medecin_display_name(m) for m in medecins}
+
+    # --- Reads ---
+    def get(self, patient_id):
+        """Returns the summary of a patient, building it on first access."""
+        summary = self.collection.find_one({"_id": patient_id})
+        if summary is None:
+            summary = self.refresh(patient_id)
+        return summary
+
+    # --- Incremental maintenance ---
+    def refresh(self, patient_id):
+        """Recomputes the summary of one patient from the consultations and archive collections."""
+        query = {"patient_id": patient_id}
+        consultations = list(
+            self.mongo_db.get_collection("consultations").find(query).sort("date_heure", DESCENDING).limit(self.size)
+        )
+        consultation_count = self.mongo_db.get_collection("consultations").count_documents(query)
+        if self.mongo_db.spans_archive():
+            archive = self.mongo_db.get_collection(ARCHIVE_COLLECTION)
+            if len(consultations) < self.size:
+                consultations += list(archive.find(query).sort("date_heure", DESCENDING).limit(self.size - len(consultations)))
+            consultation_count += archive.count_documents(query)
+        names = self._medecin_names(c.get("medecin_id") for c in consultations)
+        summary = {
+            "_id": patient_id,
+            "consultations": [self._entry(c, names.get(c.get("medecin_id"), "Inconnu")) for c in consultations],
+            "consultation_count": consultation_count,
+            "last_visit": consultations[0].get("date_heure") if consultations else None,
+        }
+        self.collection.replace_one({"_id": patient_id}, summary, upsert=True)
+        return summary
+
+    def record_consultation(self, consultation_id, consultation_data):
+        """Adds a new consultation to its patient's summary."""
+        patient_id = consultation_data.get("patient_id")
+        medecin = None
+        try:
+            medecin = self.mongo_db.get_medecin(consultation_data.get("medecin_id"))
+        except (InvalidId, TypeError):
+            pass
+        entry = self._entry({"_id": consultation_id, **consultation_data}, medecin_display_name(medecin))
+        result = self.collection.update_one(
+            {"_id": patient_id},
+            {
+                "$push": {"consultations": {"$each": [entry], "$sort": {"date_heure": -1}, "$slice": self.size}},
+                "$inc": {"consultation_count": 1},
+                "$max": {"last_visit": consultation_data.get("date_heure")},
+            },
+        )
+        if result.matched_count == 0:
+            # No summary yet: build it from scratch (it includes the new consultation)
+            self.refresh(patient_id)
+
+    def update_consultation(self, old_consultation, new_data):
+        """
+        Reflects a consultation update in the affected summaries: the entry is updated in
+        place (and the window re-sorted when its date changed). The summary is only
+        recomputed when the new date moves the consultation across the edge of the window.
+        """
+        consultation_id = str(old_consultation.get("_id"))
+        patient_id = old_consultation.get("patient_id")
+        changes = {k: v for k, v in new_data.items() if k != "_id"}
+        if changes.get("patient_id", patient_id) != patient_id:
+            self.remove_consultation(old_consultation)
+            self.record_consultation(consultation_id, {k: v for k, v in {**old_consultation, **changes}.items()
+                                                       if k not in ("_id", "medecin_nom")})
+            return
+        if not changes:
+            return
+        summary = self.collection.find_one({"_id": patient_id}, {"consultations": 1, "consultation_count": 1})
+        if summary is None:
+            return  # built on first access
+        entries = summary["consultations"]
+        has_older = summary.get("consultation_count", 0) > len(entries)
+        oldest = entries[-1].get("date_heure") if entries else None
+        new_date = changes.get("date_heure")
+        in_window = any(entry.get("_id") == consultation_id for entry in entries)
+        if not in_window:
+            if new_date is not None and has_older and oldest is not None and new_date > oldest:
+                self.refresh(patient_id)  # an older consultation moves into the window
+            return
+        if new_date is not None and has_older and oldest is not None and new_date < oldest:
+            self.refresh(patient_id)  # the consultation leaves the window: the next one comes in
+            return
+
+        if "medecin_id" in changes:
+            names = self._medecin_names([changes["medecin_id"]])
+            changes["medecin_nom"] = names.get(changes["medecin_id"], "Inconnu")
+        self.collection.update_one(
+            {"_id": patient_id},
+            {"$set": {f"consultations.$[c].{field}": value for field, value in changes.items()}},
+            array_filters=[{"c._id": consultation_id}],
+        )
+        if new_date is not None:
+            dates = [new_date if entry.get("_id") == consultation_id else entry.get("date_heure") for entry in entries]
+            self.collection.update_one(
+                {"_id": patient_id},
+                {"$push": {"consultations": {"$each": [], "$sort": {"date_heure": -1}}},
+                 "$set": {"last_visit": max((d for d in dates if d), default=None)}},
+            )
+
+    def remove_consultation(self, consultation):
+        """
+        Removes a deleted consultation from its patient's summary: only the count changes
+        when it is older than the kept window; otherwise the window is recomputed (the next
+        older consultation comes in).
+        """
+        patient_id = consultation.get("patient_id")
+        result = self.collection.update_one(
+            {"_id": patient_id, "consultations._id": {"$ne": str(consultation.get("_id"))}},
+            {"$inc": {"consultation_count": -1}},
+        )
+        if result.matched_count == 0:
+            self.refresh(patient_id)
+
+    def rename_medecin(self, medecin_id, medecin_nom):
+        """Propagates a doctor's new display name to every summary entry that references it."""
+        self.collection.update_many(
+            {"consultations.medecin_id": medecin_id},
+            {"$set": {"consultations.$[c].medecin_nom": medecin_nom}},
+            array_filters=[{"c.medecin_id": medecin_id}],
+        )
+
+    def delete_patient(self, patient_id):
+        """Deletes the summary of a deleted patient."""
+        self.collection.delete_one({"_id": patient_id})
+
+    def delete_patients(self, patient_ids):
+        """Deletes the summaries of several deleted patients."""
+        if patient_ids:
+            self.collection.delete_many({"_id": {"$in": list(patient_ids)}})
+
+    # --- Rebuild ---
+    def rebuild_all(self):
+        """Rebuilds every summary from the patients and consultations collections."""
+        self.collection.delete_many({})
+        count = 0
+        for patient in self.mongo_db.iter_documents("patients", {}, {"_id": 1}):
+            self.refresh(str(patient["_id"]))
+            count += 1
+            if count % 1000 == 0:
+                print(f"Resumes patients: {count} reconstruits...")
+        print(f"Resumes patients: {count} reconstruits.")
+        return count
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Maintenance du modele de lecture patient_summaries.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    mongo_db, neo4j_db = create_stores()
+    PatientSummaryManager(mongo_db).rebuild_all()
+
+
+if __name__ == "__main__":
+    main()
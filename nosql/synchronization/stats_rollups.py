@@ -0,0 +1,207 @@
+"""
+`stats` rollup collection: pre-aggregated counters answering the management dashboards
+without scanning consultations nor aggregating in Neo4j.
+
+Document shapes:
+    {"_id": "consultations:<granularity>:<medecin_id>:<period>", "kind": "consultations",
+     "granularity": "day" | "month", "period": "YYYY-MM-DD" | "YYYY-MM",
+     "medecin_id": str, "specialite": str, "count": int}
+    {"_id": "panel:<medecin_id>", "kind": "panel", "medecin_id": str, "specialite": str, "count": int}
+
+Consultation counters are maintained with $inc by the consultation write paths; panel
+sizes (patients linked by A_POUR_MEDECIN_TRAITANT) are re-read from the graph for the
+doctors whose assignments changed. Archived consultations keep being counted.
+
+A rebuild writes into a staging collection that replaces `stats` in one rename, so
+readers never see empty or partial counters. Increments made while it reads the
+consultations land in the replaced collection; run it when writes are quiet.
+
+Rebuild (from the nosql/ directory):
+    python -m synchronization.stats_rollups rebuild
+"""
+import argparse
+from collections import Counter
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+
+import config
+from database.mongo_db import ARCHIVE_COLLECTION, InsertOp, UpdateOp
+
+COLLECTION = "stats"
+STAGING_COLLECTION = "stats_rebuild"
+GRANULARITIES = {"day": 10, "month": 7}  # granularity -> length of the date_heure prefix
+
+
+def period_keys(date_heure):
+    """(granularity, period) pairs of a date_heure value ("YYYY-MM-DDTHH:MM"); [] if it is missing."""
+    if not isinstance(date_heure, str) or len(date_heure) < 10:
+        return []
+    return [(granularity, date_heure[:length]) for granularity, length in GRANULARITIES.items()]
+
+
+class StatsRollupManager:
+    def __init__(self, mongo_db, neo4j_db):
+        self.mongo_db = mongo_db
+        self.neo4j_db = neo4j_db
+
+    @property
+    def collection(self):
+        return self.mongo_db.get_collection(COLLECTION)
+
+    def _specialites(self, medecin_ids):
+        """Resolves the specialty of several doctors with a single query."""
+        object_ids = []
+        for medecin_id in set(medecin_ids):
+            try:
+                object_ids.append(ObjectId(medecin_id))
+            except (InvalidId, TypeError):
+                pass
+        medecins = self.mongo_db.find_documents_by_ids("medecins", object_ids, {"specialite": 1})
+        return {str(m["_id"]): m.get("specialite") for m in medecins}
+
+    def _consultation_updates(self, counts, specialites):
+        """Upserts applying {(medecin_id, granularity, period): delta} counts."""
+        return [
+            UpdateOp(
+                {"_id": f"consultations:{granularity}:{medecin_id}:{period}"},
+                {"$inc": {"count": delta},
+                 "$set": {"specialite": specialites.get(medecin_id)},
+                 "$setOnInsert": {"kind": "consultations", "granularity": granularity,
+                                  "period": period, "medecin_id": medecin_id}},
+                upsert=True,
+            )
+            for (medecin_id, granularity, period), delta in counts.items() if delta
+        ]
+
+    # --- Incremental maintenance ---
+    def record_consultations(self, consultations, delta=1, specialite=None):
+        """Adds `delta` to the counters of each consultation (its doctor, day and month)."""
+        counts = Counter()
+        for consultation in consultations:
+            medecin_id = consultation.get("medecin_id")
+            if medecin_id is None:
+                continue
+            for granularity, period in period_keys(consultation.get("date_heure")):
+                counts[(str(medecin_id), granularity, period)] += delta
+        if not counts:
+            return
+        medecin_ids = {medecin_id for medecin_id, _, _ in counts}
+        if specialite is not None and len(medecin_ids) == 1:
+            specialites = {medecin_id: specialite for medecin_id in medecin_ids}
+        else:
+            specialites = self._specialites(medecin_ids)
+        self.mongo_db.bulk_write(COLLECTION, self._consultation_updates(counts, specialites))
+
+    def update_consultation(self, old_consultation, new_data):
+        """Moves a consultation between counters when its date or doctor changed."""
+        if "date_heure" not in new_data and "medecin_id" not in new_data:
+            return
+        new_consultation = {**old_consultation, **new_data}
+        if (old_consultation.get("date_heure"), str(old_consultation.get("medecin_id"))) == \
+                (new_consultation.get("date_heure"), str(new_consultation.get("medecin_id"))):
+            return
+        self.record_consultations([old_consultation], -1)
+        self.record_consultations([new_consultation], 1)
+
+    def refresh_panels(self, medecin_ids, collection_name=COLLECTION):
+        """Re-reads from the graph, in one query, the panel size of each doctor in `medecin_ids`."""
+        medecin_ids = {str(medecin_id) for medecin_id in medecin_ids}
+        if not medecin_ids:
+            return
+        specialites = self._specialites(medecin_ids)
+        counts = self.neo4j_db.count_patients_assigned_to_medecins(
+            [medecin_id for medecin_id in medecin_ids if medecin_id in specialites])
+        operations = [
+            UpdateOp(
+                {"_id": f"panel:{medecin_id}"},
+                {"$set": {"kind": "panel", "medecin_id": medecin_id, "specialite": specialites[medecin_id],
+                          "count": count}},
+                upsert=True,
+            )
+            for medecin_id, count in counts.items()
+        ]
+        self.mongo_db.bulk_write(collection_name, operations)
+
+    def set_specialite(self, medecin_id, specialite):
+        """Moves every counter of a doctor to its new specialty."""
+        self.collection.update_many({"medecin_id": str(medecin_id)}, {"$set": {"specialite": specialite}})
+
+    def delete_medecins(self, medecin_ids):
+        """Removes the panels of deleted doctors (their past consultations stay counted)."""
+        if medecin_ids:
+            self.collection.delete_many({"_id": {"$in": [f"panel:{medecin_id}" for medecin_id in medecin_ids]}})
+
+    # --- Reads ---
+    def consultations(self, granularity="month", start=None, end=None, medecin_id=None):
+        """Consultation counters per doctor and period, in period order (bounds are inclusive periods)."""
+        query = {"kind": "consultations", "granularity": granularity}
+        period = {}
+        if start:
+            period["$gte"] = start
+        if end:
+            period["$lte"] = end
+        if period:
+            query["period"] = period
+        if medecin_id:
+            query["medecin_id"] = medecin_id
+        cursor = self.collection.find(query, {"_id": 0, "kind": 0, "granularity": 0})
+        return [row for row in cursor.sort([("period", ASCENDING), ("medecin_id", ASCENDING)]) if row.get("count")]
+
+    def panels(self):
+        """Panel size of each doctor."""
+        return list(self.collection.find({"kind": "panel"}, {"_id": 0, "kind": 0}).sort("medecin_id", ASCENDING))
+
+    # --- Rebuild ---
+    def rebuild_all(self):
+        """
+        Recomputes every counter from the consultations (hot and archive), doctors and graph
+        into a staging collection, then swaps it in place of `stats`.
+        """
+        counts = Counter()
+        for collection_name in ("consultations", ARCHIVE_COLLECTION):
+            for consultation in self.mongo_db.iter_documents(
+                    collection_name, {}, {"medecin_id": 1, "date_heure": 1}, batch_size=config.EXPORT_BATCH_SIZE):
+                if consultation.get("medecin_id") is None:
+                    continue
+                for granularity, period in period_keys(consultation.get("date_heure")):
+                    counts[(str(consultation["medecin_id"]), granularity, period)] += 1
+        specialites = {str(m["_id"]): m.get("specialite")
+                       for m in self.mongo_db.iter_documents("medecins", {}, {"specialite": 1})}
+
+        self.mongo_db.db.drop_collection(STAGING_COLLECTION)
+        staging = self.mongo_db.get_collection(STAGING_COLLECTION)
+        self.mongo_db.create_stats_indexes(staging)
+        operations = [
+            InsertOp({"_id": f"consultations:{granularity}:{medecin_id}:{period}", "kind": "consultations",
+                       "granularity": granularity, "period": period, "medecin_id": medecin_id,
+                       "specialite": specialites.get(medecin_id), "count": count})
+            for (medecin_id, granularity, period), count in counts.items()
+        ]
+        for start in range(0, len(operations), config.EXPORT_BATCH_SIZE):
+            self.mongo_db.bulk_write(STAGING_COLLECTION, operations[start:start + config.EXPORT_BATCH_SIZE])
+        self.refresh_panels(specialites, STAGING_COLLECTION)
+        # create_stats_indexes created the staging collection even if there is nothing to count
+        staging.rename(COLLECTION, dropTarget=True)
+        print(f"Statistiques reconstruites: {len(operations)} compteurs de consultations, "
+              f"{len(specialites)} patienteles.")
+        return len(operations)
+
+
+def main(argv=None):
+    from database.backends import create_stores
+
+    parser = argparse.ArgumentParser(description="Maintenance des agregats de la collection stats.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    mongo_db, neo4j_db = create_stores()
+    try:
+        mongo_db.ensure_indexes()
+        StatsRollupManager(mongo_db, neo4j_db).rebuild_all()
+    finally:
+        neo4j_db.close()
+
+
+if __name__ == "__main__":
+    main()
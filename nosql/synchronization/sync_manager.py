@@ -1,10 +1,17 @@
-from database.mongo_db import MongoDB
-from database.neo4j_db import Neo4jDB
+from database.backends import create_stores
+from synchronization.patient_summaries import PatientSummaryManager, medecin_display_name
+from synchronization.stats_rollups import StatsRollupManager
 
 class SyncManager:
-    def __init__(self):
-        self.mongo_db = MongoDB()
-        self.neo4j_db = Neo4jDB()
+    def __init__(self, mongo_db=None, neo4j_db=None):
+        if mongo_db is None or neo4j_db is None:
+            default_mongo_db, default_neo4j_db = create_stores()
+            mongo_db = default_mongo_db if mongo_db is None else mongo_db
+            neo4j_db = default_neo4j_db if neo4j_db is None else neo4j_db
+        self.mongo_db = mongo_db
+        self.neo4j_db = neo4j_db
+        self.patient_summaries = PatientSummaryManager(self.mongo_db)
+        self.stats = StatsRollupManager(self.mongo_db, self.neo4j_db)
 
     # --- Patient Synchronization ---
     def sync_patient_creation(self, mongo_patient_id, patient_data):
@@ -32,11 +39,44 @@ class SyncManager:
 
     def sync_patient_deletion(self, mongo_patient_id):
         """Deletes a patient node from Neo4j."""
+        medecin_ids = []
         try:
+            # Read before the node disappears: their panels shrink
+            medecin_ids = self.neo4j_db.get_medecins_traitants_of_patients([mongo_patient_id])
             self.neo4j_db.delete_patient_node(mongo_patient_id)
             print(f"Sync: Patient {mongo_patient_id} supprime de Neo4j.")
         except Exception as e:
             print(f"Erreur de synchronisation patient (delete Neo4j): {e}")
+        self.sync_panel_sizes(medecin_ids)
+        try:
+            self.patient_summaries.delete_patient(mongo_patient_id)
+        except Exception as e:
+            print(f"Erreur de synchronisation patient (resume): {e}")
+
+    def sync_patient_merge(self, keep_patient_id, duplicate_patient_id, filled_data=None):
+        """
+        Merges the Neo4j node of a duplicate patient into the kept one (relationships moved,
+        properties filled from `filled_data`), then refreshes the affected summaries and panels.
+        """
+        medecin_ids = []
+        try:
+            with self.neo4j_db.transaction():
+                medecin_ids = self.neo4j_db.get_medecins_traitants_of_patients(
+                    [keep_patient_id, duplicate_patient_id])
+                self.neo4j_db.merge_nodes("Patient", keep_patient_id, duplicate_patient_id)
+                neo4j_update_data = {k: v for k, v in (filled_data or {}).items()
+                                     if k in ["nom", "prenom", "date_naissance"]}
+                if neo4j_update_data:
+                    self.neo4j_db.update_patient_node(keep_patient_id, neo4j_update_data)
+            print(f"Sync: Patient {duplicate_patient_id} fusionne dans {keep_patient_id} dans Neo4j.")
+        except Exception as e:
+            print(f"Erreur de synchronisation patient (fusion Neo4j): {e}")
+        self.sync_panel_sizes(medecin_ids)
+        try:
+            self.patient_summaries.delete_patient(duplicate_patient_id)
+            self.patient_summaries.refresh(keep_patient_id)
+        except Exception as e:
+            print(f"Erreur de synchronisation patient (resume): {e}")
 
     # --- Doctor Synchronization ---
     def sync_medecin_creation(self, mongo_medecin_id, medecin_data):
@@ -61,6 +101,27 @@ class SyncManager:
                 print(f"Sync: Medecin {mongo_medecin_id} mis a jour dans Neo4j.")
         except Exception as e:
             print(f"Erreur de synchronisation medecin (update Neo4j): {e}")
+        if "nom" in new_data or "prenom" in new_data:
+            self.sync_medecin_name_in_summaries(mongo_medecin_id)
+        if "specialite" in new_data:
+            self.sync_medecin_specialite_in_stats(mongo_medecin_id, new_data["specialite"])
+
+    def sync_medecin_specialite_in_stats(self, mongo_medecin_id, specialite):
+        """Moves a doctor's statistics to its new specialty."""
+        try:
+            self.stats.set_specialite(mongo_medecin_id, specialite)
+        except Exception as e:
+            print(f"Erreur de synchronisation medecin (statistiques): {e}")
+
+    def sync_medecin_name_in_summaries(self, mongo_medecin_id):
+        """Propagates a doctor's current name to the patient summaries."""
+        try:
+            medecin = self.mongo_db.get_medecin(mongo_medecin_id)
+            if medecin:
+                self.patient_summaries.rename_medecin(mongo_medecin_id, medecin_display_name(medecin))
+                print(f"Sync: Nom du medecin {mongo_medecin_id} propage aux resumes patients.")
+        except Exception as e:
+            print(f"Erreur de synchronisation medecin (resumes patients): {e}")
 
     def sync_medecin_deletion(self, mongo_medecin_id):
         """Deletes a doctor node from Neo4j."""
@@ -69,28 +130,107 @@ class SyncManager:
             print(f"Sync: Medecin {mongo_medecin_id} supprime de Neo4j.")
         except Exception as e:
             print(f"Erreur de synchronisation medecin (delete Neo4j): {e}")
+        try:
+            self.stats.delete_medecins([mongo_medecin_id])
+        except Exception as e:
+            print(f"Erreur de synchronisation medecin (statistiques): {e}")
 
     # --- Consultation Synchronization ---
     def sync_consultation_creation(self, mongo_consultation_id, consultation_data):
-        """Creates a consultation node and links it to patient and doctor in Neo4j."""
+        """Creates a consultation node and links it to patient and doctor in Neo4j, in one transaction."""
         try:
-            self.neo4j_db.create_consultation_node(
-                mongo_consultation_id,
-                consultation_data.get("date_heure"),
-                consultation_data.get("motif")
-            )
-            self.neo4j_db.link_patient_consultation(
-                consultation_data.get("patient_id"),
-                mongo_consultation_id
-            )
-            self.neo4j_db.link_consultation_medecin(
-                mongo_consultation_id,
-                consultation_data.get("medecin_id")
-            )
+            with self.neo4j_db.transaction():
+                self.neo4j_db.create_consultation_node(
+                    mongo_consultation_id,
+                    consultation_data.get("date_heure"),
+                    consultation_data.get("motif")
+                )
+                self.neo4j_db.link_patient_consultation(
+                    consultation_data.get("patient_id"),
+                    mongo_consultation_id
+                )
+                self.neo4j_db.link_consultation_medecin(
+                    mongo_consultation_id,
+                    consultation_data.get("medecin_id")
+                )
             print(f"Sync: Consultation {mongo_consultation_id} creee et liee dans Neo4j.")
         except Exception as e:
             print(f"Erreur de synchronisation consultation (Neo4j): {e}")
 
+    def sync_consultation_update(self, mongo_consultation_id, old_consultation, new_data):
+        """
+        Applies a consultation update to Neo4j: only the changed node properties are set, and
+        the CONSULTE / EST_ASSIGNEE_A relationships are re-pointed only if patient_id / medecin_id changed.
+        """
+        try:
+            changed = {k: v for k, v in new_data.items()
+                       if k in ["date_heure", "motif"] and v != old_consultation.get(k)}
+            old_patient_id = str(old_consultation.get("patient_id"))
+            new_patient_id = str(new_data.get("patient_id", old_patient_id))
+            old_medecin_id = str(old_consultation.get("medecin_id"))
+            new_medecin_id = str(new_data.get("medecin_id", old_medecin_id))
+            with self.neo4j_db.transaction():
+                if changed:
+                    self.neo4j_db.update_consultation_node(mongo_consultation_id, changed)
+                if new_patient_id != old_patient_id:
+                    self.neo4j_db.remove_patient_consultation_link(old_patient_id, mongo_consultation_id)
+                    self.neo4j_db.link_patient_consultation(new_patient_id, mongo_consultation_id)
+                if new_medecin_id != old_medecin_id:
+                    self.neo4j_db.remove_consultation_medecin_link(mongo_consultation_id, old_medecin_id)
+                    self.neo4j_db.link_consultation_medecin(mongo_consultation_id, new_medecin_id)
+            print(f"Sync: Consultation {mongo_consultation_id} mise a jour dans Neo4j.")
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (update Neo4j): {e}")
+
+    def sync_consultation_summary_creation(self, mongo_consultation_id, consultation_data):
+        """Adds a new consultation to the patient summary read model."""
+        try:
+            self.patient_summaries.record_consultation(mongo_consultation_id, consultation_data)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (resume patient): {e}")
+
+    def sync_consultation_summary_update(self, old_consultation, new_data):
+        """Reflects a consultation update in the patient summary read model."""
+        try:
+            self.patient_summaries.update_consultation(old_consultation, new_data)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (update resume patient): {e}")
+
+    def sync_consultation_summary_deletion(self, consultation):
+        """Removes a deleted consultation from the patient summary read model."""
+        try:
+            self.patient_summaries.remove_consultation(consultation)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (delete resume patient): {e}")
+
+    def sync_consultation_stats_creation(self, consultation_data, specialite=None):
+        """Counts a new consultation in the statistics rollups."""
+        try:
+            self.stats.record_consultations([consultation_data], 1, specialite)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (statistiques): {e}")
+
+    def sync_consultation_stats_update(self, old_consultation, new_data):
+        """Moves an updated consultation between statistics rollups when its date or doctor changed."""
+        try:
+            self.stats.update_consultation(old_consultation, new_data)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (update statistiques): {e}")
+
+    def sync_consultation_stats_deletion(self, consultation):
+        """Uncounts a deleted consultation from the statistics rollups."""
+        try:
+            self.stats.record_consultations([consultation], -1)
+        except Exception as e:
+            print(f"Erreur de synchronisation consultation (delete statistiques): {e}")
+
+    def sync_panel_sizes(self, medecin_ids):
+        """Refreshes the panel size rollups of doctors whose treating-physician links changed."""
+        try:
+            self.stats.refresh_panels(medecin_ids)
+        except Exception as e:
+            print(f"Erreur de synchronisation des patienteles (statistiques): {e}")
+
     def sync_consultation_deletion(self, mongo_consultation_id):
         """Deletes a consultation node from Neo4j."""
         try:
@@ -101,16 +241,17 @@ class SyncManager:
 
     # --- User Synchronization ---
     def sync_user_creation(self, mongo_user_id, user_data):
-        """Creates a user node and links it to an entity (patient/doctor) in Neo4j."""
+        """Creates a user node and links it to an entity (patient/doctor) in Neo4j, in one transaction."""
         try:
-            self.neo4j_db.create_user_node(
-                mongo_user_id,
-                user_data.get("username"),
-                user_data.get("role")
-            )
-            if user_data.get("entite_id") and user_data.get("role") in ["patient", "medecin"]:
-                entity_type = "Patient" if user_data.get("role") == "patient" else "Medecin"
-                self.neo4j_db.link_user_to_entity(mongo_user_id, entity_type, user_data.get("entite_id"))
+            with self.neo4j_db.transaction():
+                self.neo4j_db.create_user_node(
+                    mongo_user_id,
+                    user_data.get("username"),
+                    user_data.get("role")
+                )
+                if user_data.get("entite_id") and user_data.get("role") in ["patient", "medecin"]:
+                    entity_type = "Patient" if user_data.get("role") == "patient" else "Medecin"
+                    self.neo4j_db.link_user_to_entity(mongo_user_id, entity_type, user_data.get("entite_id"))
             print(f"Sync: Utilisateur {mongo_user_id} cree dans Neo4j.")
         except Exception as e:
             print(f"Erreur de synchronisation utilisateur (Neo4j): {e}")
@@ -121,4 +262,69 @@ class SyncManager:
             self.neo4j_db.delete_node("Utilisateur", "id", mongo_user_id)
             print(f"Sync: Utilisateur {mongo_user_id} supprime de Neo4j.")
         except Exception as e:
-            print(f"Erreur de synchronisation utilisateur (delete Neo4j): {e}")
\ No newline at end of file
+            print(f"Erreur de synchronisation utilisateur (delete Neo4j): {e}")
+
+    # --- Batch Synchronization ---
+    def sync_entity_batch(self, label, allowed_fields, created, updated, deleted):
+        """
+        Synchronizes a batch of writes on one entity type with one UNWIND query per operation.
+        `created` and `updated` are lists of (mongo_id, data), `deleted` a list of mongo_ids.
+        Returns True if Neo4j was updated, False otherwise.
+        """
+        try:
+            self.neo4j_db.create_nodes(label, [
+                {"id": entity_id, **{k: v for k, v in data.items() if k in allowed_fields and v is not None}}
+                for entity_id, data in created
+            ])
+            self.neo4j_db.update_nodes(label, [
+                {"id": entity_id, "props": {k: v for k, v in data.items() if k in allowed_fields}}
+                for entity_id, data in updated
+                if any(k in allowed_fields for k in data)
+            ])
+            self.neo4j_db.delete_nodes(label, deleted)
+            print(f"Sync: Lot {label} synchronise dans Neo4j "
+                  f"({len(created)} creations, {len(updated)} mises a jour, {len(deleted)} suppressions).")
+            return True
+        except Exception as e:
+            print(f"Erreur de synchronisation du lot {label} (Neo4j): {e}")
+            return False
+
+    def sync_patient_batch(self, created, updated, deleted):
+        """Synchronizes a batch of patient writes in Neo4j and the patient summaries."""
+        medecin_ids = []
+        try:
+            medecin_ids = self.neo4j_db.get_medecins_traitants_of_patients(deleted)
+        except Exception as e:
+            print(f"Erreur de synchronisation du lot Patient (medecins traitants): {e}")
+        synced = self.sync_entity_batch("Patient", ["nom", "prenom", "date_naissance"], created, updated, deleted)
+        try:
+            self.patient_summaries.delete_patients(deleted)
+        except Exception as e:
+            print(f"Erreur de synchronisation du lot Patient (resumes): {e}")
+        self.sync_panel_sizes(medecin_ids)
+        return synced
+
+    def sync_medecin_batch(self, created, updated, deleted):
+        """Synchronizes a batch of doctor writes in Neo4j, the patient summaries and the statistics."""
+        synced = self.sync_entity_batch("Medecin", ["nom", "prenom", "specialite"], created, updated, deleted)
+        for medecin_id, data in updated:
+            if "nom" in data or "prenom" in data:
+                self.sync_medecin_name_in_summaries(medecin_id)
+            if "specialite" in data:
+                self.sync_medecin_specialite_in_stats(medecin_id, data["specialite"])
+        try:
+            self.stats.delete_medecins(deleted)
+        except Exception as e:
+            print(f"Erreur de synchronisation du lot Medecin (statistiques): {e}")
+        return synced
+
+    def sync_medecin_traitant_assignments(self, pairs):
+        """Links a batch of (patient_id, medecin_id) pairs in Neo4j."""
+        try:
+            self.neo4j_db.link_patients_to_medecins_traitants(pairs)
+            print(f"Sync: {len(pairs)} medecins traitants assignes dans Neo4j.")
+        except Exception as e:
+            print(f"Erreur de synchronisation des medecins traitants (Neo4j): {e}")
+            return False
+        self.sync_panel_sizes({medecin_id for _, medecin_id in pairs})
+        return True
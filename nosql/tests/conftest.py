@@ -0,0 +1,79 @@
+"""
+Tests run against the in-memory backend (run from the nosql/ directory: python -m pytest).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.memory_graph import MemoryGraphDB  # noqa: E402
+from database.memory_store import MemoryClient  # noqa: E402
+from database.mongo_db import MongoDB  # noqa: E402
+
+
+@pytest.fixture
+def mongo_db():
+    db = MongoDB(client=MemoryClient())
+    db.ensure_indexes()
+    return db
+
+
+@pytest.fixture
+def graph_db():
+    return MemoryGraphDB()
+
+
+class ApiClient:
+    """Flask test client sending the bearer token of one identity."""
+    def __init__(self, app, client, identity):
+        from flask_jwt_extended import create_access_token
+        self.client = client
+        with app.app_context():
+            self.headers = {"Authorization": f"Bearer {create_access_token(identity=identity)}"}
+
+    def open(self, method, path, **kwargs):
+        return self.client.open(path, method=method, headers=self.headers, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.open("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.open("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.open("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.open("DELETE", path, **kwargs)
+
+
+@pytest.fixture
+def api(mongo_db, graph_db, monkeypatch):
+    """The app module, serving fresh in-memory stores."""
+    import config
+    # Must happen before the app is imported (the stores are created at import time)
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "memory")
+    import app as api
+    from database.patient_matching import PatientDuplicateDetector
+    from synchronization.sync_manager import SyncManager
+
+    monkeypatch.setattr(config, "COALESCING_ENABLED", False)
+    monkeypatch.setattr(api, "mongo_db", mongo_db)
+    monkeypatch.setattr(api, "neo4j_db", graph_db)
+    monkeypatch.setattr(api, "sync_manager", SyncManager(mongo_db, graph_db))
+    monkeypatch.setattr(api, "duplicate_detector", PatientDuplicateDetector(mongo_db))
+    return api
+
+
+@pytest.fixture
+def client_for(api):
+    """Returns an ApiClient for an entity id."""
+    client = api.app.test_client()
+    return lambda identity: ApiClient(api.app, client, str(identity))
+
+
+@pytest.fixture
+def admin(mongo_db, client_for):
+    return client_for(mongo_db.add_user({"username": "admin", "password": "password123", "role": "admin"}))
@@ -0,0 +1,145 @@
+"""
+Admin routes through the Flask test client: patient creation (duplicates, usernames),
+patient search, batch operations and the statistics rollups.
+"""
+import pytest
+from bson.objectid import ObjectId
+
+DUPONT = {"nom": "Dupont", "prenom": "Jean", "date_naissance": "1980-01-02"}
+
+
+@pytest.fixture
+def medecin_id(admin):
+    response = admin.post("/admin/medecins", json={"nom": "House", "prenom": "Greg", "specialite": "Cardiologie"})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def create_patient(admin, data, force=False):
+    return admin.post("/admin/patients" + ("?force=true" if force else ""), json=dict(data))
+
+
+# --- Patient creation ---
+def test_duplicate_patient_is_reported_unless_forced(admin, mongo_db):
+    assert create_patient(admin, {"nom": "Dupont"}).status_code == 400
+    first_id = create_patient(admin, DUPONT).get_json()["id"]
+
+    response = create_patient(admin, {**DUPONT, "nom": "Dupond"})
+    assert response.status_code == 409
+    assert [d["id"] for d in response.get_json()["doublons"]] == [first_id]
+
+    response = create_patient(admin, DUPONT, force=True)
+    assert response.status_code == 201
+    assert mongo_db.get_patient(response.get_json()["id"])["username"] == "dupont_jean_2_patient"
+    assert create_patient(admin, DUPONT, force=True).status_code == 201
+    assert sorted(p["username"] for p in mongo_db.get_all_patients()) == [
+        "dupont_jean_2_patient", "dupont_jean_3_patient", "dupont_jean_patient"]
+
+
+def test_namesakes_born_on_other_dates_get_suffixed_usernames(admin, mongo_db):
+    create_patient(admin, DUPONT)
+    response = create_patient(admin, {**DUPONT, "date_naissance": "2001-07-08"})
+    assert response.status_code == 201
+    assert mongo_db.get_patient(response.get_json()["id"])["username"] == "dupont_jean_2_patient"
+
+
+# --- Patient search ---
+def test_patient_search_is_accent_folded_prefix_search(admin):
+    for nom, prenom in [("Lefèvre", "Anne"), ("Lefebvre", "Élodie"), ("Martin", "Luc")]:
+        create_patient(admin, {"nom": nom, "prenom": prenom})
+    assert admin.get("/admin/patients/search?q=").status_code == 400
+    assert admin.get("/admin/patients/search?q=lef&limit=0").status_code == 400
+    assert sorted(p["nom"] for p in admin.get("/admin/patients/search?q=LEF").get_json()) == ["Lefebvre", "Lefèvre"]
+    assert [p["prenom"] for p in admin.get("/admin/patients/search?q=elo").get_json()] == ["Élodie"]
+    assert [p["nom"] for p in admin.get("/admin/patients/search?q=lefe anne").get_json()] == ["Lefèvre"]
+    assert len(admin.get("/admin/patients/search?q=lef&limit=1").get_json()) == 1
+    assert "password" not in admin.get("/admin/patients/search?q=martin").get_json()[0]
+
+
+# --- Batch ---
+def batch(admin, *operations):
+    response = admin.post("/admin/batch", json={"operations": list(operations)})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["index"] for r in results] == list(range(len(operations)))
+    return [r["status"] for r in results], results
+
+
+def test_batch_rejects_invalid_requests(admin):
+    assert admin.post("/admin/batch", json={}).status_code == 400
+    assert admin.post("/admin/batch", json={"operations": []}).status_code == 400
+    statuses, _ = batch(admin,
+                        "create",
+                        {"action": "create", "entity": "patient", "data": {"nom": "Seul"}},
+                        {"action": "drop", "entity": "patient"},
+                        {"action": "update", "entity": "patient", "id": "not-an-id", "data": {"nom": "X"}},
+                        {"action": "update", "entity": "patient", "id": str(ObjectId()), "data": {}},
+                        {"action": "assign", "patient_id": str(ObjectId())},
+                        {"action": "delete", "entity": "medecin", "id": str(ObjectId())})
+    assert statuses == [400, 400, 400, 400, 400, 400, 404]
+
+
+def test_batch_results_follow_request_order(admin, mongo_db, medecin_id):
+    patient_id = create_patient(admin, DUPONT).get_json()["id"]
+    statuses, results = batch(admin,
+                              {"action": "update", "entity": "patient", "id": patient_id, "data": {"telephone": "06"}},
+                              {"action": "create", "entity": "patient", "data": {"nom": "Martin", "prenom": "Luc"}},
+                              {"action": "assign", "patient_id": patient_id, "medecin_id": medecin_id},
+                              {"action": "create", "entity": "patient", "data": dict(DUPONT)},
+                              {"action": "create", "entity": "patient", "data": dict(DUPONT), "force": True})
+    assert statuses == [200, 201, 200, 409, 201]
+    assert results[3]["doublons"][0]["id"] == patient_id
+    assert mongo_db.get_patient(results[1]["id"])["username"] == "martin_luc_patient"
+    assert mongo_db.get_patient(results[4]["id"])["username"] == "dupont_jean_2_patient"
+    assert mongo_db.get_patient(patient_id)["telephone"] == "06"
+
+
+def test_batch_unchanged_update_is_not_found(admin, mongo_db):
+    patient_id = create_patient(admin, DUPONT).get_json()["id"]
+    statuses, results = batch(admin, {"action": "update", "entity": "patient", "id": patient_id,
+                                      "data": {"nom": "Dupont", "prenom": "Jean"}})
+    assert statuses == [404]
+    assert results[0]["msg"] == "Patient non trouve ou aucune modification"
+    # Same outcome as the single-item route
+    assert admin.put(f"/admin/patients/{patient_id}", json={"nom": "Dupont"}).status_code == 404
+
+
+def test_batch_conflicts_on_the_same_id(admin, mongo_db, medecin_id):
+    patient_id = create_patient(admin, DUPONT).get_json()["id"]
+    statuses, _ = batch(admin,
+                        {"action": "update", "entity": "patient", "id": patient_id, "data": {"telephone": "06"}},
+                        {"action": "delete", "entity": "patient", "id": patient_id})
+    assert statuses == [200, 409]
+    assert mongo_db.get_patient(patient_id)["telephone"] == "06"
+
+    statuses, _ = batch(admin,
+                        {"action": "assign", "patient_id": patient_id, "medecin_id": medecin_id},
+                        {"action": "delete", "entity": "patient", "id": patient_id})
+    assert statuses == [200, 409]
+    assert mongo_db.get_patient(patient_id) is not None
+
+    statuses, _ = batch(admin,
+                        {"action": "delete", "entity": "patient", "id": patient_id},
+                        {"action": "assign", "patient_id": patient_id, "medecin_id": medecin_id})
+    assert statuses == [200, 404]
+    assert mongo_db.get_patient(patient_id) is None
+
+
+# --- Statistics ---
+def panel_counts(admin):
+    return {row["medecin_id"]: row["count"] for row in admin.get("/admin/stats").get_json()["patienteles"]}
+
+
+def test_stats_follow_assignments(admin, graph_db, medecin_id):
+    patient_ids = [create_patient(admin, {"nom": nom, "prenom": "Jean"}).get_json()["id"] for nom in ("A", "B")]
+    for patient_id in patient_ids:
+        assert admin.post(f"/admin/patients/{patient_id}/assign_medecin/{medecin_id}").status_code == 200
+    assert panel_counts(admin) == {medecin_id: 2}
+    assert admin.get("/admin/stats").get_json()["patients_par_specialite"] == [
+        {"specialite": "Cardiologie", "patients": 2, "medecins": 1}]
+
+    statuses, _ = batch(admin, {"action": "assign", "patient_id": patient_ids[0], "medecin_id": medecin_id},
+                        {"action": "create", "entity": "patient", "data": {"nom": "C", "prenom": "Jean"}})
+    assert statuses == [200, 201]
+    assert panel_counts(admin) == {medecin_id: 2}
+    assert admin.get("/admin/stats?granularity=week").status_code == 400
@@ -0,0 +1,111 @@
+"""
+Consultation routes through the Flask test client: full-text search, and the patient
+summaries and statistics rollups kept in step with creations, updates and deletions.
+"""
+import pytest
+
+
+@pytest.fixture
+def clinic(admin, client_for):
+    """A doctor and two patients, with a client for each."""
+    medecin_id = admin.post("/admin/medecins", json={"nom": "House", "prenom": "Greg",
+                                                     "specialite": "Cardiologie"}).get_json()["id"]
+    patient_ids = [admin.post("/admin/patients", json={"nom": nom, "prenom": "Jean"}).get_json()["id"]
+                   for nom in ("Dupont", "Martin")]
+    return {"medecin_id": medecin_id, "patient_ids": patient_ids, "medecin": client_for(medecin_id),
+            "patients": [client_for(patient_id) for patient_id in patient_ids]}
+
+
+def consult(clinic, patient, date_heure, motif, **extra):
+    response = clinic["medecin"].post("/medecin/consultations", json={
+        "patient_id": clinic["patient_ids"][patient], "date_heure": date_heure, "motif": motif, **extra})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def history(client):
+    response = client.get("/patient/historique_consultations")
+    assert response.status_code == 200
+    return response.get_json(), int(response.headers["X-Total-Count"])
+
+
+def counts(admin, granularity="month"):
+    stats = admin.get(f"/admin/stats?granularity={granularity}").get_json()
+    return ({row["period"]: row["count"] for row in stats["consultations_par_medecin"]},
+            {(row["specialite"], row["period"]): row["count"] for row in stats["consultations_par_specialite"]})
+
+
+# --- Full-text search ---
+def test_medecin_search_ranks_and_pages(clinic):
+    consult(clinic, 0, "2024-01-01T10:00", "Douleur thoracique")
+    consult(clinic, 1, "2024-02-01T10:00", "Controle", diagnostic="douleur abdominale, douleur lombaire")
+    consult(clinic, 0, "2024-03-01T10:00", "Fievre")
+    medecin = clinic["medecin"]
+
+    assert medecin.get("/medecin/consultations/search?q=").status_code == 400
+    assert medecin.get("/medecin/consultations/search?q=douleur&page=0").status_code == 400
+    response = medecin.get("/medecin/consultations/search?q=Douleur")
+    assert [c["motif"] for c in response.get_json()] == ["Controle", "Douleur thoracique"]
+    assert response.headers["X-Has-More"] == "false"
+    assert [c["motif"] for c in medecin.get("/medecin/consultations/search?q=douleur -lombaire").get_json()] == [
+        "Douleur thoracique"]
+
+    response = medecin.get("/medecin/consultations/search?q=douleur&page=2&per_page=1")
+    assert [c["motif"] for c in response.get_json()] == ["Douleur thoracique"]
+    assert (response.headers["X-Page"], response.headers["X-Has-More"]) == ("2", "false")
+    assert medecin.get("/medecin/consultations/search?q=douleur&per_page=1").headers["X-Has-More"] == "true"
+
+
+def test_patient_search_is_scoped_to_the_patient(clinic):
+    consult(clinic, 0, "2024-01-01T10:00", "Douleur thoracique")
+    consult(clinic, 1, "2024-02-01T10:00", "Douleur lombaire")
+    dupont, martin = clinic["patients"]
+    assert [c["motif"] for c in dupont.get("/patient/consultations/search?q=douleur").get_json()] == [
+        "Douleur thoracique"]
+    assert [c["motif"] for c in martin.get("/patient/consultations/search?q=thoracique").get_json()] == []
+    assert clinic["medecin"].get("/patient/consultations/search?q=douleur").status_code == 403
+
+
+# --- Patient summaries ---
+def test_history_follows_updates_and_deletions(clinic):
+    first = consult(clinic, 0, "2024-01-01T10:00", "Controle")
+    second = consult(clinic, 0, "2024-03-01T10:00", "Fievre")
+    consult(clinic, 1, "2024-02-01T10:00", "Migraine")
+    dupont = clinic["patients"][0]
+    consultations, total = history(dupont)
+    assert [c["motif"] for c in consultations] == ["Fievre", "Controle"] and total == 2
+    assert {c["medecin_nom"] for c in consultations} == {"Greg House"}
+
+    medecin = clinic["medecin"]
+    assert medecin.put(f"/medecin/consultations/{first}",
+                       json={"date_heure": "2024-04-01T10:00", "motif": "Controle annuel"}).status_code == 200
+    consultations, total = history(dupont)
+    assert [(c["date_heure"], c["motif"]) for c in consultations] == [
+        ("2024-04-01T10:00", "Controle annuel"), ("2024-03-01T10:00", "Fievre")] and total == 2
+
+    assert medecin.delete(f"/medecin/consultations/{second}").status_code == 200
+    consultations, total = history(dupont)
+    assert [c["_id"] for c in consultations] == [first] and total == 1
+    assert history(clinic["patients"][1])[1] == 1
+
+
+# --- Statistics ---
+def test_stats_follow_consultation_writes(admin, clinic):
+    first = consult(clinic, 0, "2024-01-05T10:00", "Controle")
+    consult(clinic, 1, "2024-01-20T10:00", "Fievre")
+    by_medecin, by_specialite = counts(admin)
+    assert by_medecin == {"2024-01": 2} and by_specialite == {("Cardiologie", "2024-01"): 2}
+    assert counts(admin, "day")[0] == {"2024-01-05": 1, "2024-01-20": 1}
+
+    medecin = clinic["medecin"]
+    medecin.put(f"/medecin/consultations/{first}", json={"date_heure": "2024-02-05T10:00"})
+    assert counts(admin) == ({"2024-01": 1, "2024-02": 1},
+                             {("Cardiologie", "2024-01"): 1, ("Cardiologie", "2024-02"): 1})
+    # A change that does not move the consultation leaves the counters alone
+    medecin.put(f"/medecin/consultations/{first}", json={"motif": "Controle annuel"})
+    assert counts(admin)[0] == {"2024-01": 1, "2024-02": 1}
+
+    medecin.delete(f"/medecin/consultations/{first}")
+    assert counts(admin)[0] == {"2024-01": 1}
+    stats = admin.get(f"/admin/stats?from=2024-02&medecin_id={clinic['medecin_id']}").get_json()
+    assert stats["consultations_par_medecin"] == []
@@ -0,0 +1,83 @@
+"""
+Archive job: batches move to the archive without losing API writes made meanwhile.
+"""
+import pytest
+
+import config
+from database.mongo_db import ARCHIVE_BATCH_FIELD, ARCHIVE_COLLECTION
+from maintenance.archive_consultations import ConsultationArchiver
+
+HORIZON = "2020-01-01T00:00"
+
+
+class InterleavedArchiver(ConsultationArchiver):
+    """Runs `during_copy` right after the batch is copied to the archive."""
+    def __init__(self, mongo_db, graph_db, during_copy=None, fail_after_copy=False):
+        super().__init__(mongo_db, graph_db)
+        self.during_copy = during_copy
+        self.fail_after_copy = fail_after_copy
+
+    def _copy_to_archive(self, consultations):
+        super()._copy_to_archive(consultations)
+        if self.during_copy:
+            self.during_copy()
+        if self.fail_after_copy:
+            raise RuntimeError("interrupted")
+
+
+@pytest.fixture
+def consultations(mongo_db, graph_db, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_HORIZON_CACHE_SECONDS", 0)
+    mongo_db.ensure_archive_collection()
+    mongo_db.set_archive_horizon(HORIZON)
+    ids = [mongo_db.add_consultation({"motif": f"visite {i}", "date_heure": f"2019-0{i + 1}-01T10:00",
+                                      "patient_id": "p", "medecin_id": "m"}) for i in range(3)]
+    graph_db.create_nodes("Consultation", [{"id": i} for i in ids])
+    return ids
+
+
+def archived_ids(mongo_db):
+    return {str(c["_id"]) for c in mongo_db.get_collection(ARCHIVE_COLLECTION).find()}
+
+
+def test_batch_is_moved(mongo_db, graph_db, consultations):
+    assert ConsultationArchiver(mongo_db, graph_db).run(horizon_days=0) == 3
+    assert archived_ids(mongo_db) == set(consultations)
+    assert mongo_db.get_collection("consultations").count_documents({}) == 0
+    assert all(ARCHIVE_BATCH_FIELD not in c for c in mongo_db.get_collection(ARCHIVE_COLLECTION).find())
+    assert graph_db.find_node("Consultation", "id", consultations[0]) is None
+
+
+def test_update_during_move_is_kept(mongo_db, graph_db, consultations):
+    updated = consultations[1]
+    archiver = InterleavedArchiver(
+        mongo_db, graph_db, during_copy=lambda: mongo_db.update_consultation(updated, {"motif": "corrige"}))
+    assert archiver.archive_batch(HORIZON) == 2
+    assert mongo_db.get_consultation(updated)["motif"] == "corrige"
+    assert archived_ids(mongo_db) == {consultations[0], consultations[2]}
+    assert graph_db.find_node("Consultation", "id", updated) is not None
+    # The next batch moves it with its update
+    assert ConsultationArchiver(mongo_db, graph_db).archive_batch(HORIZON) == 1
+    assert mongo_db.find_document(ARCHIVE_COLLECTION, {})["motif"] == "visite 0"
+    assert mongo_db.get_consultation(updated)["motif"] == "corrige"
+
+
+def test_delete_during_move_is_not_archived(mongo_db, graph_db, consultations):
+    deleted = consultations[0]
+    archiver = InterleavedArchiver(mongo_db, graph_db, during_copy=lambda: mongo_db.delete_consultation(deleted))
+    assert archiver.archive_batch(HORIZON) == 2
+    assert mongo_db.get_consultation(deleted) is None
+    assert archived_ids(mongo_db) == {consultations[1], consultations[2]}
+
+
+def test_interrupted_batch_is_settled_on_resume(mongo_db, graph_db, consultations):
+    def update_and_delete():
+        mongo_db.update_consultation(consultations[0], {"date_heure": "2030-01-01T10:00"})
+        mongo_db.get_collection("consultations").delete_one({"_id": mongo_db.get_consultation(consultations[1])["_id"]})
+    with pytest.raises(RuntimeError):
+        InterleavedArchiver(mongo_db, graph_db, during_copy=update_and_delete, fail_after_copy=True).archive_batch(HORIZON)
+
+    assert ConsultationArchiver(mongo_db, graph_db).run(horizon_days=0) == 1
+    assert archived_ids(mongo_db) == {consultations[2]}
+    assert mongo_db.get_consultation(consultations[0])["date_heure"] == "2030-01-01T10:00"
+    assert mongo_db.get_consultation(consultations[1]) is None
@@ -0,0 +1,19 @@
+"""
+Streaming exports: CSV and NDJSON carry the same consultation fields.
+"""
+import csv
+import io
+import json
+
+from reporting.export import export_consultations
+
+
+def test_csv_and_ndjson_consultation_exports_match(mongo_db):
+    patient_id = mongo_db.add_patient({"nom": "Dupont", "prenom": "Jean"})
+    mongo_db.add_consultation({"date_heure": "2024-01-01T10:00", "patient_id": patient_id, "medecin_id": "m",
+                               "motif": "toux", "diagnostic": "bronchite"})
+    csv_rows = list(csv.DictReader(io.StringIO("".join(export_consultations(mongo_db, "csv")))))
+    ndjson_rows = [json.loads(line) for line in "".join(export_consultations(mongo_db, "ndjson")).splitlines()]
+    assert csv_rows[0]["diagnostic"] == ndjson_rows[0]["diagnostic"] == "bronchite"
+    assert csv_rows[0]["patient_nom"] == ndjson_rows[0]["patient_nom"] == "Jean Dupont"
+    assert set(csv_rows[0]) == set(ndjson_rows[0])
@@ -0,0 +1,82 @@
+"""
+The in-memory graph backend against the GraphStore calls issued by the synchronization
+layer and the maintenance jobs (MERGE on id, batch UNWIND writes, dedup and collapse).
+"""
+import pytest
+
+
+@pytest.fixture
+def assignments(graph_db):
+    graph_db.create_nodes("Medecin", [{"id": "m1", "nom": "A"}, {"id": "m2", "nom": "B"}])
+    graph_db.create_nodes("Patient", [{"id": f"p{i}"} for i in range(4)])
+    graph_db.create_relationships("Patient", "Medecin", "A_POUR_MEDECIN_TRAITANT", [
+        {"from_id": "p0", "to_id": "m1"}, {"from_id": "p1", "to_id": "m1"}, {"from_id": "p2", "to_id": "m2"},
+    ])
+    return graph_db
+
+
+def test_create_node_merges_on_id(graph_db):
+    graph_db.create_node("Patient", {"id": "p", "nom": "Dupont"})
+    graph_db.create_node("Patient", {"id": "p", "prenom": "Jean"})
+    assert graph_db.create_nodes("Patient", [{"id": "p"}, {"id": "q"}]) == 1
+    assert graph_db.find_node("Patient", "id", "p") == {"id": "p", "nom": "Dupont", "prenom": "Jean"}
+
+
+def test_update_nodes_removes_null_properties(graph_db):
+    graph_db.create_node("Patient", {"id": "p", "nom": "Dupont", "telephone": "06"})
+    assert graph_db.update_nodes("Patient", [{"id": "p", "props": {"telephone": None}}, {"id": "x", "props": {}}]) == 1
+    assert graph_db.find_node("Patient", "nom", "Dupont") == {"id": "p", "nom": "Dupont"}
+
+
+def test_relationships_are_merged(assignments):
+    assert assignments.create_relationships("Patient", "Medecin", "A_POUR_MEDECIN_TRAITANT",
+                                            [{"from_id": "p0", "to_id": "m1"}, {"from_id": "p3", "to_id": "m9"}]) == 0
+    assert assignments.get_patients_assigned_to_medecin("m1") == ["p0", "p1"]
+
+
+def test_assignment_queries(assignments):
+    assert assignments.count_patients_assigned_to_medecins(["m1", "m2", "m9"]) == {"m1": 2, "m2": 1, "m9": 0}
+    assert sorted(assignments.get_medecins_traitants_of_patients(["p0", "p2", "p3"])) == ["m1", "m2"]
+    assignments.delete_relationship("Patient", "id", "p0", "Medecin", "id", "m1", "A_POUR_MEDECIN_TRAITANT")
+    assert assignments.get_patients_assigned_to_medecin("m1") == ["p1"]
+
+
+def test_delete_nodes_detaches_relationships(assignments):
+    assert assignments.delete_nodes("Patient", ["p1", "p9"]) == 1
+    assert assignments.count_patients_assigned_to_medecins(["m1"]) == {"m1": 1}
+    assert assignments.delete_node("Medecin", "id", "m2")
+    assert assignments.get_medecins_traitants_of_patients(["p2"]) == []
+
+
+def test_dedup_nodes_applies_duplicates_in_write_order(graph_db):
+    graph_db.create_node("Medecin", {"id": "m"})
+    graph_db.create_node("Patient", {"nom": "Dupont"})
+    graph_db.create_relationship("Patient", "nom", "Dupont", "Medecin", "id", "m", "A_POUR_MEDECIN_TRAITANT")
+    graph_db.create_node("Patient", {"id": "p1", "nom": "Durand", "prenom": "Jean"})
+    graph_db.update_node("Patient", "nom", "Dupont", {"id": "p1", "telephone": "06"})
+    assert graph_db.dedup_nodes("Patient", batch_size=10) == 1
+    assert graph_db.dedup_nodes("Patient", batch_size=10) == 0
+    assert graph_db.find_node("Patient", "id", "p1") == {"id": "p1", "nom": "Dupont", "prenom": "Jean", "telephone": "06"}
+    assert graph_db.get_patients_assigned_to_medecin("m") == ["p1"]
+
+
+def test_merge_nodes_moves_relationships(assignments):
+    assert assignments.merge_nodes("Patient", "p3", "p2")
+    assert not assignments.merge_nodes("Patient", "p3", "p2")
+    assert assignments.find_node("Patient", "id", "p2") is None
+    assert assignments.get_patients_assigned_to_medecin("m2") == ["p3"]
+
+
+def test_collapse_consultation_nodes(assignments):
+    assignments.create_nodes("Consultation", [{"id": "c1", "date_heure": "2024-01-01"},
+                                              {"id": "c2", "date_heure": "2024-03-01"}])
+    assignments.create_relationships("Patient", "Consultation", "CONSULTE",
+                                     [{"from_id": "p0", "to_id": "c1"}, {"from_id": "p0", "to_id": "c2"}])
+    assignments.create_relationships("Consultation", "Medecin", "EST_ASSIGNEE_A",
+                                     [{"from_id": "c1", "to_id": "m1"}, {"from_id": "c2", "to_id": "m1"}])
+    assert assignments.collapse_consultation_nodes(["c1", "c2"]) == 2
+    assert assignments.find_node("Consultation", "id", "c1") is None
+    # create_relationship MERGEs: it returns the existing aggregate
+    assert assignments.create_relationship("Patient", "id", "p0", "Medecin", "id", "m1", "HISTORIQUE_CONSULTATIONS") == {
+        "nombre": 2, "premiere_consultation": "2024-01-01", "derniere_consultation": "2024-03-01"}
+    assert assignments.get_patients_assigned_to_medecin("m1") == ["p0", "p1"]
@@ -0,0 +1,167 @@
+"""
+The in-memory document engine against the query, update and bulk shapes issued by
+database.mongo_db, the synchronization read models and the maintenance jobs.
+"""
+import pytest
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, DeleteOne, InsertOne, MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from database.mongo_db import PATIENT_PROJECTION, DeleteOp, InsertOp, MongoDB, UpdateOp
+
+
+@pytest.fixture
+def patients(mongo_db):
+    ids = {}
+    for nom, prenom, date in [("Dupont", "Jean", "1980-01-02"), ("Lefèvre", "Anne", "1975-05-06"),
+                              ("Martin", "Luc", None), ("Petit", "Jeanne", "1990-03-04")]:
+        ids[nom] = mongo_db.add_patient({"nom": nom, "prenom": prenom, "date_naissance": date,
+                                         "username": f"{nom.lower()}_{prenom.lower()}_patient", "password": "x"})
+    return ids
+
+
+# --- Queries ---
+def test_array_membership_and_set_operators(mongo_db, patients):
+    collection = mongo_db.get_collection("patients")
+    assert [p["nom"] for p in collection.find({"search_keys": "jean"})] == ["Dupont"]
+    assert {p["nom"] for p in collection.find({"search_keys": {"$in": ["jean", "luc"]}})} == {"Dupont", "Martin"}
+    assert {p["nom"] for p in collection.find({"search_keys": {"$ne": "jean"}})} == {"Lefèvre", "Martin", "Petit"}
+    assert {p["nom"] for p in collection.find({"_id": {"$nin": [ObjectId(patients["Dupont"])]}})} == \
+        {"Lefèvre", "Martin", "Petit"}
+
+
+def test_anchored_regex_conjunction(mongo_db, patients):
+    collection = mongo_db.get_collection("patients")
+    query = {"$and": [{"search_keys": {"$regex": "^jea"}}, {"search_keys": {"$regex": "^pet"}}]}
+    assert [p["nom"] for p in collection.find(query)] == ["Petit"]
+
+
+def test_exclusion_projection(mongo_db, patients):
+    patient = mongo_db.get_patient(patients["Dupont"], PATIENT_PROJECTION)
+    assert set(patient) == {"_id", "nom", "prenom", "date_naissance", "username"}
+
+
+def test_cursor_sort_skip_limit(mongo_db, patients):
+    cursor = mongo_db.get_collection("patients").find({}, {"nom": 1, "_id": 0})
+    assert list(cursor.sort("nom", DESCENDING).skip(1).limit(2)) == [{"nom": "Martin"}, {"nom": "Lefèvre"}]
+
+
+def test_search_patients_is_accent_insensitive_and_ignores_username_suffix(mongo_db, patients):
+    assert [p["nom"] for p in mongo_db.search_patients("lefe")] == ["Lefèvre"]
+    assert [p["nom"] for p in mongo_db.search_patients("jean")] == ["Dupont", "Petit"]
+    assert mongo_db.search_patients("patient") == []
+
+
+def test_text_search_scoring_negation_and_scope(mongo_db):
+    for motif, medecin_id, date in [("douleur thoracique", "m1", "2024-01-01T10:00"),
+                                    ("douleur abdominale douleur", "m1", "2024-02-01T10:00"),
+                                    ("fievre", "m1", "2024-03-01T10:00"),
+                                    ("douleur", "m2", "2024-04-01T10:00")]:
+        mongo_db.add_consultation({"motif": motif, "medecin_id": medecin_id, "date_heure": date})
+    results, has_more = mongo_db.search_consultations("Douleur", {"medecin_id": "m1"})
+    assert [c["motif"] for c in results] == ["douleur abdominale douleur", "douleur thoracique"]
+    assert results[0]["score"] > results[1]["score"] and not has_more
+    results, _ = mongo_db.search_consultations("douleur -abdominale", {"medecin_id": "m1"})
+    assert [c["motif"] for c in results] == ["douleur thoracique"]
+    results, has_more = mongo_db.search_consultations("douleur", {"medecin_id": "m1"}, page=1, per_page=1)
+    assert len(results) == 1 and has_more
+
+
+def test_second_text_index_is_rejected(mongo_db):
+    with pytest.raises(OperationFailure):
+        mongo_db.get_collection("consultations").create_index([("diagnostic", "text")])
+
+
+def test_unique_index(mongo_db):
+    collection = mongo_db.get_collection("unique_test")
+    collection.create_index([("username", ASCENDING)], unique=True)
+    collection.insert_one({"username": "a"})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"username": "a"})
+
+
+# --- Updates ---
+def test_summary_update_operators(mongo_db):
+    collection = mongo_db.get_collection("patient_summaries")
+    collection.update_one({"_id": "p"}, {"$setOnInsert": {"consultations": []}, "$inc": {"consultation_count": 0}},
+                          upsert=True)
+    for date in ("2024-01-01", "2024-03-01", "2024-02-01"):
+        collection.update_one({"_id": "p"}, {
+            "$push": {"consultations": {"$each": [{"_id": date, "date_heure": date, "medecin_id": "m"}],
+                                        "$sort": {"date_heure": -1}, "$slice": 2}},
+            "$inc": {"consultation_count": 1},
+            "$max": {"last_visit": date},
+        })
+    summary = collection.find_one({"_id": "p"})
+    assert [c["date_heure"] for c in summary["consultations"]] == ["2024-03-01", "2024-02-01"]
+    assert summary["consultation_count"] == 3 and summary["last_visit"] == "2024-03-01"
+
+    collection.update_many({"consultations.medecin_id": "m"}, {"$set": {"consultations.$[c].medecin_nom": "Dr"}},
+                           array_filters=[{"c.medecin_id": "m"}])
+    collection.update_one({"_id": "p"}, {"$pull": {"consultations": {"_id": "2024-03-01"}}})
+    summary = collection.find_one({"_id": "p"})
+    assert summary["consultations"] == [{"_id": "2024-02-01", "date_heure": "2024-02-01", "medecin_id": "m",
+                                         "medecin_nom": "Dr"}]
+
+
+def test_conditional_update_on_array_field(mongo_db):
+    collection = mongo_db.get_collection("patient_summaries")
+    collection.insert_one({"_id": "p", "consultations": [{"_id": "c1"}], "consultation_count": 5})
+    assert collection.update_one({"_id": "p", "consultations._id": {"$ne": "c1"}},
+                                 {"$inc": {"consultation_count": -1}}).matched_count == 0
+    assert collection.update_one({"_id": "p", "consultations._id": {"$ne": "c9"}},
+                                 {"$inc": {"consultation_count": -1}}).matched_count == 1
+
+
+# --- Bulk writes ---
+def test_bulk_write_operations_and_errors(mongo_db):
+    existing = ObjectId()
+    errors = mongo_db.bulk_write("bulk_test", [
+        InsertOp({"_id": existing, "n": 1}),
+        InsertOp({"_id": existing, "n": 2}),
+        UpdateOp({"_id": "counter"}, {"$inc": {"n": 5}, "$setOnInsert": {"kind": "c"}}, upsert=True),
+        UpdateOp({"_id": "missing"}, {"$set": {"n": 1}}),
+    ])
+    assert list(errors) == [1]
+    collection = mongo_db.get_collection("bulk_test")
+    assert collection.find_one({"_id": "counter"}) == {"_id": "counter", "n": 5, "kind": "c"}
+    assert collection.count_documents({}) == 2
+    assert mongo_db.bulk_write("bulk_test", [DeleteOp({"_id": existing})]) == {}
+    assert collection.count_documents({}) == 1
+
+
+def test_bulk_operations_reach_pymongo_as_requests(monkeypatch):
+    sent = []
+    monkeypatch.setattr(Collection, "bulk_write", lambda collection, requests, ordered: sent.extend(requests))
+    mongo_db = MongoDB(client=MongoClient(connect=False))
+    assert mongo_db.bulk_write("bulk_test", [
+        InsertOp({"a": 1}), UpdateOp({"_id": 1}, {"$set": {"a": 1}}, upsert=True), DeleteOp({"_id": 1}),
+    ]) == {}
+    assert sent == [InsertOne({"a": 1}), UpdateOne({"_id": 1}, {"$set": {"a": 1}}, upsert=True), DeleteOne({"_id": 1})]
+
+
+# --- Aggregation and collections ---
+def test_blocking_key_aggregation(mongo_db):
+    collection = mongo_db.get_collection("patients")
+    for _id, keys in [(1, ["a", "b"]), (2, ["b"]), (3, ["c"]), (4, ["b", "c"])]:
+        collection.insert_one({"_id": _id, "blocking_keys": keys})
+    blocks = collection.aggregate([
+        {"$project": {"blocking_keys": 1}},
+        {"$unwind": "$blocking_keys"},
+        {"$group": {"_id": "$blocking_keys", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"_id": 1}},
+    ])
+    assert list(blocks) == [{"_id": "b", "ids": [1, 2, 4], "count": 3}, {"_id": "c", "ids": [3, 4], "count": 2}]
+
+
+def test_rename_replaces_target(mongo_db):
+    mongo_db.get_collection("stats").insert_one({"_id": "old"})
+    staging = mongo_db.get_collection("stats_rebuild")
+    staging.insert_one({"_id": "new"})
+    with pytest.raises(OperationFailure):
+        staging.rename("stats")
+    staging.rename("stats", dropTarget=True)
+    assert list(mongo_db.get_collection("stats").find()) == [{"_id": "new"}]
+    assert "stats_rebuild" not in mongo_db.db.list_collection_names()
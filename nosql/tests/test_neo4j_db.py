@@ -0,0 +1,98 @@
+"""
+Neo4jDB without a server: transaction access modes and the errors counted as a graph
+outage by the circuit breaker.
+"""
+from contextlib import contextmanager
+
+import pytest
+from neo4j.exceptions import (AuthConfigurationError, ClientError, ConfigurationError,
+                              ConnectionAcquisitionTimeoutError, ResultConsumedError, ResultNotSingleError,
+                              RoutingServiceUnavailable, ServiceUnavailable, SessionError, SessionExpired,
+                              TransactionNestingError, TransientError)
+
+from database.neo4j_db import Neo4jDB
+
+
+class FakeResult:
+    def single(self):
+        return {0: {}, "deleted": 0}
+
+    def consume(self):
+        return type("Summary", (), {"counters": type("Counters", (), {"nodes_created": 0, "nodes_deleted": 0})})()
+
+    def __iter__(self):
+        return iter([])
+
+
+class FakeSession:
+    """Records the access mode of each managed transaction."""
+    def __init__(self):
+        self.modes = []
+
+    def execute_read(self, work):
+        self.modes.append("read")
+        return work(self)
+
+    def execute_write(self, work):
+        self.modes.append("write")
+        return work(self)
+
+    def run(self, query, parameters=None):
+        return FakeResult()
+
+
+@pytest.fixture
+def neo4j_db(monkeypatch):
+    db = Neo4jDB()
+    session = FakeSession()
+    monkeypatch.setattr(db, "_session", contextmanager(lambda: (yield session)))
+    yield db, session
+    db.close()
+
+
+def test_write_methods_run_write_transactions(neo4j_db):
+    db, session = neo4j_db
+    db.create_node("Patient", {"id": "p"})
+    db.update_node("Patient", "id", "p", {"nom": "Dupont"})
+    db.delete_nodes("Patient", ["p"])
+    db.clear()
+    assert session.modes == ["write"] * 4
+
+
+def test_read_methods_run_read_transactions(neo4j_db):
+    db, session = neo4j_db
+    db.find_node("Patient", "id", "p")
+    db.get_medecins_traitants_of_patients(["p"])
+    assert session.modes == ["read"] * 2
+
+
+def neo4j_error(cls, code):
+    error = cls("message")
+    error._neo4j_code = code
+    return error
+
+
+@pytest.mark.parametrize("error", [
+    ServiceUnavailable("down"),
+    RoutingServiceUnavailable("no routing"),
+    SessionExpired("expired"),
+    ConnectionAcquisitionTimeoutError("pool exhausted"),
+    TransientError("deadlock"),
+    neo4j_error(ClientError, "Neo.ClientError.Transaction.TransactionTimedOut"),
+])
+def test_outages_count_against_the_breaker(error):
+    assert Neo4jDB._is_unavailability(error)
+
+
+@pytest.mark.parametrize("error", [
+    ResultConsumedError(None, "consumed"),
+    ResultNotSingleError("two records"),
+    TransactionNestingError("nested"),
+    SessionError(None, "closed"),
+    ConfigurationError("bad config"),
+    AuthConfigurationError("bad auth config"),
+    neo4j_error(ClientError, "Neo.ClientError.Statement.SyntaxError"),
+    ValueError("bad parameter"),
+])
+def test_bugs_do_not_count_against_the_breaker(error):
+    assert not Neo4jDB._is_unavailability(error)